@@ -274,9 +274,9 @@ or None if we fail to get the info """
                                                          hand))
 
     def readCollectPot(self, hand):
-        pots = [Decimal(0) for n in range(hand.maxseats)]
+        pots = [hand.money(0) for n in range(hand.maxseats)]
         for m in self.re_CollectPot.finditer(hand.handText):
-            pots[int(m.group('PSEAT'))] += Decimal(m.group('POT'))
+            pots[int(m.group('PSEAT'))] += hand.money(m.group('POT'))
         # Regarding the processing logic for "committed", see Pot.end() in
         # Hand.py
         committed = sorted([(v,k) for (k,v) in hand.pot.committed.items()])
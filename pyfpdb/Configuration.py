@@ -480,6 +480,8 @@ class Import:
         self.saveActions = string_to_bool(node.getAttribute("saveActions"), default=False)
         self.fastStoreHudCache = string_to_bool(node.getAttribute("fastStoreHudCache"), default=False)
         self.saveStarsHH = string_to_bool(node.getAttribute("saveStarsHH"), default=False)
+        self.anyPlayerRegexs = string_to_bool(node.getAttribute("anyPlayerRegexs"), default=False)
+        self.intCents = string_to_bool(node.getAttribute("intCents"), default=False)
 
     def __str__(self):
         return "    interval = %s\n    callFpdbHud = %s\n    hhArchiveBase = %s\n    saveActions = %s\n    fastStoreHudCache = %s\n" \
@@ -501,6 +503,9 @@ class HudUI:
         self.h_aggregate_ring = string_to_bool(node.getAttribute('aggregate_hero_ring_game_stats'))
         self.h_aggregate_tour = string_to_bool(node.getAttribute('aggregate_hero_tourney_stats'))
         self.h_agg_bb_mult    = node.getAttribute('hero_aggregation_level_multiplier')
+        #
+        self.session_gap      = node.getAttribute('session_gap')
+        self.session_hands    = node.getAttribute('session_hands')
 
 
     def __str__(self):
@@ -1237,6 +1242,14 @@ class Config:
         try:    hui['h_seats_cust_nums']    = self.ui.h_seats_cust_nums
         except: hui['h_seats_cust_nums']    = ['n/a', 'n/a', (2,2), (3,4), (3,5), (4,6), (5,7), (6,8), (7,9), (8,10), (8,10)]
 
+        # Session stats (stat_range / hero_stat_range S)
+
+        try:    hui['session_gap']      = int(self.ui.session_gap)
+        except: hui['session_gap']      = 30  # minutes between hands that start a new session
+
+        try:    hui['session_hands']    = int(self.ui.session_hands)
+        except: hui['session_hands']    = 0   # most hands kept in a session, 0 is no limit
+
         return hui
 
 
@@ -1265,6 +1278,13 @@ class Config:
         try:    imp['fastStoreHudCache'] = self.imp.fastStoreHudCache
         except:  imp['fastStoreHudCache'] = True
 
+        try:    imp['anyPlayerRegexs'] = self.imp.anyPlayerRegexs
+        except:  imp['anyPlayerRegexs'] = False
+
+        # intCents parses amounts into integer cents instead of Decimal
+        try:    imp['intCents'] = self.imp.intCents
+        except:  imp['intCents'] = False
+
         return imp
 
     def get_default_paths(self, site = None):
@@ -44,6 +44,12 @@ import re
 import Queue
 import codecs
 import math
+import imp
+import calendar
+from array import array
+from bisect import bisect_left
+from collections import deque, OrderedDict
+from itertools import count
 
 import logging
 # logging has been set up in fpdb.py or HUD_main.py, use their settings:
@@ -66,14 +72,14 @@ except ImportError:
     use_pool = False
 
 try:
-    from numpy import var
+    imp.find_module('numpy')    # numpy is slow to import, VARIANCE imports it when first used
     use_numpy = True
 except ImportError:
     log.info(_("Not using numpy to define variance in sqlite."))
     use_numpy = False
 
 
-DB_VERSION = 144
+DB_VERSION = 149
 
 
 # Variance created as sqlite has a bunch of undefined aggregate functions.
@@ -86,6 +92,7 @@ class VARIANCE:
         self.store.append(value)
 
     def finalize(self):
+        from numpy import var
         return float(var(self.store))
 
 class sqlitemath:
@@ -101,6 +108,7 @@ class Database:
 
     hero_hudstart_def = '1999-12-31'      # default for length of Hero's stats in HUD
     villain_hudstart_def = '1999-12-31'   # default for length of Villain's stats in HUD
+    session_gap = 1800                    # seconds between hands that start a new session
 
     # Data Structures for index and foreign key creation
     # drop_code is an int with possible values:  0 - don't drop for bulk import
@@ -144,6 +152,7 @@ class Database:
                 , {'tab':'Backings',        'col':'playerId',          'drop':0}
                 , {'tab':'RawHands',        'col':'id',                'drop':0}
                 , {'tab':'RawTourneys',        'col':'id',                'drop':0}
+                , {'tab':'Sessions',        'col':'playerId',          'drop':0}
                 ]
               , [ # indexes for sqlite (list index 4)
                   {'tab':'Hands',           'col':'gametypeId',        'drop':0}
@@ -163,6 +172,7 @@ class Database:
                 , {'tab':'Backings',        'col':'playerId',          'drop':0}
                 , {'tab':'RawHands',        'col':'id',                'drop':0}
                 , {'tab':'RawTourneys',     'col':'id',                'drop':0}
+                , {'tab':'Sessions',        'col':'playerId',          'drop':0}
                 ]
               ]
 
@@ -262,6 +272,32 @@ class Database:
         else:
             self.sql = sql
 
+        # Bulk inserts: with insert_batch > 0 storeHand/storeHandsPlayers/
+        # storeHandsActions queue their rows, with ids reserved from nextId(),
+        # and flushBulkInserts() writes insert_batch hands at a time
+        self.insert_batch = 0
+        self.hbulk       = []
+        self.hpbulk      = []
+        self.habulk      = []
+        self.hbulk_keys  = set()    # (gametypeId, siteHandNo) of queued hands
+        self.next_ids    = {}       # table -> iterator over the ids reserved by reserveIds()
+        self.hand_index  = None     # HandIndex of stored hands, see loadHandIndex()
+        self.hcbulk      = {}       # HudCache key -> totals waiting for flushHudCache()
+        self.sessionbulk = {}       # playerId -> [first, last] startTime of hands waiting for flushSessions()
+        self.prepared    = {}       # query name -> statement to execute, see prepare()
+        self.stat_cache  = OrderedDict()    # HUD stats by player and style, see get_stats_from_hand_cached()
+        self.stat_cache_size = 1000         # players kept in stat_cache
+        self.gametype_ids = set()           # gametypes seen by get_aggregated_gametypes()
+        self.aggregated_gametypes = {}      # (gametypeId, agg_bb_mult) -> gametypes aggregated
+        self.stats_delta_columns = None # see get_stats_delta_columns()
+        self.session_stats = {}     # tableName -> SessionStats for the HUD
+        self.report_cache = {}      # report query -> (column names, rows), see fetch_report()
+        self.report_generation = None   # Settings.generation the report_cache was filled at
+        # Players.id of committed players, shared by all Database objects of this db
+        self.pcache      = player_ids.setdefault((self.db_server, self.host, self.database), PlayerIDs())
+        self.pnew        = {}       # (siteId, name) -> id of players inserted since the last commit
+        self.resetMetaIDs()
+
         if autoconnect:
             # connect to db
             self.do_connect(c)
@@ -278,7 +314,6 @@ class Database:
                 self.recreate_tables()
                 self.wrongDbVersion = False
 
-            self.pcache      = None     # PlayerId cache
             self.cachemiss   = 0        # Delete me later - using to count player cache misses
             self.cachehit    = 0        # Delete me later - using to count player cache hits
 
@@ -307,7 +342,7 @@ class Database:
 
         tables=self.cursor.execute(self.sql.query['list_tables'])
         tables=self.cursor.fetchall()
-        for table in (u'Actions', u'Autorates', u'Backings', u'Gametypes', u'Hands', u'HandsActions', u'HandsPlayers', u'HudCache', u'Players', u'RawHands', u'RawTourneys', u'Settings', u'Sites', u'TourneyTypes', u'Tourneys', u'TourneysPlayers'):
+        for table in (u'Actions', u'Autorates', u'Backings', u'Files', u'Gametypes', u'Hands', u'HandsActions', u'HandsPlayers', u'HudCache', u'Players', u'RawHands', u'RawTourneys', u'Sessions', u'Settings', u'Sites', u'TourneyTypes', u'Tourneys', u'TourneysPlayers'):
             print "table:", table
             result+="###################\nTable "+table+"\n###################\n"
             rows=self.cursor.execute(self.sql.query['get'+table])
@@ -368,6 +403,7 @@ class Database:
         self.database = database
         self.connection = None
         self.cursor     = None
+        self.prepared   = {}
 
         if backend == Database.MYSQL_INNODB:
             import MySQLdb
@@ -498,6 +534,12 @@ class Database:
     #end def connect
 
     def commit(self):
+        if self.hbulk:
+            self.flushBulkInserts()
+        if self.hcbulk:
+            self.flushHudCache()
+        if self.sessionbulk:
+            self.flushSessions()
         if self.backend != self.SQLITE:
             self.connection.commit()
         else:
@@ -518,10 +560,42 @@ class Database:
             if not ok:
                 log.debug(_("commit failed"))
                 raise FpdbError('sqlite commit failed')
+        for ((siteid, name), pid) in self.pnew.iteritems():
+            self.pcache.add(siteid, name, pid)
+        self.pnew = {}
+        self.meta_new = []
+        if self.hand_index is not None:
+            self.hand_index.commit()
 
     def rollback(self):
+        self.clearBulkInserts()
+        self.hcbulk = {}
+        self.sessionbulk = {}
+        self.pnew = {}
+        # forget the ids and hands added by the rolled back transaction
+        for (cache, key) in self.meta_new:
+            cache.pop(key, None)
+        self.meta_new = []
+        if self.hand_index is not None:
+            self.hand_index.rollback()
+        # a PREPARE isn't undone by rollback, so self.prepared stays valid
         self.connection.rollback()
 
+    def prepare(self, name):
+        """Returns the statement to execute sql query name with, placeholders
+           rewritten just once per connection. On PostgreSQL the query is made a
+           server side prepared statement the first time, and this is an EXECUTE
+           of it. (MySQLdb has no prepared statements.)"""
+        if name not in self.prepared:
+            q = self.sql.query[name].replace('%s', self.sql.query['placeholder'])
+            if self.backend == self.PGSQL:
+                params = iter(xrange(1, q.count('%s') + 1))
+                self.get_cursor().execute("PREPARE fpdb_%s AS %s"
+                                          % (name, re.sub('%s', lambda m: '$%d' % params.next(), q)))
+                q = "EXECUTE fpdb_%s (%s)" % (name, ', '.join(['%s'] * q.count('%s')))
+            self.prepared[name] = q
+        return self.prepared[name]
+
     def connected(self):
         """ now deprecated, use is_connected() instead """
         return self.__connected
@@ -717,15 +791,9 @@ class Database:
             print _("*** Database Error: ")+err[2]+"("+str(err[1])+"): "+str(sys.exc_info()[1])
 
     # is get_stats_from_hand slow?
-    def get_stats_from_hand( self, hand, type   # type is "ring" or "tour"
-                           , hud_params = {'hud_style':'A', 'agg_bb_mult':1000
-                                          ,'seats_style':'A', 'seats_cust_nums':['n/a', 'n/a', (2,2), (3,4), (3,5), (4,6), (5,7), (6,8), (7,9), (8,10), (8,10)]
-                                          ,'h_hud_style':'S', 'h_agg_bb_mult':1000
-                                          ,'h_seats_style':'A', 'h_seats_cust_nums':['n/a', 'n/a', (2,2), (3,4), (3,5), (4,6), (5,7), (6,8), (7,9), (8,10), (8,10)]
-                                          }
-                           , hero_id = -1
-                           , num_seats = 6
-                           ):
+    def get_hud_style_params(self, hud_params, num_seats):
+        """Returns (hud_style, stylekey, agg_bb_mult, seats_min, seats_max) for
+           opponents and for hero, from the hud_params of a HUD."""
         hud_style   = hud_params['hud_style']
         agg_bb_mult = hud_params['agg_bb_mult']
         seats_style = hud_params['seats_style']
@@ -735,8 +803,6 @@ class Database:
         h_seats_style = hud_params['h_seats_style']
         h_seats_cust_nums = hud_params['h_seats_cust_nums']
 
-        stat_dict = {}
-
         if seats_style == 'A':
             seats_min, seats_max = 0, 10
         elif seats_style == 'C':
@@ -760,14 +826,6 @@ class Database:
                  % (seats_style, seats_min, seats_max
                    ,h_seats_style, h_seats_min, h_seats_max) )
 
-        if hud_style == 'S' or h_hud_style == 'S':
-            self.get_stats_from_hand_session(hand, stat_dict, hero_id
-                                            ,hud_style, seats_min, seats_max
-                                            ,h_hud_style, h_seats_min, h_seats_max)
-
-            if hud_style == 'S' and h_hud_style == 'S':
-                return stat_dict
-
         if hud_style == 'T':
             stylekey = self.date_ndays_ago
         elif hud_style == 'A':
@@ -794,7 +852,32 @@ class Database:
         #elif h_hud_style == 'H':
         #    h_stylekey = date_nhands_ago  needs array by player here ...
 
-        query = 'get_stats_from_hand_aggregated'
+        return ((hud_style, stylekey, agg_bb_mult, seats_min, seats_max),
+                (h_hud_style, h_stylekey, h_agg_bb_mult, h_seats_min, h_seats_max))
+
+    def get_stats_from_hand( self, hand, type   # type is "ring" or "tour"
+                           , hud_params = {'hud_style':'A', 'agg_bb_mult':1000
+                                          ,'seats_style':'A', 'seats_cust_nums':['n/a', 'n/a', (2,2), (3,4), (3,5), (4,6), (5,7), (6,8), (7,9), (8,10), (8,10)]
+                                          ,'h_hud_style':'S', 'h_agg_bb_mult':1000
+                                          ,'h_seats_style':'A', 'h_seats_cust_nums':['n/a', 'n/a', (2,2), (3,4), (3,5), (4,6), (5,7), (6,8), (7,9), (8,10), (8,10)]
+                                          }
+                           , hero_id = -1
+                           , num_seats = 6
+                           , query = 'get_stats_from_hand_aggregated'
+                           ):
+        ((hud_style, stylekey, agg_bb_mult, seats_min, seats_max),
+         (h_hud_style, h_stylekey, h_agg_bb_mult, h_seats_min, h_seats_max)) = self.get_hud_style_params(hud_params, num_seats)
+
+        stat_dict = {}
+
+        if hud_style == 'S' or h_hud_style == 'S':
+            self.get_stats_from_hand_session(hand, stat_dict, hero_id
+                                            ,hud_style, seats_min, seats_max
+                                            ,h_hud_style, h_seats_min, h_seats_max)
+
+            if hud_style == 'S' and h_hud_style == 'S':
+                return stat_dict
+
         subs = (hand
                ,hero_id, stylekey, agg_bb_mult, agg_bb_mult, seats_min, seats_max  # hero params
                ,hero_id, h_stylekey, h_agg_bb_mult, h_agg_bb_mult, h_seats_min, h_seats_max)    # villain params
@@ -818,6 +901,150 @@ class Database:
 
         return stat_dict
 
+    def get_stats_delta_columns(self):
+        """Return (HandsPlayers column, stat name) pairs selected by get_stats_delta_from_hand,
+           so the importer can build the same deltas from a Hand in memory."""
+        if self.stats_delta_columns is None:
+            self.stats_delta_columns = [(column, alias.lower()) for (column, alias) in
+                re.findall(r"hp\.(\w+)\s+AS\s+(\w+)", self.sql.query['get_stats_delta_from_hand'])
+                if alias not in ('player_id', 'seat', 'position')]
+        return self.stats_delta_columns
+
+    def get_stats_from_hand_cached(self, hand, type, hud_params, hero_id = -1, num_seats = 6, deltas = None, table_name = None):
+        """Same as get_stats_from_hand(), but each player's stats are fetched from
+           HudCache only the first time they are needed and then kept up to date by
+           adding in the HandsPlayers rows of the following hands. Cached by player,
+           then by (aggregated gametypes, hud style params). Expects hands in the
+           order they were stored, as HUD_main gets them.
+           deltas are the rows of get_stats_delta_from_hand if the caller already has them.
+           Session stats are kept per table_name, see get_session_stats()."""
+        (style, h_style) = self.get_hud_style_params(hud_params, num_seats)
+        if (style[0] == 'S' or h_style[0] == 'S') and table_name is None:
+            # session stats aren't in HudCache
+            return self.get_stats_from_hand(hand, type, hud_params, hero_id, num_seats)
+
+        c = self.get_cursor()
+        if deltas is None:
+            c.execute(self.sql.query['get_stats_delta_from_hand'], (hand,))
+            colnames = [desc[0].lower() for desc in c.description]
+            deltas = [dict(zip(colnames, row)) for row in c.fetchall()]
+        if not deltas:
+            return {}
+
+        def styles(d):
+            return h_style if d['player_id'] == hero_id else style
+
+        def key(d):
+            return (self.get_aggregated_gametypes(d['gametype_id'], styles(d)[2]),) + styles(d)
+
+        stat_dict = {}
+        if style[0] == 'S' or h_style[0] == 'S':
+            session = self.get_session_stats(table_name, hand, deltas, hud_params)
+            for d in deltas:
+                (hud_style, stylekey, agg_bb_mult, seats_min, seats_max) = styles(d)
+                if hud_style == 'S':
+                    stats = session.get(d, seats_min, seats_max)
+                    if stats is not None:
+                        stat_dict[d['player_id']] = stats
+            deltas = [d for d in deltas if styles(d)[0] != 'S']
+
+        missing = [d for d in deltas if key(d) not in self.stat_cache.get(d['player_id'], {})]
+        if missing:
+            # The HudCache rows first: any row added before the stats are read is in
+            # them, and its hand is at most last_hand (see below).
+            hc_keys = {}
+            for d in missing:
+                (gametypes, hud_style, stylekey, agg_bb_mult, seats_min, seats_max) = key(d)
+                q = self.sql.query['get_hudcache_player_keys'].replace(
+                        '<gametypes>', ','.join([self.sql.query['placeholder']] * len(gametypes)))
+                c.execute(q, [d['player_id']] + list(gametypes) + [stylekey, seats_min, seats_max])
+                hc_keys[d['player_id']] = set(c.fetchall())
+            # HudCache has every hand up to last_hand in it, later ones are added as deltas
+            params = dict(hud_params)   # only the HudCache stats are wanted here
+            for name in ('hud_style', 'h_hud_style'):
+                if params[name] == 'S':
+                    params[name] = 'A'
+            hc_dict = self.get_stats_from_hand(hand, type, params, hero_id, num_seats,
+                                               query = 'get_stats_from_hand_aggregated_last')
+            for d in missing:
+                if d['player_id'] in hc_dict:
+                    stats = hc_dict[d['player_id']]
+                    last_hand = stats.pop('last_hand')
+                    self.stat_cache.setdefault(d['player_id'], {})[key(d)] = [stats, hc_keys[d['player_id']], last_hand]
+
+        pos = {'B':'B', 'S':'S', '0':'D', '1':'C', '2':'M', '3':'M', '4':'M', '5':'E', '6':'E', '7':'E', '8':'E', '9':'E' }
+        for d in deltas:
+            entries = self.stat_cache.pop(d['player_id'], None)
+            if entries is None:
+                continue    # no stats for this player in these styles
+            self.stat_cache[d['player_id']] = entries  # now the most recently used
+            styleKey = 'd' + str(d['start_time'])[2:10].replace('-', '')
+            hc_key = (d['gametype_id'], d['seats'], pos[str(d['position'])], styleKey)
+            # the hand counts in every cached aggregate of its gametype, not just this table's
+            for ((gametypes, hud_style, stylekey, agg_bb_mult, seats_min, seats_max), entry) in entries.iteritems():
+                if d['gametype_id'] not in gametypes or styleKey <= stylekey or not seats_min <= d['seats'] <= seats_max:
+                    continue
+                (stats, keys, last_hand) = entry
+                if int(hand) > last_hand:
+                    for name in stats:
+                        if name in ('w_w_s_1', 'wmsd', 'net'):
+                            stats[name] = (stats[name] or 0) + d[name]
+                        elif name in d and name not in ('player_id', 'seat', 'screen_name', 'bigblind'):
+                            # HudCache keeps these as 0/1 per hand
+                            stats[name] = (stats[name] or 0) + (1 if d[name] else 0)
+                    # bigblind is summed over HudCache rows, so it only grows with a new row
+                    if hc_key not in keys:
+                        stats['bigblind'] += d['bigblind']
+                    entry[2] = int(hand)
+                keys.add(hc_key)
+            if key(d) in entries:
+                stats = entries[key(d)][0]
+                stats['seat'] = d['seat']
+                stat_dict[d['player_id']] = dict(stats)
+        while len(self.stat_cache) > self.stat_cache_size:
+            self.stat_cache.popitem(last = False)   # the players not seen for longest
+        return stat_dict
+
+    def get_aggregated_gametypes(self, gametype_id, agg_bb_mult):
+        """The ids of the gametypes get_stats_from_hand() sums the stats of gametype_id
+           over for agg_bb_mult, as a frozenset"""
+        if gametype_id not in self.gametype_ids:
+            # it may be new, and belong to the aggregates already looked up
+            self.gametype_ids.add(gametype_id)
+            self.aggregated_gametypes = {}
+        if (gametype_id, agg_bb_mult) not in self.aggregated_gametypes:
+            c = self.get_cursor()
+            c.execute(self.sql.query['get_aggregated_gametypes'], (agg_bb_mult, agg_bb_mult, gametype_id))
+            self.aggregated_gametypes[(gametype_id, agg_bb_mult)] = frozenset([row[0] for row in c.fetchall()])
+        return self.aggregated_gametypes[(gametype_id, agg_bb_mult)]
+
+    def drop_session_stats(self, table_name):
+        """Forget the session of a table, eg when its HUD is closed"""
+        self.session_stats.pop(table_name, None)
+
+    def get_session_stats(self, table_name, hand, deltas, hud_params):
+        """Return the SessionStats of the table with hand added. The first time a table
+           is seen its session is started from the hands there since hand_1day_ago."""
+        session = self.session_stats.get(table_name)
+        if session is None:
+            names = ['n', 'bigblind'] + [alias for (column, alias) in self.get_stats_delta_columns()]
+            session = SessionStats(hud_params['session_gap'], hud_params['session_hands'], names)
+            self.session_stats[table_name] = session
+            c = self.get_cursor()
+            c.execute(self.sql.query['get_stats_delta_from_table'], (table_name, self.hand_1day_ago, hand))
+            colnames = [desc[0].lower() for desc in c.description]
+            rows = []
+            for row in c.fetchall():
+                d = dict(zip(colnames, row))
+                if rows and rows[0]['hand_id'] != d['hand_id']:
+                    session.add(rows[0]['hand_id'], rows)
+                    rows = []
+                rows.append(d)
+            if rows:
+                session.add(rows[0]['hand_id'], rows)
+        session.add(hand, deltas)
+        return session
+
     # uses query on handsplayers instead of hudcache to get stats on just this session
     def get_stats_from_hand_session(self, hand, stat_dict, hero_id
                                    ,hud_style, seats_min, seats_max
@@ -1140,7 +1367,7 @@ class Database:
         """(Re-)creates the tables of the current DB"""
 
         self.drop_tables()
-        self.resetPlayerIDs()
+        self.resetCaches()
         self.create_tables()
         self.createAllIndexes()
         self.commit()
@@ -1171,6 +1398,8 @@ class Database:
             c.execute(self.sql.query['createBackingsTable'])
             c.execute(self.sql.query['createRawHands'])
             c.execute(self.sql.query['createRawTourneys'])
+            c.execute(self.sql.query['createFilesTable'])
+            c.execute(self.sql.query['createSessionsTable'])
 
             # Create unique indexes:
             log.debug("Creating unique indexes")
@@ -1179,6 +1408,7 @@ class Database:
             c.execute(self.sql.query['addPlayersIndex'])
             c.execute(self.sql.query['addTPlayersIndex'])
             c.execute(self.sql.query['addTTypesIndex'])
+            c.execute(self.sql.query['addFilesIndex'])
 
             self.fillDefaultData()
             self.commit()
@@ -1427,7 +1657,9 @@ class Database:
 
     def fillDefaultData(self):
         c = self.get_cursor()
-        c.execute("INSERT INTO Settings (version) VALUES (%s);" % (DB_VERSION))
+        # generation starts from the time in ms, not 0, so that a recreated db can't
+        # come back to a generation report caches were filled at before
+        c.execute("INSERT INTO Settings (version, generation) VALUES (%s, %s);" % (DB_VERSION, int(time() * 1000)))
         #Fill Sites
         c.execute("INSERT INTO Sites (name,code) VALUES ('Full Tilt Poker', 'FT')")
         c.execute("INSERT INTO Sites (name,code) VALUES ('PokerStars', 'PS')")
@@ -1468,8 +1700,12 @@ class Database:
         self.createAllForeignKeys()
     #end def rebuild_indexes
 
-    def rebuild_hudcache(self, h_start=None, v_start=None):
-        """clears hudcache and rebuilds from the individual handsplayers records"""
+    def rebuild_hudcache(self, h_start=None, v_start=None, incremental=False, progress=None):
+        """clears hudcache and rebuilds from the individual handsplayers records
+
+           incremental: only rebuild the (gametypeId, styleKey) partitions with hands stored
+                        since the last rebuild (Settings.hudcacheHandId), committing after each
+           progress:    called with (partitions done, number of partitions) as they finish"""
 
         try:
             stime = time()
@@ -1493,46 +1729,73 @@ class Database:
             if v_start is None:
                 v_start = self.villain_hudstart_def
 
-            if self.hero_ids == {}:
-                where = "WHERE hp.tourneysPlayersId IS NULL"
-            else:
-                where =   "where (((    hp.playerId not in " + str(tuple(self.hero_ids.values())) \
-                        + "       and h.startTime > '" + v_start + "')" \
-                        + "   or (    hp.playerId in " + str(tuple(self.hero_ids.values())) \
-                        + "       and h.startTime > '" + h_start + "'))" \
-                        + "   AND hp.tourneysPlayersId IS NULL)"
-            rebuild_sql_cash = self.sql.query['rebuildHudCache'].replace('<tourney_insert_clause>', "")
-            rebuild_sql_cash = rebuild_sql_cash.replace('<tourney_select_clause>', "")
-            rebuild_sql_cash = rebuild_sql_cash.replace('<tourney_join_clause>', "")
-            rebuild_sql_cash = rebuild_sql_cash.replace('<tourney_group_clause>', "")
-            rebuild_sql_cash = rebuild_sql_cash.replace('<where_clause>', where)
-            #print "rebuild_sql_cash:",rebuild_sql_cash
-            self.get_cursor().execute(self.sql.query['clearHudCache'])
-            self.get_cursor().execute(rebuild_sql_cash)
-
-            if self.hero_ids == {}:
-                where = "WHERE hp.tourneysPlayersId >= 0"
+            c = self.get_cursor()
+            c.execute(self.sql.query['get_last_hand'])
+            last_hand = c.fetchone()[0] or 0
+            watermark = 0
+            if incremental:
+                c.execute(self.sql.query['get_hudcache_watermark'])
+                watermark = c.fetchone()[0]
+
+            if watermark > 0:
+                c.execute(self.sql.query['get_hudcache_partitions'], (watermark,))
+                partitions = c.fetchall()
+                log.info(_("Rebuilding %d hudcache partitions") % len(partitions))
+                for i, (gtid, styleKey) in enumerate(partitions):
+                    day = datetime.strptime(styleKey[1:], '%y%m%d').date()
+                    where = "h.gametypeId = %d AND h.startTime >= '%s' AND h.startTime < '%s'" \
+                            % (gtid, day, day + timedelta(1))
+                    c.execute(self.sql.query['clearHudCachePartition'], (gtid, styleKey))
+                    c.execute(self.get_rebuild_hudcache_sql(h_start, v_start, False, where))
+                    c.execute(self.get_rebuild_hudcache_sql(h_start, v_start, True, where))
+                    self.commit()
+                    if progress is not None:
+                        progress(i + 1, len(partitions))
             else:
-                where =   "where (((    hp.playerId not in " + str(tuple(self.hero_ids.values())) \
-                        + "       and h.startTime > '" + v_start + "')" \
-                        + "   or (    hp.playerId in " + str(tuple(self.hero_ids.values())) \
-                        + "       and h.startTime > '" + h_start + "'))" \
-                        + "   AND hp.tourneysPlayersId >= 0)"
-            rebuild_sql_tourney = self.sql.query['rebuildHudCache'].replace('<tourney_insert_clause>', ",tourneyTypeId")
-            rebuild_sql_tourney = rebuild_sql_tourney.replace('<tourney_select_clause>', ",t.tourneyTypeId")
-            rebuild_sql_tourney = rebuild_sql_tourney.replace('<tourney_join_clause>', """INNER JOIN TourneysPlayers tp ON (tp.id = hp.tourneysPlayersId)
-                INNER JOIN Tourneys t ON (t.id = tp.tourneyId)""")
-            rebuild_sql_tourney = rebuild_sql_tourney.replace('<tourney_group_clause>', ",t.tourneyTypeId")
-            rebuild_sql_tourney = rebuild_sql_tourney.replace('<where_clause>', where)
-            #print "rebuild_sql_tourney:",rebuild_sql_tourney
+                c.execute(self.sql.query['clearHudCache'])
+                c.execute(self.get_rebuild_hudcache_sql(h_start, v_start, False))
+                c.execute(self.get_rebuild_hudcache_sql(h_start, v_start, True))
+                self.rebuild_sessions()
 
-            self.get_cursor().execute(rebuild_sql_tourney)
+            c.execute(self.sql.query['set_hudcache_watermark'], (last_hand,))
+            self.bump_generation()
             self.commit()
             print _("Rebuild hudcache took %.1f seconds") % (time() - stime,)
         except:
             err = traceback.extract_tb(sys.exc_info()[2])[-1]
             print _("Error rebuilding hudcache:"), str(sys.exc_value)
             print err
+
+    def get_rebuild_hudcache_sql(self, h_start, v_start, tourney, where = None):
+        """Returns the rebuildHudCache statement for cash (or tourney) hands, for the
+           hands matching where (all hands if None). Expects self.hero_ids to be set."""
+        if tourney:
+            where_tp = "hp.tourneysPlayersId >= 0"
+        else:
+            where_tp = "hp.tourneysPlayersId IS NULL"
+        if where is not None:
+            where_tp += " AND " + where
+
+        if self.hero_ids == {}:
+            where = "WHERE " + where_tp
+        else:
+            where =   "where (((    hp.playerId not in " + str(tuple(self.hero_ids.values())) \
+                    + "       and h.startTime > '" + v_start + "')" \
+                    + "   or (    hp.playerId in " + str(tuple(self.hero_ids.values())) \
+                    + "       and h.startTime > '" + h_start + "'))" \
+                    + "   AND " + where_tp + ")"
+        if tourney:
+            rebuild_sql = self.sql.query['rebuildHudCache'].replace('<tourney_insert_clause>', ",tourneyTypeId")
+            rebuild_sql = rebuild_sql.replace('<tourney_select_clause>', ",t.tourneyTypeId")
+            rebuild_sql = rebuild_sql.replace('<tourney_join_clause>', """INNER JOIN TourneysPlayers tp ON (tp.id = hp.tourneysPlayersId)
+                INNER JOIN Tourneys t ON (t.id = tp.tourneyId)""")
+            rebuild_sql = rebuild_sql.replace('<tourney_group_clause>', ",t.tourneyTypeId")
+        else:
+            rebuild_sql = self.sql.query['rebuildHudCache'].replace('<tourney_insert_clause>', "")
+            rebuild_sql = rebuild_sql.replace('<tourney_select_clause>', "")
+            rebuild_sql = rebuild_sql.replace('<tourney_join_clause>', "")
+            rebuild_sql = rebuild_sql.replace('<tourney_group_clause>', "")
+        return rebuild_sql.replace('<where_clause>', where)
     #end def rebuild_hudcache
 
     def get_hero_hudcache_start(self):
@@ -1627,14 +1890,7 @@ class Database:
 
     def storeHand(self, p):
         #stores into table hands:
-        q = self.sql.query['store_hand']
-
-        q = q.replace('%s', self.sql.query['placeholder'])
-
-        c = self.get_cursor()
-
-        c.execute(q, (
-                p['tableName'],
+        row = ( p['tableName'],
                 p['gameTypeId'],
                 p['siteHandNo'],
                 p['tourneyId'],
@@ -1664,7 +1920,19 @@ class Database:
                 p['street3Pot'],
                 p['street4Pot'],
                 p['showdownPot']
-        ))
+        )
+        if self.hand_index is not None:
+            self.hand_index.add(p['gameTypeId'], p['siteHandNo'])
+        if self.insert_batch > 0:
+            if len(self.hbulk) >= self.insert_batch:
+                self.flushBulkInserts()
+            hid = self.nextId('Hands')
+            self.hbulk.append((hid,) + row)
+            self.hbulk_keys.add((p['gameTypeId'], p['siteHandNo']))
+            return hid
+
+        c = self.get_cursor()
+        c.execute(self.prepare('store_hand'), row)
         return self.get_last_insert_id(c)
     # def storeHand
 
@@ -1678,105 +1946,15 @@ class Database:
         inserts = []
         hpid = {}
         for p in pdata:
-            inserts.append( (hid,
-                             pids[p],
-                             pdata[p]['startCash'],
-                             pdata[p]['seatNo'],
-                             pdata[p]['sitout'],
-                             pdata[p]['card1'],
-                             pdata[p]['card2'],
-                             pdata[p]['card3'],
-                             pdata[p]['card4'],
-                             pdata[p]['card5'],
-                             pdata[p]['card6'],
-                             pdata[p]['card7'],
-                             pdata[p]['winnings'],
-                             pdata[p]['rake'],
-                             pdata[p]['totalProfit'],
-                             pdata[p]['street0VPI'],
-                             pdata[p]['street1Seen'],
-                             pdata[p]['street2Seen'],
-                             pdata[p]['street3Seen'],
-                             pdata[p]['street4Seen'],
-                             pdata[p]['sawShowdown'],
-                             pdata[p]['wonAtSD'],
-                             pdata[p]['street0Aggr'],
-                             pdata[p]['street1Aggr'],
-                             pdata[p]['street2Aggr'],
-                             pdata[p]['street3Aggr'],
-                             pdata[p]['street4Aggr'],
-                             pdata[p]['street1CBChance'],
-                             pdata[p]['street2CBChance'],
-                             pdata[p]['street3CBChance'],
-                             pdata[p]['street4CBChance'],
-                             pdata[p]['street1CBDone'],
-                             pdata[p]['street2CBDone'],
-                             pdata[p]['street3CBDone'],
-                             pdata[p]['street4CBDone'],
-                             pdata[p]['wonWhenSeenStreet1'],
-                             pdata[p]['wonWhenSeenStreet2'],
-                             pdata[p]['wonWhenSeenStreet3'],
-                             pdata[p]['wonWhenSeenStreet4'],
-                             pdata[p]['street0Calls'],
-                             pdata[p]['street1Calls'],
-                             pdata[p]['street2Calls'],
-                             pdata[p]['street3Calls'],
-                             pdata[p]['street4Calls'],
-                             pdata[p]['street0Bets'],
-                             pdata[p]['street1Bets'],
-                             pdata[p]['street2Bets'],
-                             pdata[p]['street3Bets'],
-                             pdata[p]['street4Bets'],
-                             pdata[p]['position'],
-                             pdata[p]['tourneysPlayersIds'],
-                             pdata[p]['startCards'],
-                             pdata[p]['street0_3BChance'],
-                             pdata[p]['street0_3BDone'],
-                             pdata[p]['street0_4BChance'],
-                             pdata[p]['street0_4BDone'],
-                             pdata[p]['other3BStreet0'],
-                             pdata[p]['other4BStreet0'],
-                             pdata[p]['otherRaisedStreet0'],
-                             pdata[p]['otherRaisedStreet1'],
-                             pdata[p]['otherRaisedStreet2'],
-                             pdata[p]['otherRaisedStreet3'],
-                             pdata[p]['otherRaisedStreet4'],
-                             pdata[p]['foldToOtherRaisedStreet0'],
-                             pdata[p]['foldToOtherRaisedStreet1'],
-                             pdata[p]['foldToOtherRaisedStreet2'],
-                             pdata[p]['foldToOtherRaisedStreet3'],
-                             pdata[p]['foldToOtherRaisedStreet4'],
-                             pdata[p]['raiseFirstInChance'],
-                             pdata[p]['raisedFirstIn'],
-                             pdata[p]['foldBbToStealChance'],
-                             pdata[p]['foldedBbToSteal'],
-                             pdata[p]['foldSbToStealChance'],
-                             pdata[p]['foldedSbToSteal'],
-                             pdata[p]['foldToStreet1CBChance'],
-                             pdata[p]['foldToStreet1CBDone'],
-                             pdata[p]['foldToStreet2CBChance'],
-                             pdata[p]['foldToStreet2CBDone'],
-                             pdata[p]['foldToStreet3CBChance'],
-                             pdata[p]['foldToStreet3CBDone'],
-                             pdata[p]['foldToStreet4CBChance'],
-                             pdata[p]['foldToStreet4CBDone'],
-                             pdata[p]['street1CheckCallRaiseChance'],
-                             pdata[p]['street1CheckCallRaiseDone'],
-                             pdata[p]['street2CheckCallRaiseChance'],
-                             pdata[p]['street2CheckCallRaiseDone'],
-                             pdata[p]['street3CheckCallRaiseChance'],
-                             pdata[p]['street3CheckCallRaiseDone'],
-                             pdata[p]['street4CheckCallRaiseChance'],
-                             pdata[p]['street4CheckCallRaiseDone'],
-                             pdata[p]['street0Raises'],
-                             pdata[p]['street1Raises'],
-                             pdata[p]['street2Raises'],
-                             pdata[p]['street3Raises'],
-                             pdata[p]['street4Raises']
-                            ) )
+            inserts.append((hid, pids[p]) + pdata[p].insertValues())
 
-        q = self.sql.query['store_hands_players']
-        q = q.replace('%s', self.sql.query['placeholder'])
+        if self.insert_batch > 0:
+            for r in inserts:
+                hpid[(r[0], r[1])] = self.nextId('HandsPlayers')
+                self.hpbulk.append((hpid[(r[0], r[1])],) + r)
+            return hpid
+
+        q = self.prepare('store_hands_players')
 
         #print "DEBUG: inserts: %s" %inserts
         #print "DEBUG: q: %s" % q
@@ -1814,14 +1992,70 @@ class Database:
                              adata[a]['allIn']
                             ) )
 
-        q = self.sql.query['store_hands_actions']
-        q = q.replace('%s', self.sql.query['placeholder'])
+        if self.insert_batch > 0:
+            self.habulk.extend(inserts)
+            return
+
+        c = self.get_cursor()
+        c.executemany(self.prepare('store_hands_actions'), inserts)
 
+    def nextId(self, table):
+        """Reserve the next id in table (Hands or HandsPlayers) for a queued bulk insert"""
+        try:
+            return self.next_ids[table].next()
+        except (KeyError, StopIteration):
+            self.next_ids[table] = self.reserveIds(table)
+            return self.next_ids[table].next()
+
+    def reserveIds(self, table):
+        """Returns an iterator over ids for table that no other connection will use.
+           PostgreSQL gives out a block of ids from the table's sequence, which never
+           gives an id out twice. The other dbs carry on from max(id), read under a lock
+           that keeps other connections from inserting rows until this one commits."""
         c = self.get_cursor()
-        c.executemany(q, inserts)
+        if self.backend == self.PGSQL:
+            c.execute(self.sql.query['reserve_%s_ids' % table.lower()], (self.insert_batch * 10,))
+            return iter([row[0] for row in c.fetchall()])
+        if self.backend == self.SQLITE:
+            c.execute(self.sql.query['lock_for_ids'])   # takes the db's write lock
+        c.execute(self.sql.query['get_max_%s_id' % table.lower()])
+        row = c.fetchone()
+        return count(row[0] + 1 if row else 1)
+
+    def flushBulkInserts(self):
+        """Write the hands queued by storeHand & co in one multi-row insert per table.
+           Doesn't commit, commit() calls this itself before committing."""
+        self.insertMany(self.sql.query['store_hand_with_id'], self.hbulk)
+        self.insertMany(self.sql.query['store_hands_players_with_id'], self.hpbulk)
+        self.insertMany(self.sql.query['store_hands_actions'], self.habulk)
+        self.clearBulkInserts()
+
+    def clearBulkInserts(self):
+        self.hbulk = []
+        self.hpbulk = []
+        self.habulk = []
+        self.hbulk_keys = set()
+        self.next_ids = {}  # the lock taken by reserveIds() ends with the transaction
+
+    def insertMany(self, q, rows):
+        if not rows:
+            return
+        q = q.replace('%s', self.sql.query['placeholder'])
+        c = self.get_cursor()
+        if self.backend == self.PGSQL:
+            # psycopg2 executemany() is one round trip per row, send
+            # a single INSERT with a VALUES list instead
+            (insert, values) = q.encode('utf-8').split('VALUES')
+            values = values.strip()
+            for i in xrange(0, len(rows), 1000):
+                c.execute(insert + 'VALUES ' + ','.join([c.mogrify(values, r) for r in rows[i:i+1000]]))
+        else:
+            # MySQLdb turns this into multi-row INSERTs itself
+            c.executemany(q, rows)
 
     def storeHudCache(self, gid, pids, starttime, pdata):
-        """Update cached statistics. If update fails because no record exists, do an insert."""
+        """Add the hand's stats to the cached statistics waiting in self.hcbulk,
+           they are written to HudCache by flushHudCache() on commit."""
 
         if self.use_date_in_hudcache:
             styleKey = datetime.strftime(starttime, 'd%y%m%d')
@@ -1830,137 +2064,212 @@ class Database:
             # hard-code styleKey as 'A000000' (all-time cache, no key) for now
             styleKey = 'A000000'
 
-        update_hudcache = self.sql.query['update_hudcache']
-        update_hudcache = update_hudcache.replace('%s', self.sql.query['placeholder'])
-        insert_hudcache = self.sql.query['insert_hudcache']
-        insert_hudcache = insert_hudcache.replace('%s', self.sql.query['placeholder'])
-
         #print "DEBUG: %s %s %s" %(hid, pids, pdata)
-        inserts = []
+        pos = {'B':'B', 'S':'S', 0:'D', 1:'C', 2:'M', 3:'M', 4:'M', 5:'E', 6:'E', 7:'E', 8:'E', 9:'E' }
         for p in pdata:
-            line = [0]*85
-
-            line[0] = 1 # HDs
-            if pdata[p]['street0VPI']:                  line[1] = 1
-            if pdata[p]['street0Aggr']:                 line[2] = 1
-            if pdata[p]['street0_3BChance']:            line[3] = 1
-            if pdata[p]['street0_3BDone']:              line[4] = 1
-            if pdata[p]['street0_4BChance']:            line[5] = 1
-            if pdata[p]['street0_4BDone']:              line[6] = 1
-            if pdata[p]['other3BStreet0']:              line[7] = 1
-            if pdata[p]['other4BStreet0']:              line[8] = 1
-            if pdata[p]['street1Seen']:                 line[9] = 1
-            if pdata[p]['street2Seen']:                 line[10] = 1
-            if pdata[p]['street3Seen']:                 line[11] = 1
-            if pdata[p]['street4Seen']:                 line[12] = 1
-            if pdata[p]['sawShowdown']:                 line[13] = 1
-            if pdata[p]['street1Aggr']:                 line[14] = 1
-            if pdata[p]['street2Aggr']:                 line[15] = 1
-            if pdata[p]['street3Aggr']:                 line[16] = 1
-            if pdata[p]['street4Aggr']:                 line[17] = 1
-            if pdata[p]['otherRaisedStreet0']:          line[18] = 1
-            if pdata[p]['otherRaisedStreet1']:          line[19] = 1
-            if pdata[p]['otherRaisedStreet2']:          line[20] = 1
-            if pdata[p]['otherRaisedStreet3']:          line[21] = 1
-            if pdata[p]['otherRaisedStreet4']:          line[22] = 1
-            if pdata[p]['foldToOtherRaisedStreet0']:    line[23] = 1
-            if pdata[p]['foldToOtherRaisedStreet1']:    line[24] = 1
-            if pdata[p]['foldToOtherRaisedStreet2']:    line[25] = 1
-            if pdata[p]['foldToOtherRaisedStreet3']:    line[26] = 1
-            if pdata[p]['foldToOtherRaisedStreet4']:    line[27] = 1
-            line[28] = pdata[p]['wonWhenSeenStreet1']
-            line[29] = pdata[p]['wonWhenSeenStreet2']
-            line[30] = pdata[p]['wonWhenSeenStreet3']
-            line[31] = pdata[p]['wonWhenSeenStreet4']
-            line[32] = pdata[p]['wonAtSD']
-            if pdata[p]['raiseFirstInChance']:          line[33] = 1
-            if pdata[p]['raisedFirstIn']:               line[34] = 1
-            if pdata[p]['foldBbToStealChance']:         line[35] = 1
-            if pdata[p]['foldedBbToSteal']:             line[36] = 1
-            if pdata[p]['foldSbToStealChance']:         line[37] = 1
-            if pdata[p]['foldedSbToSteal']:             line[38] = 1
-            if pdata[p]['street1CBChance']:             line[39] = 1
-            if pdata[p]['street1CBDone']:               line[40] = 1
-            if pdata[p]['street2CBChance']:             line[41] = 1
-            if pdata[p]['street2CBDone']:               line[42] = 1
-            if pdata[p]['street3CBChance']:             line[43] = 1
-            if pdata[p]['street3CBDone']:               line[44] = 1
-            if pdata[p]['street4CBChance']:             line[45] = 1
-            if pdata[p]['street4CBDone']:               line[46] = 1
-            if pdata[p]['foldToStreet1CBChance']:       line[47] = 1
-            if pdata[p]['foldToStreet1CBDone']:         line[48] = 1
-            if pdata[p]['foldToStreet2CBChance']:       line[49] = 1
-            if pdata[p]['foldToStreet2CBDone']:         line[50] = 1
-            if pdata[p]['foldToStreet3CBChance']:       line[51] = 1
-            if pdata[p]['foldToStreet3CBDone']:         line[52] = 1
-            if pdata[p]['foldToStreet4CBChance']:       line[53] = 1
-            if pdata[p]['foldToStreet4CBDone']:         line[54] = 1
-            line[55] = pdata[p]['totalProfit']
-            if pdata[p]['street1CheckCallRaiseChance']: line[56] = 1
-            if pdata[p]['street1CheckCallRaiseDone']:   line[57] = 1
-            if pdata[p]['street2CheckCallRaiseChance']: line[58] = 1
-            if pdata[p]['street2CheckCallRaiseDone']:   line[59] = 1
-            if pdata[p]['street3CheckCallRaiseChance']: line[60] = 1
-            if pdata[p]['street3CheckCallRaiseDone']:   line[61] = 1
-            if pdata[p]['street4CheckCallRaiseChance']: line[62] = 1
-            if pdata[p]['street4CheckCallRaiseDone']:   line[63] = 1
-            if pdata[p]['street0Calls']:                line[64] = 1
-            if pdata[p]['street1Calls']:                line[65] = 1
-            if pdata[p]['street2Calls']:                line[66] = 1
-            if pdata[p]['street3Calls']:                line[67] = 1
-            if pdata[p]['street4Calls']:                line[68] = 1
-            if pdata[p]['street0Bets']:                 line[69] = 1
-            if pdata[p]['street1Bets']:                 line[70] = 1
-            if pdata[p]['street2Bets']:                 line[71] = 1
-            if pdata[p]['street3Bets']:                 line[72] = 1
-            if pdata[p]['street4Bets']:                 line[73] = 1
-            if pdata[p]['street0Raises']:               line[74] = 1
-            if pdata[p]['street1Raises']:               line[75] = 1
-            if pdata[p]['street2Raises']:               line[76] = 1
-            if pdata[p]['street3Raises']:               line[77] = 1
-            if pdata[p]['street4Raises']:               line[78] = 1
-
-            line[79] = gid    # gametypeId
-            line[80] = pids[p]    # playerId
-            line[81] = len(pids)    # activeSeats
-            pos = {'B':'B', 'S':'S', 0:'D', 1:'C', 2:'M', 3:'M', 4:'M', 5:'E', 6:'E', 7:'E', 8:'E', 9:'E' }
-            line[82] = pos[pdata[p]['position']]
-            line[83] = pdata[p]['tourneyTypeId']
-            line[84] = styleKey    # styleKey
-            inserts.append(line)
+            line = pdata[p].hudCacheLine()
+            # gametypeId, playerId, activeSeats, position, tourneyTypeId, styleKey
+            key = (gid, pids[p], len(pids), pos[pdata[p].position], pdata[p].tourneyTypeId, styleKey)
 
+            # sum the hands with the same key, so each key is written just once
+            if key in self.hcbulk:
+                self.hcbulk[key] = [x + y for (x, y) in zip(self.hcbulk[key], line)]
+            else:
+                self.hcbulk[key] = line
 
-        cursor = self.get_cursor()
+    def flushHudCache(self):
+        """Write the totals collected by storeHudCache(). The keys already in
+           HudCache are read first, those rows are updated and the rest inserted."""
+        ph = self.sql.query['placeholder']
+        pids = list(set([k[1] for k in self.hcbulk]))
+        styleKeys = list(set([k[5] for k in self.hcbulk]))
 
-        for row in inserts:
-            # Try to do the update first:
-            num = cursor.execute(update_hudcache, row)
-            #print "DEBUG: values: %s" % row[-6:]
-            # Test statusmessage to see if update worked, do insert if not
-            # num is a cursor in sqlite
-            if ((self.backend == self.PGSQL and cursor.statusmessage != "UPDATE 1")
-                    or (self.backend == self.MYSQL_INNODB and num == 0)
-                    or (self.backend == self.SQLITE and num.rowcount == 0)):
-                #move the last 6 items in WHERE clause of row from the end of the array
-                # to the beginning for the INSERT statement
-                #print "DEBUG: using INSERT: %s" % num
-                row = row[-6:] + row[:-6]
-                num = cursor.execute(insert_hudcache, row)
-                #print "DEBUG: Successfully(?: %s) updated HudCacho using INSERT" % num
+        c = self.get_cursor()
+        ids = {}
+        # in chunks, older sqlite builds take at most 999 parameters in a query
+        for i in xrange(0, len(pids), 500):
+            for j in xrange(0, len(styleKeys), 400):
+                (p, s) = (pids[i:i+500], styleKeys[j:j+400])
+                q = self.sql.query['get_hudcache_keys']
+                q = q.replace('<playerid_list>', '(' + ','.join([ph] * len(p)) + ')')
+                q = q.replace('<stylekey_list>', '(' + ','.join([ph] * len(s)) + ')')
+                c.execute(q, p + s)
+                for row in c.fetchall():
+                    ids.setdefault(tuple(row[1:]), row[0])
+
+        updates = []
+        inserts = []
+        for key, line in self.hcbulk.iteritems():
+            if key in ids:
+                updates.append(line + [ids[key]])
             else:
-                #print "DEBUG: Successfully updated HudCacho using UPDATE"
-                pass
+                inserts.append(list(key) + line)
+        if updates:
+            c.executemany(self.prepare('update_hudcache_by_id'), updates)
+        if inserts:
+            c.executemany(self.prepare('insert_hudcache'), inserts)
+        self.hcbulk = {}
+
+    def storeSessionHand(self, pid, starttime):
+        """Note a cash game hand of the hero, the hero's sessions around it are
+           split again by flushSessions() on commit."""
+        starttime = self.to_datetime(starttime)
+        if pid in self.sessionbulk:
+            times = self.sessionbulk[pid]
+            if starttime < times[0]:
+                times[0] = starttime
+            elif starttime > times[1]:
+                times[1] = starttime
+        else:
+            self.sessionbulk[pid] = [starttime, starttime]
+
+    def flushSessions(self):
+        """Replace the sessions of each player in self.sessionbulk that are within
+           session_gap of the new hands, by splitting all the player's hands from
+           the first of those sessions (or new hands) to the last into sessions again."""
+        c = self.get_cursor()
+        # a second more either side, sqlite compares the times as text and some
+        # are stored with a '+00:00' suffix
+        gap = timedelta(seconds = self.session_gap + 1)
+        second = timedelta(seconds = 1)
+        for (pid, (first, last)) in self.sessionbulk.iteritems():
+            c.execute(self.sql.query['getSessionsRange'], (pid, first - gap, last + gap))
+            (start, end) = c.fetchone()
+            if start is not None:
+                c.execute(self.sql.query['deleteSessionsRange'], (pid, first - gap, last + gap))
+                first = min(first, self.to_datetime(start))
+                last = max(last, self.to_datetime(end))
+            c.execute(self.sql.query['getSessionHands'], (pid, first, last + second))
+            c.executemany(self.prepare('insertSession'), self.split_sessions(pid, c.fetchall()))
+        self.sessionbulk = {}
+
+    def split_sessions(self, pid, hands):
+        """Returns the Sessions rows of hands, a list of (startTime, totalProfit)
+           in time order: a new session starts after more than session_gap
+           seconds without a hand."""
+        sessions = []
+        last = None
+        for (starttime, profit) in hands:
+            t = self.to_seconds(starttime)
+            if last is None or t - last > self.session_gap:
+                # playerId, sessionStart, sessionEnd, hands, totalProfit, highProfit, lowProfit
+                session = [pid, starttime, starttime, 0, 0, 0, 0]
+                sessions.append(session)
+            last = t
+            session[2] = starttime
+            session[3] += 1
+            session[4] += profit or 0
+            if session[4] > session[5]:
+                session[5] = session[4]
+            elif session[4] < session[6]:
+                session[6] = session[4]
+        return sessions
+
+    def to_datetime(self, t):
+        """A startTime as a naive UTC datetime, sqlite returns the text"""
+        if isinstance(t, basestring):
+            return datetime.strptime(t[:19], '%Y-%m-%d %H:%M:%S')
+        if t.tzinfo is not None:
+            return t.replace(tzinfo = None) - t.utcoffset()
+        return t
+
+    def to_seconds(self, t):
+        """A startTime in seconds since the epoch"""
+        return calendar.timegm(self.to_datetime(t).timetuple())
+
+    def rebuild_sessions(self):
+        """Clears the Sessions table and splits all the hero's cash game hands
+           into sessions again"""
+        c = self.get_cursor()
+        c.execute(self.sql.query['clearSessions'])
+        for site in self.config.get_supported_sites():
+            result = self.get_site_id(site)
+            if not result:
+                continue
+            pid = self.get_player_id(self.config, site, self.config.supported_sites[site].screen_name)
+            if pid:
+                c.execute(self.sql.query['getPlayerRingRange'], (pid,))
+                (first, last) = c.fetchone()
+                if first is not None:
+                    self.sessionbulk[int(pid)] = [self.to_datetime(first), self.to_datetime(last)]
+        self.flushSessions()
+
+    def loadHandIndex(self):
+        """Load the (gametypeId, siteHandNo) of every stored hand, so isDuplicate()
+           can answer without a query. storeHand() keeps it up to date."""
+        c = self.get_cursor()
+        c.execute(self.sql.query['getHandIndex'])
+        self.hand_index = HandIndex()
+        rows = c.fetchmany(10000)
+        while rows:
+            self.hand_index.load(rows)
+            rows = c.fetchmany(10000)
+        log.info(_("Loaded duplicate index of %d hands") % len(self.hand_index))
+
+    def getFileOffset(self, file, inode):
+        """Returns the byte offset up to which file has been imported, or 0. inode
+           tells a file apart from an older one of the same name."""
+        c = self.get_cursor()
+        c.execute(self.sql.query['getFileOffset'], (file, inode))
+        row = c.fetchone()
+        return row[0] if row else 0
+
+    def get_generation(self):
+        """Returns Settings.generation, bumped whenever hands are imported"""
+        c = self.get_cursor()
+        c.execute(self.sql.query['get_generation'])
+        return c.fetchone()[0]
+
+    def bump_generation(self):
+        """Tell readers of the database that its hands have changed, committed with them"""
+        c = self.get_cursor()
+        c.execute(self.sql.query['bump_generation'])
+
+    def fetch_report(self, query):
+        """Runs a (read-only) report query and returns (column names, rows). Results are
+           kept until the generation changes, so showing the same report again only costs
+           a read of Settings."""
+        generation = self.get_generation()
+        if generation != self.report_generation:
+            self.report_cache = {}
+            self.report_generation = generation
+        if query not in self.report_cache:
+            c = self.get_cursor()
+            c.execute(query)
+            colnames = [desc[0].lower() for desc in c.description]
+            self.report_cache[query] = (colnames, c.fetchall())
+        return self.report_cache[query]
+
+    def storeFileOffset(self, file, inode, offset):
+        """Remember how far file has been imported, committed with its hands"""
+        c = self.get_cursor()
+        c.execute(self.sql.query['updateFileOffset'], (offset, file, inode))
+        if c.rowcount == 0:
+            c.execute(self.sql.query['insertFileOffset'], (offset, file, inode))
 
     def isDuplicate(self, gametypeID, siteHandNo):
+        if (gametypeID, siteHandNo) in self.hbulk_keys:
+            return True
+        if self.hand_index is not None:
+            dup = self.hand_index.contains(gametypeID, siteHandNo)
+            if dup is not None:
+                return dup
         dup = False
         c = self.get_cursor()
-        c.execute(self.sql.query['isAlreadyInDB'], (gametypeID, siteHandNo))
+        c.execute(self.prepare('isAlreadyInDB'), (gametypeID, siteHandNo))
         result = c.fetchall()
         if len(result) > 0:
             dup = True
         return dup
 
     def getGameTypeId(self, siteid, game):
+        key = (siteid, game['type'], game['base'], game['category'], game['limitType'], game['currency'], game['sb'], game['bb'])
+        if key not in self.gtcache:
+            self.gtcache[key] = self.findOrInsertGameType(siteid, game)
+            self.meta_new.append((self.gtcache, key))
+        return self.gtcache[key]
+
+    def findOrInsertGameType(self, siteid, game):
         c = self.get_cursor()
         #FIXME: Fixed for NL at the moment
         c.execute(self.sql.query['getGametypeNL'], (siteid, game['type'], game['category'], game['limitType'], game['currency'],
@@ -1979,23 +2288,84 @@ class Database:
         return tmp[0]
 
     def resetPlayerIDs(self):
-        self.pcache = None
+        self.pcache.clear()
+        self.pnew = {}
+
+    def resetCaches(self):
+        """Forget the ids and hands cached from the db, after its tables have been
+           recreated (by this or another Database object)"""
+        self.resetPlayerIDs()
+        self.resetMetaIDs()
+        self.hand_index = None
+        self.report_cache = {}
+        self.report_generation = None
+
+    def resetMetaIDs(self):
+        """Forget the Gametypes, TourneyTypes, Tourneys and TourneysPlayers ids looked
+           up or inserted so far, each is only queried once while they are cached."""
+        self.gtcache     = {}       # (siteId, gametype values) -> Gametypes.id
+        self.ttcache     = {}       # (siteId, tourNo) -> TourneyTypes.id
+        self.tcache      = {}       # (siteId, tourNo) -> Tourneys.id
+        self.tpcache     = {}       # (tourneyId, playerId) -> TourneysPlayers.id
+        self.meta_new    = []       # (cache, key) of the ids added since the last commit
+
+    def loadPlayerIDs(self):
+        """Load the ids of all players into the player id cache, if not already done
+           in this process."""
+        if self.pcache.loaded:
+            return
+        c = self.get_cursor()
+        c.execute(self.sql.query['getPlayerIDs'])
+        rows = c.fetchmany(10000)
+        while rows:
+            for (siteid, name, pid) in rows:
+                self.pcache.add(siteid, name, pid)
+            rows = c.fetchmany(10000)
+        self.pcache.loaded = True
+        log.info(_("Loaded %d player ids") % len(self.pcache))
 
     def getSqlPlayerIDs(self, pnames, siteid):
+        """Returns a dict of name -> Players.id, inserting the players that are new.
+           Names not in the cache are looked up with one query, and the new ones
+           are added with one insert."""
         result = {}
-        if(self.pcache == None):
-            self.pcache = LambdaDict(lambda  key:self.insertPlayer(key[0], key[1]))
-
+        missing = []
         for player in pnames:
-            result[player] = self.pcache[(player,siteid)]
-            # NOTE: Using the LambdaDict does the same thing as:
-            #if player in self.pcache:
-            #    #print "DEBUG: cachehit"
-            #    pass
-            #else:
-            #    self.pcache[player] = self.insertPlayer(player, siteid)
-            #result[player] = self.pcache[player]
+            pid = self.pcache.get(siteid, player)
+            if pid is None:
+                pid = self.pnew.get((siteid, player_key(player)))
+            if pid is None:
+                if player not in missing:   # some histories list a player twice
+                    missing.append(player)
+            else:
+                result[player] = pid
+        if missing:
+            result.update(self.insertPlayers(missing, siteid))
+        return result
 
+    def insertPlayers(self, names, siteid):
+        """Returns a dict of name -> Players.id for names, inserting those not in the db"""
+        c = self.get_cursor()
+        q = self.sql.query['getPlayerIDsByName'].replace('<names>', ','.join([self.sql.query['placeholder']] * len(names)))
+        c.execute(q, [siteid] + [Charset.to_db_utf8(name) for name in names])
+        rows = c.fetchall()
+        found = dict([(player_key(name), pid) for (name, pid) in rows])
+        new = [name for name in names if player_key(name) not in found]
+        if new and len(rows) > len(names) - len(new):
+            # the db matched names that aren't equal to ours (eg. a case insensitive
+            # collation), let insertPlayer() sort out each new one
+            for name in new:
+                found[player_key(name)] = self.insertPlayer(name, siteid)
+        elif new:
+            self.insertMany(self.sql.query['insertPlayer'], [(Charset.to_db_utf8(name), siteid) for name in new])
+            q = self.sql.query['getPlayerIDsByName'].replace('<names>', ','.join([self.sql.query['placeholder']] * len(new)))
+            c.execute(q, [siteid] + [Charset.to_db_utf8(name) for name in new])
+            for (name, pid) in c.fetchall():
+                found[player_key(name)] = pid
+        result = {}
+        for name in names:
+            result[name] = found[player_key(name)]
+            self.pnew[(siteid, player_key(name))] = result[name]
         return result
 
     def insertPlayer(self, name, site_id):
@@ -2114,6 +2484,13 @@ class Database:
     # end def send_finish_msg():
 
     def createTourneyType(self, hand):#note: this method is used on Hand and TourneySummary objects
+        key = (hand.siteId, hand.tourNo)
+        if key not in self.ttcache:
+            self.ttcache[key] = self.findOrInsertTourneyType(hand)
+            self.meta_new.append((self.ttcache, key))
+        return self.ttcache[key]
+
+    def findOrInsertTourneyType(self, hand):
         tourneyTypeId = 1
 
         # Check if Tourney exists, and if so retrieve TTypeId : in that case, check values of the ttype
@@ -2149,9 +2526,12 @@ class Database:
                                 )
                 tourneyTypeId = self.get_last_insert_id(cursor)
         return tourneyTypeId
-    #end def createTourneyType
+    #end def findOrInsertTourneyType
 
     def createOrUpdateTourney(self, hand, source):#note: this method is used on Hand and TourneySummary objects
+        key = (hand.siteId, hand.tourNo)
+        if source=="HHC" and key in self.tcache:
+            return self.tcache[key]     # hand histories never update a known tourney
         cursor = self.get_cursor()
         cursor.execute (self.sql.query['getTourneyByTourneyNo'].replace('%s', self.sql.query['placeholder']),
                         (hand.siteId, hand.tourNo))
@@ -2194,10 +2574,14 @@ class Database:
             else:
                 raise FpdbParseError(_("invalid source in Database.createOrUpdateTourney"))
             tourneyId = self.get_last_insert_id(cursor)
+        self.tcache[key] = tourneyId
+        self.meta_new.append((self.tcache, key))
         return tourneyId
     #end def createOrUpdateTourney
 
     def createOrUpdateTourneysPlayers(self, hand, source):#note: this method is used on Hand and TourneySummary objects
+        if source=="HHC":
+            return self.createTourneysPlayers(hand)
         tourneysPlayersIds={}
         for player in hand.players:
             if source=="TS": #TODO remove this horrible hack
@@ -2251,6 +2635,38 @@ class Database:
         return tourneysPlayersIds
     #end def createOrUpdateTourneysPlayers
 
+    def createTourneysPlayers(self, hand):
+        """createOrUpdateTourneysPlayers() for a hand history, which only adds the players
+           that are missing. Players not cached are looked up with one query and the new
+           ones inserted together."""
+        tourneysPlayersIds = {}
+        missing = []
+        for player in hand.players:
+            playerId = hand.dbid_pids[player[1]]
+            if (hand.tourneyId, playerId) in self.tpcache:
+                tourneysPlayersIds[player[1]] = self.tpcache[(hand.tourneyId, playerId)]
+            elif playerId not in missing:   # some histories list a player twice
+                missing.append(playerId)
+        if missing:
+            cursor = self.get_cursor()
+            q = self.sql.query['getTourneysPlayersByPlayers']
+            cursor.execute(q.replace('<players>', ','.join([self.sql.query['placeholder']] * len(missing))),
+                           [hand.tourneyId] + missing)
+            found = dict(cursor.fetchall())
+            new = [playerId for playerId in missing if playerId not in found]
+            if new:
+                self.insertMany(self.sql.query['insertTourneysPlayer'],
+                                [(hand.tourneyId, playerId, None, None, None, None, None, None) for playerId in new])
+                cursor.execute(q.replace('<players>', ','.join([self.sql.query['placeholder']] * len(new))),
+                               [hand.tourneyId] + new)
+                found.update(dict(cursor.fetchall()))
+            for playerId in missing:
+                self.tpcache[(hand.tourneyId, playerId)] = found[playerId]
+                self.meta_new.append((self.tpcache, (hand.tourneyId, playerId)))
+            for player in hand.players:
+                tourneysPlayersIds[player[1]] = self.tpcache[(hand.tourneyId, hand.dbid_pids[player[1]])]
+        return tourneysPlayersIds
+
     def getTourneyTypesIds(self):
         c = self.connection.cursor()
         c.execute(self.sql.query['getTourneyTypesIds'])
@@ -2438,14 +2854,148 @@ if __name__=="__main__":
     sys.stdin.readline()
 
 #Code borrowed from http://push.cx/2008/caching-dictionaries-in-python-vs-ruby
-class LambdaDict(dict):
-    def __init__(self, l):
-        super(LambdaDict, self).__init__()
-        self.l = l
-
-    def __getitem__(self, key):
-        if key in self:
-            return self.get(key)
-        else:
-            self.__setitem__(key, self.l(key))
-            return self.get(key)
+def exact_hand_no(hno):
+    """hno as a long if a double holds it exactly, else None"""
+    try:
+        n = long(hno)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(hno, basestring) and n != hno:
+        return None     # not a whole number
+    if not -2**53 < n < 2**53:
+        return None
+    return n
+
+class HandIndex:
+    """(gametypeId, siteHandNo) of stored hands. The hand numbers loaded from the
+       db are kept in a sorted array of doubles per gametype (8 bytes a hand), hands
+       stored since then go in a set. Doubles are only exact below 2**53, for larger
+       or fractional hand numbers contains() returns None and the db has to be asked."""
+    def __init__(self):
+        self.hands = {}     # gametypeId -> array of siteHandNo, sorted
+        self.added = set()
+        self.pending = []   # hands added since the last commit
+
+    def load(self, rows):
+        """Append rows of (gametypeId, siteHandNo), which must come in that order"""
+        for (gtid, hno) in rows:
+            if exact_hand_no(hno) is None:
+                continue    # never looked up here
+            if gtid not in self.hands:
+                self.hands[gtid] = array('d')
+            self.hands[gtid].append(hno)
+
+    def add(self, gtid, hno):
+        n = exact_hand_no(hno)
+        if n is not None:
+            self.added.add((gtid, n))
+            self.pending.append((gtid, n))
+
+    def commit(self):
+        self.pending = []
+
+    def rollback(self):
+        self.added.difference_update(self.pending)
+        self.pending = []
+
+    def contains(self, gtid, hno):
+        """True or False, or None if hno can't be looked up in the index"""
+        n = exact_hand_no(hno)
+        if n is None:
+            return None
+        if (gtid, n) in self.added:
+            return True
+        a = self.hands.get(gtid)
+        if a is None:
+            return False
+        i = bisect_left(a, n)
+        return i < len(a) and a[i] == n
+
+    def __len__(self):
+        return sum(len(a) for a in self.hands.itervalues()) + len(self.added)
+
+class SessionStats:
+    """The hands of the current session at one table for the HUD's 'S' stats.
+       Hands are kept oldest first in a ring buffer with running totals per player
+       and number of seats, so adding a hand or dropping an old one costs O(players)."""
+    def __init__(self, gap, max_hands, names):
+        self.gap = timedelta(minutes = gap)
+        self.max_hands = max_hands  # 0 is no limit
+        self.names = names          # stats that are summed
+        self.hands = deque()        # (hand_id, rows) of the session
+        self.totals = {}            # playerId -> seats -> {stat: total}
+        self.last_time = None
+        self.last_hand = 0
+
+    def add(self, hand_id, rows):
+        """Add the get_stats_delta_from_hand rows of the next hand at this table"""
+        hand_id = int(hand_id)
+        if hand_id <= self.last_hand or not rows:
+            return
+        start_time = datetime.strptime(str(rows[0]['start_time'])[:19], "%Y-%m-%d %H:%M:%S")
+        if self.last_time is not None and start_time - self.last_time > self.gap:
+            self.hands.clear()
+            self.totals = {}
+        self.last_time, self.last_hand = start_time, hand_id
+        self.hands.append((hand_id, rows))
+        self.sum(rows, 1)
+        while self.max_hands and len(self.hands) > self.max_hands:
+            self.sum(self.hands.popleft()[1], -1)
+
+    def sum(self, rows, sign):
+        for d in rows:
+            seats = self.totals.setdefault(d['player_id'], {})
+            t = seats.get(d['seats'])
+            if t is None:
+                t = seats[d['seats']] = dict.fromkeys(self.names, 0)
+            for name in self.names:
+                t[name] += sign * int(d[name] or 0)
+            if t['n'] == 0:
+                del seats[d['seats']]
+
+    def get(self, d, seats_min, seats_max):
+        """Return the session stats of the player in row d of the latest hand, or
+           None if there are none within the seats limits"""
+        stats = None
+        for (seats, t) in self.totals.get(d['player_id'], {}).iteritems():
+            if seats_min <= seats <= seats_max:
+                if stats is None:
+                    stats = dict.fromkeys(self.names, 0)
+                for name in self.names:
+                    stats[name] += t[name]
+        if stats is not None:
+            for name in ('player_id', 'seat', 'screen_name', 'seats'):
+                stats[name] = d[name]
+            stats['hand_id'] = self.last_hand
+        return stats
+
+# Players.id caches by (db_server, host, database), shared by all Database objects in the process
+player_ids = {}
+
+def player_key(name):
+    """The form player names are kept in the caches: interned utf-8 strings"""
+    if isinstance(name, unicode):
+        name = name.encode('utf-8')
+    return intern(name)
+
+class PlayerIDs:
+    """Players.id by siteId and name. Names are kept as interned utf-8 strings,
+       so each player costs little more than its name and one dict entry."""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ids = {}       # siteId -> {name: id}
+        self.loaded = False
+
+    def add(self, siteid, name, pid):
+        self.ids.setdefault(siteid, {})[player_key(name)] = pid
+
+    def get(self, siteid, name):
+        site = self.ids.get(siteid)
+        if site is None:
+            return None
+        return site.get(player_key(name))
+
+    def __len__(self):
+        return sum(len(site) for site in self.ids.itervalues())
@@ -17,12 +17,117 @@
 
 #fpdb modules
 import Card
-from decimal import Decimal
+from operator import itemgetter
 
 import logging
 # logging has been set up in fpdb.py or HUD_main.py, use their settings:
 log = logging.getLogger("parser")
 
+def streets(name, first=0):
+    return tuple([name % i for i in range(first, 5)])
+
+# The HandsPlayers columns in the order of the store_hands_players insert (after
+# handId and playerId), each with its value before the hand has been looked at.
+# Vars that may not be used still need to be inserted, eg. all the stud street4
+# ones when importing holdem.
+HANDSPLAYERS_COLUMNS = (
+      ('startCash', 0), ('seatNo', None), ('sitout', False)
+    , ('card1', 0), ('card2', 0), ('card3', 0), ('card4', 0), ('card5', 0), ('card6', 0), ('card7', 0)
+    , ('winnings', 0), ('rake', 0), ('totalProfit', 0), ('street0VPI', False)) + tuple(
+      [(c, False) for c in streets('street%dSeen', 1)]) + (
+      ('sawShowdown', False), ('wonAtSD', 0.0)) + tuple(
+      [(c, False) for c in streets('street%dAggr')]
+    + [(c, False) for c in streets('street%dCBChance', 1)]
+    + [(c, False) for c in streets('street%dCBDone', 1)]
+    + [(c, 0.0) for c in streets('wonWhenSeenStreet%d', 1)]
+    + [(c, 0) for c in streets('street%dCalls')]
+    + [(c, 0) for c in streets('street%dBets')]) + (
+      ('position', 2), ('tourneysPlayersIds', None), ('startCards', 0)
+    , ('street0_3BChance', False), ('street0_3BDone', False)
+    , ('street0_4BChance', False), ('street0_4BDone', False)    #FIXME: this might not actually be implemented
+    , ('other3BStreet0', False), ('other4BStreet0', False)) + tuple(     #FIXME: this is incomplete
+      [(c, False) for c in streets('otherRaisedStreet%d')]
+    + [(c, False) for c in streets('foldToOtherRaisedStreet%d')]) + (
+      ('raiseFirstInChance', False), ('raisedFirstIn', False)
+    , ('foldBbToStealChance', False), ('foldedBbToSteal', False)
+    , ('foldSbToStealChance', False), ('foldedSbToSteal', False)) + tuple(
+      [(c, False) for i in range(1, 5) for c in ('foldToStreet%dCBChance' % i, 'foldToStreet%dCBDone' % i)]
+    + [(c, False) for i in range(1, 5) for c in ('street%dCheckCallRaiseChance' % i, 'street%dCheckCallRaiseDone' % i)]
+    + [(c, 0) for c in streets('street%dRaises')])
+
+# The stats summed into HudCache, in the order of its columns after HDs. Those
+# in HUDCACHE_TOTALS are added as they are, for the others HudCache counts the
+# hands where they are set.
+HUDCACHE_COLUMNS = (('street0VPI', 'street0Aggr', 'street0_3BChance', 'street0_3BDone', 'street0_4BChance'
+                    , 'street0_4BDone', 'other3BStreet0', 'other4BStreet0')
+                    + streets('street%dSeen', 1) + ('sawShowdown',) + streets('street%dAggr', 1)
+                    + streets('otherRaisedStreet%d') + streets('foldToOtherRaisedStreet%d')
+                    + streets('wonWhenSeenStreet%d', 1) + ('wonAtSD', 'raiseFirstInChance', 'raisedFirstIn'
+                    , 'foldBbToStealChance', 'foldedBbToSteal', 'foldSbToStealChance', 'foldedSbToSteal')
+                    + tuple([c for i in range(1, 5) for c in ('street%dCBChance' % i, 'street%dCBDone' % i)])
+                    + tuple([c for i in range(1, 5) for c in ('foldToStreet%dCBChance' % i, 'foldToStreet%dCBDone' % i)])
+                    + ('totalProfit',)
+                    + tuple([c for i in range(1, 5) for c in ('street%dCheckCallRaiseChance' % i, 'street%dCheckCallRaiseDone' % i)])
+                    + streets('street%dCalls') + streets('street%dBets') + streets('street%dRaises'))
+HUDCACHE_TOTALS = streets('wonWhenSeenStreet%d', 1) + ('wonAtSD', 'totalProfit')
+
+class HandsPlayer(list):
+    """The stats of one player in a hand, as the HandsPlayers row they are stored in:
+       a list of the values in the order of the insert's columns (then tourneyTypeId,
+       which HudCache needs). The columns can also be used by name, as attributes."""
+    __slots__ = ()
+    columns  = tuple([c for (c, default) in HANDSPLAYERS_COLUMNS]) + ('tourneyTypeId',)
+    defaults = tuple([default for (c, default) in HANDSPLAYERS_COLUMNS]) + (None,)
+
+    def __init__(self, values = None):
+        list.__init__(self, self.defaults if values is None else values)
+
+    def insertValues(self):
+        """Returns the values of the HandsPlayers columns, in insert order"""
+        return tuple(self[:NUM_INSERTED])
+
+    def hudCacheLine(self):
+        """Returns the values this row adds to its HudCache row, starting with HDs"""
+        values = hudcache_values(self[:])   # much quicker on the plain list
+        line = [1] + [1 if v else 0 for v in values]
+        for i in HUDCACHE_TOTALS_POS:
+            line[i + 1] = values[i]
+        return line
+
+    def items(self):
+        return zip(self.columns, self)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+def column(i):
+    def set(self, value):
+        self[i] = value
+    return property(itemgetter(i), set)
+
+for (i, c) in enumerate(HandsPlayer.columns):
+    setattr(HandsPlayer, c, column(i))
+
+NUM_INSERTED = len(HANDSPLAYERS_COLUMNS)
+COLUMN = dict([(c, i) for (i, c) in enumerate(HandsPlayer.columns)])
+hudcache_values = itemgetter(*[COLUMN[c] for c in HUDCACHE_COLUMNS])
+HUDCACHE_TOTALS_POS = [i for (i, c) in enumerate(HUDCACHE_COLUMNS) if c in HUDCACHE_TOTALS]
+
+def street_columns(name):
+    return tuple([COLUMN.get(c) for c in streets(name)])
+
+# HandsPlayer indexes of the columns looked up by street number
+SEEN        = street_columns('street%dSeen')
+AGGR        = street_columns('street%dAggr')
+CALLS       = street_columns('street%dCalls')
+BETS        = street_columns('street%dBets')
+CB_CHANCE   = street_columns('street%dCBChance')
+CB_DONE     = street_columns('street%dCBDone')
+CCR_CHANCE  = street_columns('street%dCheckCallRaiseChance')
+CCR_DONE    = street_columns('street%dCheckCallRaiseDone')
+OTHER_RAISED = street_columns('otherRaisedStreet%d')
+FOLD_TO_OTHER_RAISED = street_columns('foldToOtherRaisedStreet%d')
+
 class DerivedStats():
     def __init__(self, hand):
         self.hand = hand
@@ -34,54 +139,7 @@ class DerivedStats():
     def getStats(self, hand):
         
         for player in hand.players:
-            self.handsplayers[player[1]] = {}
-            #Init vars that may not be used, but still need to be inserted.
-            # All stud street4 need this when importing holdem
-            self.handsplayers[player[1]]['winnings']    = 0
-            self.handsplayers[player[1]]['rake']        = 0
-            self.handsplayers[player[1]]['totalProfit'] = 0
-            self.handsplayers[player[1]]['street4Seen'] = False
-            self.handsplayers[player[1]]['street4Aggr'] = False
-            self.handsplayers[player[1]]['wonWhenSeenStreet1'] = 0.0
-            self.handsplayers[player[1]]['sawShowdown'] = False
-            self.handsplayers[player[1]]['wonAtSD']     = 0.0
-            self.handsplayers[player[1]]['startCards']  = 0
-            self.handsplayers[player[1]]['position']            = 2
-            self.handsplayers[player[1]]['street0_3BChance']    = False
-            self.handsplayers[player[1]]['street0_3BDone']      = False
-            self.handsplayers[player[1]]['street0_4BChance']    = False #FIXME: this might not actually be implemented
-            self.handsplayers[player[1]]['street0_4BDone']      = False #FIXME: this might not actually be implemented
-            self.handsplayers[player[1]]['raiseFirstInChance']  = False
-            self.handsplayers[player[1]]['raisedFirstIn']       = False
-            self.handsplayers[player[1]]['foldBbToStealChance'] = False
-            self.handsplayers[player[1]]['foldSbToStealChance'] = False
-            self.handsplayers[player[1]]['foldedSbToSteal']     = False
-            self.handsplayers[player[1]]['foldedBbToSteal']     = False
-            self.handsplayers[player[1]]['tourneyTypeId']       = None
-            
-            for i in range(5): 
-                self.handsplayers[player[1]]['street%dCalls' % i] = 0
-                self.handsplayers[player[1]]['street%dBets' % i] = 0
-                self.handsplayers[player[1]]['street%dRaises' % i] = 0
-            for i in range(1,5):
-                self.handsplayers[player[1]]['street%dCBChance' %i] = False
-                self.handsplayers[player[1]]['street%dCBDone' %i] = False
-                self.handsplayers[player[1]]['street%dCheckCallRaiseChance' %i] = False
-                self.handsplayers[player[1]]['street%dCheckCallRaiseDone' %i]   = False
-                self.handsplayers[player[1]]['otherRaisedStreet%d' %i]          = False
-                self.handsplayers[player[1]]['foldToOtherRaisedStreet%d' %i]    = False
-            
-            #FIXME - Everything below this point is incomplete.
-            self.handsplayers[player[1]]['other3BStreet0']              = False
-            self.handsplayers[player[1]]['other4BStreet0']              = False
-            self.handsplayers[player[1]]['otherRaisedStreet0']          = False
-            self.handsplayers[player[1]]['foldToOtherRaisedStreet0']    = False
-            for i in range(1,5):
-                self.handsplayers[player[1]]['foldToStreet%dCBChance' %i]       = False
-                self.handsplayers[player[1]]['foldToStreet%dCBDone' %i]         = False
-            self.handsplayers[player[1]]['wonWhenSeenStreet2'] = 0.0
-            self.handsplayers[player[1]]['wonWhenSeenStreet3'] = 0.0
-            self.handsplayers[player[1]]['wonWhenSeenStreet4'] = 0.0
+            self.handsplayers[player[1]] = HandsPlayer()
 
         self.assembleHands(self.hand)
         self.assembleHandsPlayers(self.hand)
@@ -124,7 +182,7 @@ class DerivedStats():
 
         #print "DEBUG: self.getStreetTotals = (%s, %s, %s, %s, %s)" %  hand.getStreetTotals()
         totals = hand.getStreetTotals()
-        totals = [int(100*i) for i in totals]
+        totals = [int(hand.cents*i) for i in totals]
         self.hands['street1Pot']  = totals[0]
         self.hands['street2Pot']  = totals[1]
         self.hands['street3Pot']  = totals[2]
@@ -143,14 +201,15 @@ class DerivedStats():
 
         #hand.players = [[seat, name, chips],[seat, name, chips]]
         for player in hand.players:
-            self.handsplayers[player[1]]['seatNo'] = player[0]
-            self.handsplayers[player[1]]['startCash'] = int(100 * Decimal(player[2]))
-            self.handsplayers[player[1]]['sitout'] = False #TODO: implement actual sitout detection
+            hp = self.handsplayers[player[1]]
+            hp.seatNo = player[0]
+            hp.startCash = int(hand.cents * hand.money(player[2]))
+            hp.sitout = False #TODO: implement actual sitout detection
             if hand.gametype["type"]=="tour":
-                self.handsplayers[player[1]]['tourneyTypeId']=hand.tourneyTypeId
-                self.handsplayers[player[1]]['tourneysPlayersIds'] = hand.tourneysPlayersIds[player[1]]
+                hp.tourneyTypeId = hand.tourneyTypeId
+                hp.tourneysPlayersIds = hand.tourneysPlayersIds.get(player[1])
             else:
-                self.handsplayers[player[1]]['tourneysPlayersIds'] = None
+                hp.tourneysPlayersIds = None
 
         # XXX: enumerate(list, start=x) is python 2.6 syntax; 'start'
         #for i, street in enumerate(hand.actionStreets[2:], start=1):
@@ -165,38 +224,38 @@ class DerivedStats():
                 self.folds(self.hand, i)
 
         # Winnings is a non-negative value of money collected from the pot, which already includes the
-        # rake taken out. hand.collectees is Decimal, database requires cents
+        # rake taken out. hand.collectees is in hand.money units, database requires cents
         for player in hand.collectees:
-            self.handsplayers[player]['winnings'] = int(100 * hand.collectees[player])
+            hp = self.handsplayers[player]
+            hp.winnings = int(hand.cents * hand.collectees[player])
             #FIXME: This is pretty dodgy, rake = hand.rake/#collectees
             # You can really only pay rake when you collect money, but
             # different sites calculate rake differently.
             # Should be fine for split-pots, but won't be accurate for multi-way pots
-            self.handsplayers[player]['rake'] = int(100* hand.rake)/len(hand.collectees)
-            if self.handsplayers[player]['street1Seen'] == True:
-                self.handsplayers[player]['wonWhenSeenStreet1'] = 1.0
-            if self.handsplayers[player]['street2Seen'] == True:
-                self.handsplayers[player]['wonWhenSeenStreet2'] = 1.0
-            if self.handsplayers[player]['street3Seen'] == True:
-                self.handsplayers[player]['wonWhenSeenStreet3'] = 1.0
-            if self.handsplayers[player]['street4Seen'] == True:
-                self.handsplayers[player]['wonWhenSeenStreet4'] = 1.0
-            if self.handsplayers[player]['sawShowdown'] == True:
-                self.handsplayers[player]['wonAtSD'] = 1.0
+            hp.rake = int(hand.cents * hand.rake)/len(hand.collectees)
+            if hp.street1Seen == True:
+                hp.wonWhenSeenStreet1 = 1.0
+            if hp.street2Seen == True:
+                hp.wonWhenSeenStreet2 = 1.0
+            if hp.street3Seen == True:
+                hp.wonWhenSeenStreet3 = 1.0
+            if hp.street4Seen == True:
+                hp.wonWhenSeenStreet4 = 1.0
+            if hp.sawShowdown == True:
+                hp.wonAtSD = 1.0
 
         for player in hand.pot.committed:
-            self.handsplayers[player]['totalProfit'] = int(self.handsplayers[player]['winnings'] - (100*hand.pot.committed[player])- (100*hand.pot.common[player]))
+            hp = self.handsplayers[player]
+            hp.totalProfit = int(hp.winnings - (hand.cents*hand.pot.committed[player])- (hand.cents*hand.pot.common[player]))
 
         self.calcCBets(hand)
 
         for player in hand.players:
+            hp = self.handsplayers[player[1]]
             hcs = hand.join_holecards(player[1], asList=True)
-            hcs = hcs + [u'0x', u'0x', u'0x', u'0x', u'0x']
-            #for i, card in enumerate(hcs[:7], 1): #Python 2.6 syntax
-            #    self.handsplayers[player[1]]['card%s' % i] = Card.encodeCard(card)
-            for i, card in enumerate(hcs[:7]):
-                self.handsplayers[player[1]]['card%s' % (i+1)] = Card.encodeCard(card)
-            self.handsplayers[player[1]]['startCards'] = Card.calcStartCards(hand, player[1])
+            hcs = hcs + [u'0x'] * 7
+            (hp.card1, hp.card2, hp.card3, hp.card4, hp.card5, hp.card6, hp.card7) = [Card.encodeCard(card) for card in hcs[:7]]
+            hp.startCards = Card.calcStartCards(hand, player[1])
 
         self.setPositions(hand)
         self.calcCheckCallRaise(hand)
@@ -226,10 +285,10 @@ class DerivedStats():
                 self.handsactions[k]['streetActionNo'] = (j+1)
                 self.handsactions[k]['actionId'] = hand.ACTION[act[1]]
                 if act[1] not in ('discards') and len(act) > 2:
-                    self.handsactions[k]['amount'] = int(100 * act[2])
+                    self.handsactions[k]['amount'] = int(hand.cents * act[2])
                 if act[1] in ('raises', 'completes'):
-                    self.handsactions[k]['raiseTo'] = int(100 * act[3])
-                    self.handsactions[k]['amountCalled'] = int(100 * act[4])
+                    self.handsactions[k]['raiseTo'] = int(hand.cents * act[3])
+                    self.handsactions[k]['amountCalled'] = int(hand.cents * act[4])
                 if act[1] in ('discards'):
                     self.handsactions[k]['numDiscarded'] = int(act[2])
                 if act[1] in ('discards') and len(act) > 3:
@@ -259,18 +318,18 @@ class DerivedStats():
 
         # if there are > 1 sb or bb only the first is used!
         if bb:
-            self.handsplayers[bb[0]]['position'] = 'B'
+            self.handsplayers[bb[0]].position = 'B'
             if bb[0] in players:  players.remove(bb[0])
         if sb:
-            self.handsplayers[sb[0]]['position'] = 'S'
+            self.handsplayers[sb[0]].position = 'S'
             if sb[0] in players:  players.remove(sb[0])
         if bi:
-            self.handsplayers[bi[0]]['position'] = 'S'
+            self.handsplayers[bi[0]].position = 'S'
             if bi[0] in players:  players.remove(bi[0])
 
         #print "DEBUG: bb: '%s' sb: '%s' bi: '%s' plyrs: '%s'" %(bb, sb, bi, players)
         for i,player in enumerate(reversed(players)):
-            self.handsplayers[player]['position'] = i
+            self.handsplayers[player].position = i
 
     def assembleHudCache(self, hand):
         # No real work to be done - HandsPlayers data already contains the correct info
@@ -285,10 +344,7 @@ class DerivedStats():
         self.hands['playersVpi'] = len(vpipers)
 
         for player in hand.players:
-            if player[1] in vpipers:
-                self.handsplayers[player[1]]['street0VPI'] = True
-            else:
-                self.handsplayers[player[1]]['street0VPI'] = False
+            self.handsplayers[player[1]].street0VPI = player[1] in vpipers
 
     def playersAtStreetX(self, hand):
         """ playersAtStreet1 SMALLINT NOT NULL,   /* num of players seeing flop/street4/draw1 */"""
@@ -335,7 +391,7 @@ class DerivedStats():
 
         if self.hands['playersAtShowdown'] > 1:
             for player in p_in:
-                self.handsplayers[player]['sawShowdown'] = True
+                self.handsplayers[player].sawShowdown = True
 
     def streetXRaises(self, hand):
         # self.actions[street] is a list of all actions in a tuple, contining the action as the second element
@@ -363,24 +419,25 @@ class DerivedStats():
             steal_positions = (2, 1, 0)
         for action in hand.actions[hand.actionStreets[1]]:
             pname, act = action[0], action[1]
-            posn = self.handsplayers[pname]['position']
+            hp = self.handsplayers[pname]
+            posn = hp.position
             #print "\naction:", action[0], posn, type(posn), steal_attempt, act
             if posn == 'B':
                 #NOTE: Stud games will never hit this section
-                self.handsplayers[pname]['foldBbToStealChance'] = steal_attempt
-                self.handsplayers[pname]['foldedBbToSteal'] = steal_attempt and act == 'folds'
+                hp.foldBbToStealChance = steal_attempt
+                hp.foldedBbToSteal = steal_attempt and act == 'folds'
                 break
             elif posn == 'S':
-                self.handsplayers[pname]['foldSbToStealChance'] = steal_attempt
-                self.handsplayers[pname]['foldedSbToSteal'] = steal_attempt and act == 'folds'
+                hp.foldSbToStealChance = steal_attempt
+                hp.foldedSbToSteal = steal_attempt and act == 'folds'
 
             if steal_attempt and act != 'folds':
                 break
 
             if not steal_attempt and not raised and not act in ('bringin'):
-                self.handsplayers[pname]['raiseFirstInChance'] = True
+                hp.raiseFirstInChance = True
                 if act in ('bets', 'raises', 'completes'):
-                    self.handsplayers[pname]['raisedFirstIn'] = True
+                    hp.raisedFirstIn = True
                     raised = True
                     if posn in steal_positions:
                         steal_attempt = True
@@ -396,10 +453,11 @@ class DerivedStats():
         for action in hand.actions[hand.actionStreets[1]]:
             # FIXME: fill other(3|4)BStreet0 - i have no idea what does it mean
             pname, aggr = action[0], action[1] in ('raises', 'bets')
-            self.handsplayers[pname]['street0_3BChance'] = self.handsplayers[pname]['street0_3BChance'] or bet_level == 2
-            self.handsplayers[pname]['street0_4BChance'] = bet_level == 3
-            self.handsplayers[pname]['street0_3BDone'] =  self.handsplayers[pname]['street0_3BDone'] or (aggr and self.handsplayers[pname]['street0_3BChance'])
-            self.handsplayers[pname]['street0_4BDone'] =  aggr and (self.handsplayers[pname]['street0_4BChance'])
+            hp = self.handsplayers[pname]
+            hp.street0_3BChance = hp.street0_3BChance or bet_level == 2
+            hp.street0_4BChance = bet_level == 3
+            hp.street0_3BDone =  hp.street0_3BDone or (aggr and hp.street0_3BChance)
+            hp.street0_4BDone =  aggr and (hp.street0_4BChance)
             if aggr:
                 bet_level += 1
 
@@ -420,8 +478,8 @@ class DerivedStats():
             if name:
                 chance = self.noBetsBefore(hand.actionStreets[i+2], name)
                 if chance == True:
-                    self.handsplayers[name]['street%dCBChance' % (i+1)] = True
-                    self.handsplayers[name]['street%dCBDone' % (i+1)] = self.betStreet(hand.actionStreets[i+2], name)
+                    self.handsplayers[name][CB_CHANCE[i+1]] = True
+                    self.handsplayers[name][CB_DONE[i+1]] = self.betStreet(hand.actionStreets[i+2], name)
 
     def calcCheckCallRaise(self, hand):
         """Fill streetXCheckCallRaiseChance, streetXCheckCallRaiseDone
@@ -444,8 +502,8 @@ class DerivedStats():
                 elif act == 'checks' and initial_raiser is None:
                     checkers.add(pname)
                 elif initial_raiser is not None and pname in checkers:
-                    self.handsplayers[pname]['street%dCheckCallRaiseChance' % (i+1)] = True
-                    self.handsplayers[pname]['street%dCheckCallRaiseDone' % (i+1)] = act!='folds'
+                    self.handsplayers[pname][CCR_CHANCE[i+1]] = True
+                    self.handsplayers[pname][CCR_DONE[i+1]] = act!='folds'
 
     def seen(self, hand, i):
         pas = set()
@@ -453,10 +511,7 @@ class DerivedStats():
             pas.add(act[0])
 
         for player in hand.players:
-            if player[1] in pas:
-                self.handsplayers[player[1]]['street%sSeen' % i] = True
-            else:
-                self.handsplayers[player[1]]['street%sSeen' % i] = False
+            self.handsplayers[player[1]][SEEN[i]] = player[1] in pas
 
     def aggr(self, hand, i):
         aggrers = set()
@@ -473,19 +528,12 @@ class DerivedStats():
 
         for player in hand.players:
             #print "DEBUG: actionStreet[%s]: %s" %(hand.actionStreets[i+1], i)
-            if player[1] in aggrers:
-                self.handsplayers[player[1]]['street%sAggr' % i] = True
-            else:
-                self.handsplayers[player[1]]['street%sAggr' % i] = False
+            self.handsplayers[player[1]][AGGR[i]] = player[1] in aggrers
                 
         if len(aggrers)>0 and i>0:
             for playername in others:
-                self.handsplayers[playername]['otherRaisedStreet%s' % i] = True
+                self.handsplayers[playername][OTHER_RAISED[i]] = True
                 #print "otherRaised detected on handid "+str(hand.handid)+" for "+playername+" on street "+str(i)
-
-        if i > 0 and len(aggrers) > 0:
-            for playername in others:
-                self.handsplayers[playername]['otherRaisedStreet%s' % i] = True
                 #print "DEBUG: otherRaised detected on handid %s for %s on actionStreet[%s]: %s" 
                 #                           %(hand.handid, playername, hand.actionStreets[i+1], i)
 
@@ -493,20 +541,22 @@ class DerivedStats():
         callers = []
         for act in hand.actions[hand.actionStreets[i+1]]:
             if act[1] in ('calls'):
-                self.handsplayers[act[0]]['street%sCalls' % i] = 1 + self.handsplayers[act[0]]['street%sCalls' % i]
+                hp = self.handsplayers[act[0]]
+                hp[CALLS[i]] = 1 + hp[CALLS[i]]
 
     # CG - I'm sure this stat is wrong
     # Best guess is that raise = 2 bets
     def bets(self, hand, i):
         for act in hand.actions[hand.actionStreets[i+1]]:
             if act[1] in ('bets'):
-                self.handsplayers[act[0]]['street%sBets' % i] = 1 + self.handsplayers[act[0]]['street%sBets' % i]
+                hp = self.handsplayers[act[0]]
+                hp[BETS[i]] = 1 + hp[BETS[i]]
         
     def folds(self, hand, i):
         for act in hand.actions[hand.actionStreets[i+1]]:
             if act[1] in ('folds'):
-                if self.handsplayers[act[0]]['otherRaisedStreet%s' % i] == True:
-                    self.handsplayers[act[0]]['foldToOtherRaisedStreet%s' % i] = True
+                if self.handsplayers[act[0]][OTHER_RAISED[i]] == True:
+                    self.handsplayers[act[0]][FOLD_TO_OTHER_RAISED[i]] = True
                     #print "DEBUG: fold detected on handid %s for %s on actionStreet[%s]: %s"
                     #                       %(hand.handid, act[0],hand.actionStreets[i+1], i)
 
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Watches the auto import directories for changed files with inotify (Linux).
+"""
+#    Copyright 2010, the fpdb team
+
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+
+########################################################################
+
+import L10n
+_ = L10n.get_translation()
+
+#    Standard Library modules
+import os
+import sys
+import errno
+import struct
+import ctypes
+import ctypes.util
+
+import logging
+# logging has been set up in fpdb.py or HUD_main.py, use their settings:
+log = logging.getLogger("importer")
+
+#    from <sys/inotify.h>
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_CLOEXEC     = 02000000
+IN_NONBLOCK    = 04000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+CHANGED = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO
+REMOVED = IN_MOVED_FROM | IN_DELETE
+
+EVENT = struct.Struct('iIII')   # wd, mask, cookie, len; followed by len bytes of name
+
+class InotifyWatcher:
+    """The files changed in a set of directories (not their subdirectories), read
+       from a non-blocking inotify descriptor. fileno() can be given to a main
+       loop to be told when there are events."""
+    def __init__(self, libc):
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.dirs = {}          # watch descriptor -> directory
+        self.overflow = False   # events were lost, the caller should look at every file
+
+    def fileno(self):
+        return self.fd
+
+    def watch(self, dir):
+        """Start watching dir, returns False if it can't be watched"""
+        path = dir.encode(sys.getfilesystemencoding()) if isinstance(dir, unicode) else dir
+        wd = self.libc.inotify_add_watch(self.fd, path, WATCH_MASK)
+        if wd < 0:
+            log.warning(_("Could not watch %s: %s") % (dir, os.strerror(ctypes.get_errno())))
+            return False
+        self.dirs[wd] = dir
+        return True
+
+    def watching(self, dir):
+        return dir in self.dirs.values()
+
+    def read(self):
+        """Returns (changed, removed), the sets of files created, written to or moved
+           in, and deleted or moved out since the last call"""
+        changed, removed = set(), set()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except OSError, e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            pos = 0
+            while pos + EVENT.size <= len(buf):
+                (wd, mask, cookie, length) = EVENT.unpack_from(buf, pos)
+                name = buf[pos + EVENT.size:pos + EVENT.size + length].rstrip('\0')
+                pos += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    self.overflow = True
+                    continue
+                if wd not in self.dirs:
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    log.warning(_("Stopped watching %s") % self.dirs[wd])
+                    del self.dirs[wd]
+                    continue
+                if not name:
+                    continue
+                dir = self.dirs[wd]
+                if isinstance(dir, unicode):
+                    name = name.decode(sys.getfilesystemencoding(), 'replace')
+                path = os.path.join(dir, name)
+                if mask & REMOVED:
+                    changed.discard(path)
+                    removed.add(path)
+                elif mask & CHANGED:
+                    removed.discard(path)
+                    changed.add(path)
+        return (changed, removed)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def get_watcher():
+    """Returns an InotifyWatcher, or None if inotify isn't available here"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return InotifyWatcher(libc)
+    except (OSError, AttributeError), e:
+        log.info(_("inotify not available, polling for changed files: %s") % e)
+        return None
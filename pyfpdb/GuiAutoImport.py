@@ -47,6 +47,7 @@ if os.name == "nt":
 class GuiAutoImport (threading.Thread):
     def __init__(self, settings, config, sql = None, parent = None, cli = False):
         self.importtimer = 0
+        self.watchsource = 0        # io watch on the importer's inotify descriptor
         self.settings = settings
         self.config = config
         self.sql = sql
@@ -183,6 +184,25 @@ class GuiAutoImport (threading.Thread):
             return True
         return False
 
+    def watch_import(self, source, condition):
+        """Callback for the importer's file watcher, imports shortly after the first
+           change so that a burst of writes is imported in one go"""
+        self.watchsource = 0
+        if self.doAutoImportBool:
+            gobject.timeout_add(250, self.watched_import)
+        return False
+
+    def watched_import(self):
+        self.do_import()
+        self.add_watch()
+        return False
+
+    def add_watch(self):
+        """Import as soon as the watcher reports a change, rather than waiting for the
+           timer (which is kept as a fallback)"""
+        if self.doAutoImportBool and self.importer.watcher and self.watchsource == 0:
+            self.watchsource = gobject.io_add_watch(self.importer.watcher.fileno(), gobject.IO_IN, self.watch_import)
+
     def reset_startbutton(self):
         if self.pipe_to_hud is not None:
             self.startButton.set_label(_(u'  Stop _Auto Import  '))
@@ -257,11 +277,15 @@ class GuiAutoImport (threading.Thread):
                     if self.importtimer != 0:
                         gobject.source_remove(self.importtimer)
                     self.importtimer = gobject.timeout_add(interval * 1000, self.do_import)
+                    self.add_watch()
 
             else:
                 self.addText(_("\nAuto Import aborted - global lock not available"))
         else: # toggled off
             gobject.source_remove(self.importtimer)
+            if self.watchsource != 0:
+                gobject.source_remove(self.watchsource)
+                self.watchsource = 0
             self.settings['global_lock'].release()
             self.doAutoImportBool = False # do_import will return this and stop the gobject callback timer
             self.addText(_("\nStopping Auto Import - global lock released."))
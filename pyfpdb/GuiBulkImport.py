@@ -354,6 +354,10 @@ def main(argv=None):
                     help=_("Do the required conversion for FTP Archive format (ie. as provided by support"))
     parser.add_option("-t", "--testdata", action="store_true", dest="testData", default=False,
                     help=_("Output the pprinted version of the HandsPlayer hash for regresion testing"))
+    parser.add_option("-p", "--processes", dest="processes", default=0, type="int",
+                    help=_("Number of processes to parse files in (0 (default) means parse in the importing process)"))
+    parser.add_option("-b", "--batch", dest="batch", default=0, type="int",
+                    help=_("Number of hands to write to the database at a time (0 (default) means one by one)"))
     (options, argv) = parser.parse_args(args = argv)
 
     if options.usage == True:
@@ -394,6 +398,8 @@ def main(argv=None):
         importer.setDropIndexes(_("don't drop"))
         importer.setFailOnError(options.failOnError)
         importer.setThreads(-1)
+        importer.setParseProcesses(options.processes)
+        importer.setInsertBatch(options.batch)
         importer.addBulkImportImportFileOrDir(os.path.expanduser(options.filename), site=options.filtername)
         importer.setCallHud(False)
         if options.starsArchive:
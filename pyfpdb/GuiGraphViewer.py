@@ -43,7 +43,7 @@ try:
     from matplotlib.backends.backend_gtk import FigureCanvasGTK as FigureCanvas
     from matplotlib.backends.backend_gtkagg import NavigationToolbar2GTKAgg as NavigationToolbar
     from matplotlib.font_manager import FontProperties
-    from numpy import arange, cumsum
+    from numpy import arange, array, cumsum, where, concatenate, unique
     from pylab import *
 except ImportError, inst:
     print _("""Failed to load libs for graphing, graphing will not function. Please
@@ -52,6 +52,23 @@ except ImportError, inst:
          and HUD are NOT affected by this problem.""")
     print "ImportError: %s" % inst.args
 
+def downsample(line, buckets):
+    """Returns (x, y), the points of line to plot it about buckets pixels wide:
+       the lowest and highest point in each of buckets runs of hands, and the
+       first and last point, so the extremes are still drawn."""
+    n = len(line)
+    if n <= 4 * buckets:
+        return (arange(n), line)
+    size = n // buckets
+    m = buckets * size
+    blocks = line[:m].reshape(buckets, size)
+    starts = arange(0, m, size)
+    x = [starts + blocks.argmin(axis=1), starts + blocks.argmax(axis=1), [0, n - 1]]
+    if m < n:
+        x.append([m + line[m:].argmin(), m + line[m:].argmax()])
+    x = unique(concatenate(x))
+    return (x, line[x])
+
 class GuiGraphViewer (threading.Thread):
 
     def __init__(self, querylist, config, parent, debug=True):
@@ -105,6 +122,8 @@ class GuiGraphViewer (threading.Thread):
         self.fig = None
         #self.exportButton.set_sensitive(False)
         self.canvas = None
+        self.graphCache = {}        # (query, buckets) -> graph data, see getRingProfitGraph()
+        self.graphCacheHand = None  # the last hand id when graphCache was filled
 
 
         self.db.rollback()
@@ -184,7 +203,9 @@ class GuiGraphViewer (threading.Thread):
 
             #Get graph data from DB
             starttime = time()
-            (green, blue, red) = self.getRingProfitGraph(playerids, sitenos, limits, games, graphops['dspin'])
+            # the lines don't need more points than the graph is pixels wide
+            buckets = max(self.graphBox.get_allocation().width, 1000)
+            graph = self.getRingProfitGraph(playerids, sitenos, limits, games, graphops['dspin'], buckets)
             print _("Graph generated in: %s") %(time() - starttime)
 
 
@@ -194,7 +215,7 @@ class GuiGraphViewer (threading.Thread):
             # SET LABEL FOR X AXIS
             self.ax.set_ylabel(graphops['dspin'], fontsize = 12)
             self.ax.grid(color='g', linestyle=':', linewidth=0.2)
-            if green == None or green == []:
+            if graph is None:
                 self.ax.set_title(_("No Data for Player(s) Found"))
                 green = ([    0.,     0.,     0.,     0.,   500.,  1000.,   900.,   800.,
                             700.,   600.,   500.,   400.,   300.,   200.,   100.,     0.,
@@ -230,12 +251,13 @@ class GuiGraphViewer (threading.Thread):
             else:
                 self.ax.set_title(_("Profit graph for ring games"+names),fontsize=12)
 
-                #Draw plot
-                self.ax.plot(green, color='green', label=_('Hands: %d\nProfit (%s): %.2f') %(len(green),graphops['dspin'], green[-1]))
+                #Draw plot, each line is (hand numbers, cumulative profit)
+                (hands, green, blue, red) = graph
+                self.ax.plot(green[0], green[1], color='green', label=_('Hands: %d\nProfit (%s): %.2f') %(hands,graphops['dspin'], green[1][-1]))
                 if graphops['showdown'] == 'ON':
-                    self.ax.plot(blue, color='blue', label=_('Showdown (%s): %.2f') %(graphops['dspin'], blue[-1]))
+                    self.ax.plot(blue[0], blue[1], color='blue', label=_('Showdown (%s): %.2f') %(graphops['dspin'], blue[1][-1]))
                 if graphops['nonshowdown'] == 'ON':
-                    self.ax.plot(red, color='red', label=_('Non-showdown (%s): %.2f') %(graphops['dspin'], red[-1]))
+                    self.ax.plot(red[0], red[1], color='red', label=_('Non-showdown (%s): %.2f') %(graphops['dspin'], red[1][-1]))
 
                 if sys.version[0:3] == '2.5':
                     self.ax.legend(loc='upper left', shadow=True, prop=FontProperties(size='smaller'))
@@ -253,7 +275,10 @@ class GuiGraphViewer (threading.Thread):
     #end of def showClicked
 
 
-    def getRingProfitGraph(self, names, sites, limits, games, units):
+    def getRingProfitGraph(self, names, sites, limits, games, units, buckets):
+        """Returns (number of hands, total, showdown, non-showdown profit line) with
+           each line downsampled to (x, y) arrays, or None if there are no hands.
+           Results are cached until a hand is added to the db."""
 #        tmp = self.sql.query['getRingProfitAllHandsPlayerIdSite']
 #        print "DEBUG: getRingProfitGraph"
 
@@ -330,23 +355,36 @@ class GuiGraphViewer (threading.Thread):
         tmp = tmp.replace("<limit_test>", limittest)
         tmp = tmp.replace(",)", ")")
 
+        # the query text is the filter selection
+        last_hand = self.db.get_last_hand()
+        if last_hand != self.graphCacheHand:
+            self.graphCache = {}
+            self.graphCacheHand = last_hand
+        key = (tmp, buckets)
+        if key in self.graphCache:
+            self.db.rollback()
+            return self.graphCache[key]
+
         #print "DEBUG: sql query:"
         #print tmp
         self.db.cursor.execute(tmp)
-        #returns (HandId,Winnings,Costs,Profit)
+        #returns (Profit,sawShowdown)
         winnings = self.db.cursor.fetchall()
         self.db.rollback()
 
         if len(winnings) == 0:
-            return (None, None, None)
-
-        green = map(lambda x:float(x[1]), winnings)
-        blue  = map(lambda x: float(x[1]) if x[2] == True  else 0.0, winnings)
-        red   = map(lambda x: float(x[1]) if x[2] == False else 0.0, winnings)
-        greenline = cumsum(green)
-        blueline  = cumsum(blue)
-        redline   = cumsum(red)
-        return (greenline/100, blueline/100, redline/100)
+            graph = None
+        else:
+            winnings = array(winnings, dtype=float)
+            profit = winnings[:,0] / 100
+            showdown = winnings[:,1] != 0
+            greenline = cumsum(profit)
+            blueline  = cumsum(where(showdown, profit, 0.0))
+            redline   = cumsum(where(showdown, 0.0, profit))
+            graph = (len(profit), downsample(greenline, buckets), downsample(blueline, buckets),
+                     downsample(redline, buckets))
+        self.graphCache[key] = graph
+        return graph
         #end of def getRingProfitGraph
 
     def exportGraph (self, widget, data):
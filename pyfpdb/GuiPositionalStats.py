@@ -194,9 +194,7 @@ class GuiPositionalStats (threading.Thread):
 
         tmp = self.sql.query['playerStatsByPosition']
         tmp = self.refineQuery(tmp, playerids, sitenos, limits, seats, dates)
-        self.cursor.execute(tmp)
-        result = self.cursor.fetchall()
-        colnames = [desc[0].lower() for desc in self.cursor.description]
+        (colnames, result) = self.db.fetch_report(tmp)
 
         liststore = gtk.ListStore(*([str] * len(colnames)))
         view = gtk.TreeView(model=liststore)
@@ -293,10 +291,8 @@ class GuiPositionalStats (threading.Thread):
         # show totals at bottom
         tmp = self.sql.query['playerStats']
         tmp = self.refineQuery(tmp, playerids, sitenos, limits, seats, dates)
-        self.cursor.execute(tmp)
-        result = self.cursor.fetchall()
+        (colnames, result) = self.db.fetch_report(tmp)
         rows = len(result)
-        colnames = [desc[0].lower() for desc in self.cursor.description]
 
         # blank row between main stats and totals:
         col = 0
@@ -428,9 +428,8 @@ class GuiRingPlayerStats (GuiPlayerStats.GuiPlayerStats):
         tmp = self.sql.query[query]
         tmp = self.refineQuery(tmp, flags, playerids, sitenos, limits, type, seats, groups, dates, games)
         #print "DEBUG: query: %s" % tmp
-        self.cursor.execute(tmp)
-        result = self.cursor.fetchall()
-        colnames = [desc[0].lower() for desc in self.cursor.description]
+        # the refined query spells out the whole filter state, re-showing it is served from memory
+        (colnames, result) = self.db.fetch_report(tmp)
 
         # pre-fetch some constant values:
         colshow = colshowsumm
@@ -36,7 +36,7 @@ try:
     from matplotlib.backends.backend_gtkagg import NavigationToolbar2GTKAgg as NavigationToolbar
     from matplotlib.finance import candlestick2
 
-    from numpy import diff, nonzero, sum, cumsum, max, min, append
+    from numpy import array, nonzero, cumsum, append, maximum, minimum, add
 #    from matplotlib.dates import  DateFormatter, WeekdayLocator, HourLocator, \
 #     DayLocator, MONDAY, timezone
 
@@ -240,13 +240,13 @@ class GuiSessionViewer (threading.Thread):
     #end def fillStatsFrame(self, vbox):
 
     def generateDatasets(self, playerids, sitenos, limits, seats):
-        THRESHOLD = 1800                    # Minimum number of seconds between consecutive hands before being considered a new session
+        THRESHOLD = self.db.session_gap     # Minimum number of seconds between consecutive hands before being considered a new session
         PADDING   = 5                       # Additional time in minutes to add to a session, session startup, shutdown etc (FiXME: user configurable)
 
-        # Get a list of all handids and their timestampts
+        # Get the sessions of the selected players, split at import (see Database.flushSessions)
         #FIXME: Query still need to filter on blind levels
 
-        q = self.sql.query['sessionStats']
+        q = self.sql.query['getPlayerSessions']
         start_date, end_date = self.filters.getDates()
         q = q.replace("<datestest>", " between '" + start_date + "' and '" + end_date + "'")
 
@@ -254,75 +254,50 @@ class GuiSessionViewer (threading.Thread):
         nametest = nametest.replace("L", "")
         nametest = nametest.replace(",)",")")
         q = q.replace("<player_test>", nametest)
-        q = q.replace("<ampersand_s>", "%s")
 
         self.db.cursor.execute(q)
-        hands = self.db.cursor.fetchall()
-
-        # Take that list and create an array of the time between hands
-        times = map(lambda x:long(x[0]), hands)
-        handids = map(lambda x:int(x[1]), hands)
-        winnings = map(lambda x:float(x[4]), hands)
-        #print "DEBUG: len(times) %s" %(len(times))
-        diffs = diff(times)                      # This array is the difference in starttime between consecutive hands
-        diffs2 = append(diffs,THRESHOLD + 1)     # Append an additional session to the end of the diffs, so the next line
-                                                 # includes an index into the last 'session'
-        index = nonzero(diffs2 > THRESHOLD)      # This array represents the indexes into 'times' for start/end times of sessions
-                                                 # times[index[0][0]] is the end of the first session,
-        #print "DEBUG: len(index[0]) %s" %(len(index[0]))
-        if len(index[0]) > 0:
-            #print "DEBUG: index[0][0] %s" %(index[0][0])
-            #print "DEBUG: index %s" %(index)
-            pass
-        else:
-            index = [[0]]
-            #print "DEBUG: index %s" %(index)
-            #print "DEBUG: index[0][0] %s" %(index[0][0])
-            pass
-
-        total = 0
-        first_idx = 0
-        lowidx = 0
-        uppidx = 0
-        opens = []
-        closes = []
-        highs = []
-        lows = []
-        results = []
-        cum_sum = cumsum(winnings)
-        cum_sum = cum_sum/100
-        sid = 1
+        sessions = self.db.cursor.fetchall()
+        if not sessions:
+            return ([], [], [], [], [])
+
+        starts  = array([self.db.to_seconds(x[0]) for x in sessions])
+        ends    = array([self.db.to_seconds(x[1]) for x in sessions])
+        hands   = array([int(x[2]) for x in sessions])
+        profits = array([int(x[3]) for x in sessions])
+        highs   = array([int(x[4]) for x in sessions])
+        lows    = array([int(x[5]) for x in sessions])
+
+        # Sessions of different players (sites) less than THRESHOLD apart are one session
+        lastend = maximum.accumulate(ends)               # end of the latest session so far
+        first = nonzero(append(True, starts[1:] - lastend[:-1] > THRESHOLD))[0]
+                                                         # index of the first row of each session
+        last = append(first[1:], len(sessions)) - 1      # and of its last row
+
+        # Running profit, in dollars, at the start and end of each row and at its high/low water marks
+        # (the water marks are approximate where sessions of different players overlap)
+        closes = cumsum(profits) / 100.0
+        opens = closes - profits / 100.0
+        hwms = opens + highs / 100.0
+        lwms = opens + lows / 100.0
+
+        sstarts = starts[first]
+        sends = maximum.reduceat(ends, first)
+        hds = add.reduceat(hands, first)                 # Number of hands in session
+        minutesplayed = (sends - sstarts) / 60
+        minutesplayed[minutesplayed == 0] = 1
+        minutesplayed = minutesplayed + PADDING
+        hph = hds * 60 / minutesplayed                   # Hands per hour
+        won = add.reduceat(profits, first) / 100.0
+
         # Take all results and format them into a list for feeding into gui model.
-        for i in range(len(index[0])):
-            hds = index[0][i] - first_idx + 1                                        # Number of hands in session
-            if hds > 0:
-                stime = strftime("%d/%m/%Y %H:%M", localtime(times[first_idx]))      # Formatted start time
-                etime = strftime("%d/%m/%Y %H:%M", localtime(times[index[0][i]]))   # Formatted end time
-                minutesplayed = (times[index[0][i]] - times[first_idx])/60
-                if minutesplayed == 0:
-                    minutesplayed = 1
-                minutesplayed = minutesplayed + PADDING
-                hph = hds*60/minutesplayed # Hands per hour
-                won = sum(winnings[first_idx:index[0][i]])/100.0
-                hwm = max(cum_sum[first_idx:index[0][i]])
-                lwm = min(cum_sum[first_idx:index[0][i]])
-                open = (sum(winnings[:first_idx]))/100
-                close = (sum(winnings[:index[0][i]]))/100
-                #print "DEBUG: range: (%s, %s) - (min, max): (%s, %s) - (open,close): (%s, %s)" %(first_idx, index[0][i], lwm, hwm, open, close)
-            
-                results.append([sid, hds, stime, etime, hph, won])
-                opens.append(open)
-                closes.append(close)
-                highs.append(hwm)
-                lows.append(lwm)
-                #print "DEBUG: Hands in session %4s: %4s  Start: %s End: %s HPH: %s Profit: %s" %(sid, hds, stime, etime, hph, won)
-                total = total + (index[0][i] - first_idx)
-                first_idx = index[0][i] + 1
-                sid = sid+1
-            else:
-                print "hds <= 0"
+        results = []
+        for i in xrange(len(first)):
+            stime = strftime("%d/%m/%Y %H:%M", localtime(int(sstarts[i])))  # Formatted start time
+            etime = strftime("%d/%m/%Y %H:%M", localtime(int(sends[i])))    # Formatted end time
+            results.append([i + 1, int(hds[i]), stime, etime, int(hph[i]), float(won[i])])
 
-        return (results, opens, closes, highs, lows)
+        return (results, list(opens[first]), list(closes[last]),
+                list(maximum.reduceat(hwms, first)), list(minimum.reduceat(lwms, first)))
 
     def clearGraphData(self):
 
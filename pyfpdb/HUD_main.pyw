@@ -40,6 +40,7 @@ import thread
 import time
 import string
 import re
+import json
 
 #    pyGTK modules
 import pygtk
@@ -130,7 +131,7 @@ class HUD_main(object):
             else:
                 self.main_window.set_icon_stock(gtk.STOCK_HOME)
             self.main_window.show_all()
-            gobject.timeout_add(100, self.check_tables)
+            self.polling = False    # check_tables() timeout running, see create_HUD()
                         
         except:
             log.error("*** Exception in HUD_main.init() *** ")
@@ -163,9 +164,11 @@ class HUD_main(object):
     def kill_hud(self, event, table):
 #    called by an event in the HUD, to kill this specific HUD
         if table in self.hud_dict:
+            self.hud_dict[table].table.unwatch()
             self.hud_dict[table].kill()
             self.hud_dict[table].main_window.destroy()
             self.vb.remove(self.hud_dict[table].tablehudlabel)
+            self.db_connection.drop_session_stats(self.hud_dict[table].table_name)
             del(self.hud_dict[table])
         self.main_window.resize(1, 1)
 
@@ -194,6 +197,10 @@ class HUD_main(object):
                     m.update_gui(new_hand_id)
                 self.hud_dict[table_name].update(new_hand_id, self.config)
                 self.hud_dict[table_name].reposition_windows()
+                if not table.watch(self.hud_dict[table_name]) and not self.polling:
+                    # the window system can't tell us when tables change, poll them
+                    self.polling = True
+                    gobject.timeout_add(100, self.check_tables)
             except:
                 log.error("*** Exception in HUD_main::idle_func() *** " + str(sys.exc_info()))
                 for e in traceback.format_tb(sys.exc_info()[2]):
@@ -248,6 +255,18 @@ class HUD_main(object):
 
         gobject.idle_add(idle_func)
 
+    def get_cards(self, new_hand_id, msg):
+        """Return the cards of the hand by seat, plus the board as 'common'."""
+        if msg is not None:
+            cards = dict((row[0], tuple(row[1:])) for row in msg['cards'])
+            cards['common'] = tuple(msg['common'])
+            return cards
+        cards = self.db_connection.get_cards(new_hand_id)
+        comm_cards = self.db_connection.get_common_cards(new_hand_id)
+        if comm_cards != {}: # stud!
+            cards['common'] = comm_cards['common']
+        return cards
+
     def read_stdin(self):            # This is the thread function
         """Do all the non-gui heavy lifting for the HUD program."""
 
@@ -261,16 +280,29 @@ class HUD_main(object):
         self.hero, self.hero_ids = {}, {}
         found = False
 
-        while 1:    # wait for a new hand number on stdin
-            new_hand_id = sys.stdin.readline()
+        while 1:    # wait for a new hand on stdin
+            line = sys.stdin.readline()
             t0 = time.time()
             t1 = t2 = t3 = t4 = t5 = t6 = t0
-            new_hand_id = string.rstrip(new_hand_id)
-            log.debug(_("Received hand no %s") % new_hand_id)
-            if new_hand_id == "":           # blank line means quit
+            line = string.rstrip(line)
+            if line == "":           # blank line means quit
                 self.destroy()
                 break # this thread is not always killed immediately with gtk.main_quit()
 
+#        the importer sends the hand as a json object (see Hand.hudMessage()),
+#        a plain hand number means everything has to be read from the db
+            msg = None
+            if line.startswith("{"):
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    log.error(_("HUD_main.read_stdin: bad hand message: %s") % line)
+                    continue
+                new_hand_id = str(msg['hand_id'])
+            else:
+                new_hand_id = line
+            log.debug(_("Received hand no %s") % new_hand_id)
+
             if not found:
                 for site in self.config.get_supported_sites():
                     result = self.db_connection.get_site_id(site)
@@ -286,12 +318,17 @@ class HUD_main(object):
 #        get basic info about the new hand from the db
 #        if there is a db error, complain, skip hand, and proceed
             log.info(_("HUD_main.read_stdin: hand processing starting ..."))
-            try:
-                (table_name, max, poker_game, type, site_id, site_name, num_seats, tour_number, tab_number) = \
-                                self.db_connection.get_table_info(new_hand_id)
-            except Exception:
-                log.error(_("db error: skipping %s" % new_hand_id))
-                continue
+            if msg is not None:
+                (table_name, max, poker_game, type, site_id, site_name, num_seats, tour_number, tab_number) = msg['table']
+                deltas = msg['deltas']
+            else:
+                try:
+                    (table_name, max, poker_game, type, site_id, site_name, num_seats, tour_number, tab_number) = \
+                                    self.db_connection.get_table_info(new_hand_id)
+                except Exception:
+                    log.error(_("db error: skipping %s" % new_hand_id))
+                    continue
+                deltas = None
             t1 = time.time()
 
             if type == "tour":   # hand is from a tournament
@@ -305,8 +342,8 @@ class HUD_main(object):
                 self.db_connection.init_hud_stat_vars( self.hud_dict[temp_key].hud_params['hud_days']
                                                      , self.hud_dict[temp_key].hud_params['h_hud_days'])
                 t2 = time.time()
-                stat_dict = self.db_connection.get_stats_from_hand(new_hand_id, type, self.hud_dict[temp_key].hud_params,
-                                                                   self.hero_ids[site_id], num_seats)
+                stat_dict = self.db_connection.get_stats_from_hand_cached(new_hand_id, type, self.hud_dict[temp_key].hud_params,
+                                                                          self.hero_ids[site_id], num_seats, deltas, table_name)
                 t3 = time.time()
 
                 try:
@@ -317,12 +354,8 @@ class HUD_main(object):
                     # Unlocks table, copied from end of function
                     self.db_connection.connection.rollback()
                     return
-                cards = self.db_connection.get_cards(new_hand_id)
-                t4 = time.time()
-                comm_cards = self.db_connection.get_common_cards(new_hand_id)
-                t5 = time.time()
-                if comm_cards != {}: # stud!
-                    cards['common'] = comm_cards['common']
+                cards = self.get_cards(new_hand_id, msg)
+                t4 = t5 = time.time()
                 self.hud_dict[temp_key].cards = cards
                 [aw.update_data(new_hand_id, self.db_connection) for aw in self.hud_dict[temp_key].aux_windows]
                 self.update_HUD(new_hand_id, temp_key, self.config)
@@ -331,12 +364,9 @@ class HUD_main(object):
             else:
                 # get stats using default params--also get cards
                 self.db_connection.init_hud_stat_vars( self.hud_params['hud_days'], self.hud_params['h_hud_days'] )
-                stat_dict = self.db_connection.get_stats_from_hand(new_hand_id, type, self.hud_params,
-                                                                   self.hero_ids[site_id], num_seats)
-                cards      = self.db_connection.get_cards(new_hand_id)
-                comm_cards = self.db_connection.get_common_cards(new_hand_id)
-                if comm_cards != {}: # stud!
-                    cards['common'] = comm_cards['common']
+                stat_dict = self.db_connection.get_stats_from_hand_cached(new_hand_id, type, self.hud_params,
+                                                                          self.hero_ids[site_id], num_seats, deltas, table_name)
+                cards = self.get_cards(new_hand_id, msg)
 
                 table_kwargs = dict(table_name=table_name, tournament=tour_number, table_number=tab_number)
                 tablewindow = Tables.Table(self.config, site_name, **table_kwargs)
@@ -29,6 +29,7 @@ from decimal import Decimal
 import operator
 import time,datetime
 from copy import deepcopy
+import json
 import pprint
 
 import logging
@@ -41,6 +42,31 @@ from Exceptions import *
 import DerivedStats
 import Card
 
+class Money(object):
+    """Reads amounts from hand histories as integer numbers of the currency's
+       smallest unit (cents), instead of Decimal. Amounts with more decimal places
+       than that are kept exact as a Decimal number of cents."""
+    def __init__(self, places):
+        self.places = places
+        self.unit = 10 ** places
+
+    def __call__(self, amount):
+        if not isinstance(amount, basestring):
+            return amount   # already counted in cents
+        (whole, point, frac) = amount.partition('.')
+        if whole.isdigit() and len(frac) <= self.places and (frac.isdigit() or not frac):
+            return int(whole) * self.unit + int(frac.ljust(self.places, '0') or 0)
+        cents = Decimal(amount).scaleb(self.places)
+        if cents == int(cents):
+            return int(cents)
+        return cents
+
+    def display(self, amount):
+        """The amount in currency units, as written in hand histories"""
+        if amount % self.unit == 0:
+            return Decimal(int(amount) / self.unit)
+        return Decimal(amount).scaleb(-self.places)
+
 class Hand(object):
 
 ###############################################################3
@@ -48,15 +74,30 @@ class Hand(object):
     UPS = {'a':'A', 't':'T', 'j':'J', 'q':'Q', 'k':'K', 'S':'s', 'C':'c', 'H':'h', 'D':'d'}
     LCS = {'H':'h', 'D':'d', 'C':'c', 'S':'s'}
     SYMBOL = {'USD': '$', 'EUR': u'$', 'GBP': '$', 'T$': '', 'play': ''}
+    # decimal places of each currency when amounts are kept in integer cents,
+    # the database stores every currency (and tourney chips) in hundredths
+    PLACES = {'USD': 3, 'EUR': 2, 'GBP': 2, 'T$': 2, 'play': 2}
     MS = {'horse' : 'HORSE', '8game' : '8-Game', 'hose'  : 'HOSE', 'ha': 'HA'}
     ACTION = {'ante': 1, 'small blind': 2, 'secondsb': 3, 'big blind': 4, 'both': 5, 'calls': 6, 'raises': 7,
               'bets': 8, 'stands pat': 9, 'folds': 10, 'checks': 11, 'discards': 12, 'bringin': 13, 'completes': 14}
+    # what storing a hand still needs once its stats are derived, see rows()
+    STORED = ('handid', 'sitename', 'siteId', 'gametype', 'startTime', 'tablename', 'maxseats', 'saveActions',
+              'players', 'tourNo', 'buyin', 'buyinCurrency', 'buyInChips', 'fee', 'speed', 'isRebuy', 'isAddOn',
+              'isKO', 'koBounty', 'isMatrix', 'isShootout', 'added', 'addedCurrency')
 
 
     def __init__(self, config, sitename, gametype, handText, builtFrom = "HHC"):
         #log.debug( _("Hand.init(): handText is ") + str(handText) )
         self.config = config
         self.saveActions = self.config.get_import_parameters().get('saveActions')
+        # money reads an amount from the hand history, cents is what database
+        # cents one unit of the amounts it returns is worth
+        if self.config.get_import_parameters().get('intCents'):
+            self.money = Money(self.PLACES[gametype['currency']])
+            self.cents = 1
+        else:
+            self.money = Decimal
+            self.cents = 100
         #log = Configuration.get_logger("logging.conf", "db", log_dir=self.config.dir_log)
         self.sitename = sitename
         self.siteId = self.config.get_site_id(sitename)
@@ -100,7 +141,7 @@ class Hand(object):
         self.seating = []
         self.players = []
         self.posted = []
-        self.tourneysPlayersIds = []
+        self.tourneysPlayersIds = {}
 
         # Collections indexed by street names
         self.bets = {}
@@ -132,7 +173,7 @@ class Hand(object):
         self.mucked = set() # cards were mucked at showdown
 
         # Things to do with money
-        self.pot = Pot()
+        self.pot = Pot(self.money)
         self.totalpot = None
         self.totalcollected = None
         self.rake = None
@@ -141,6 +182,34 @@ class Hand(object):
         self.pot.setSym(self.sym)
         self.is_duplicate = False  # i.e. don't update hudcache if true
 
+    def rows(self):
+        """The hand as the compact tuple an import worker sends back to the importer:
+           the values of the STORED attributes and the derived Hands, HandsPlayers and
+           HandsActions rows. fromRows() turns it back into a hand that can be stored."""
+        hp = self.stats.getHandsPlayers()
+        hp = [tuple(hp[player[1]]) for player in self.players]
+        return (tuple([getattr(self, name) for name in self.STORED]),
+                self.stats.getHands(), hp, self.stats.getHandsActions())
+
+    @classmethod
+    def fromRows(cls, config, rows):
+        """A hand from rows(), with just enough of a Hand for prepInsert(), insert(),
+           updateHudCache() and hudMessage()"""
+        (values, hands, hp, ha) = rows
+        hand = cls.__new__(cls)
+        hand.__dict__.update(zip(cls.STORED, values))
+        hand.config = config
+        hand.dbid_hands = 0
+        hand.tourneysPlayersIds = {}
+        hand.is_duplicate = False
+        hand.stats = DerivedStats.DerivedStats(hand)
+        hand.stats.hands = hands
+        for (player, row) in zip(hand.players, hp):
+            # in the same order as getStats(), so they are stored in the same order
+            hand.stats.handsplayers[player[1]] = DerivedStats.HandsPlayer(row)
+        hand.stats.handsactions = ha
+        return hand
+
     def __str__(self):
         vars = ( (_("BB"), self.bb),
                  (_("SB"), self.sb),
@@ -238,12 +307,10 @@ dealt   whether they were seen in a 'dealt to' line
         self.dbid_gt = db.getGameTypeId(self.siteId, self.gametype)
 
         if self.tourNo!=None:
+            # these are committed along with the hands
             self.tourneyTypeId = db.createTourneyType(self)
-            db.commit()
             self.tourneyId = db.createOrUpdateTourney(self, "HHC")
-            db.commit()
             self.tourneysPlayersIds = db.createOrUpdateTourneysPlayers(self, "HHC")
-            db.commit()
     #end def prepInsert
 
     def insert(self, db, printtest = False):
@@ -252,33 +319,74 @@ Should not commit, and do minimal selects. Callers may want to cache commits
 db: a connected Database object"""
 
 
-        self.stats.getStats(self)
+        # check for duplicates first, there's no point deriving their stats
+        if db.isDuplicate(self.dbid_gt, self.handid):
+            log.info(_("Hand.insert(): hid #: %s is a duplicate") % self.handid)
+            self.is_duplicate = True  # i.e. don't update hudcache
+            raise FpdbHandDuplicate(self.handid)
+
+        if not self.stats.getHands(): # not already derived by an import worker
+            self.stats.getStats(self)
+        elif self.tourNo is not None:
+            # the worker didn't have the ids from prepInsert()
+            self.stats.hands['tourneyId'] = self.tourneyId
+            for player in self.players:
+                self.stats.handsplayers[player[1]].tourneyTypeId = self.tourneyTypeId
+                self.stats.handsplayers[player[1]].tourneysPlayersIds = self.tourneysPlayersIds[player[1]]
 
         #####
         # End prep functions
         #####
         hh = self.stats.getHands()
 
-        if not db.isDuplicate(self.dbid_gt, hh['siteHandNo']):
-            # Hands - Summary information of hand indexed by handId - gameinfo
-            hh['gameTypeId'] = self.dbid_gt
-            # seats TINYINT NOT NULL,
-            hh['seats'] = len(self.dbid_pids)
-
-            self.dbid_hands = db.storeHand(hh)
-            self.dbid_hpid = db.storeHandsPlayers(self.dbid_hands, self.dbid_pids, 
-                                                  self.stats.getHandsPlayers(), printdata = printtest)
-            if self.saveActions:
-                db.storeHandsActions(self.dbid_hands, self.dbid_pids, self.dbid_hpid,
-                                     self.stats.getHandsActions(), printdata = printtest)
-        else:
-            log.info(_("Hand.insert(): hid #: %s is a duplicate") % hh['siteHandNo'])
-            self.is_duplicate = True  # i.e. don't update hudcache
-            raise FpdbHandDuplicate(hh['siteHandNo'])
+        # Hands - Summary information of hand indexed by handId - gameinfo
+        hh['gameTypeId'] = self.dbid_gt
+        # seats TINYINT NOT NULL,
+        hh['seats'] = len(self.dbid_pids)
+
+        self.dbid_hands = db.storeHand(hh)
+        self.dbid_hpid = db.storeHandsPlayers(self.dbid_hands, self.dbid_pids, 
+                                              self.stats.getHandsPlayers(), printdata = printtest)
+        if self.saveActions:
+            db.storeHandsActions(self.dbid_hands, self.dbid_pids, self.dbid_hpid,
+                                 self.stats.getHandsActions(), printdata = printtest)
+        if self.gametype['type'] == 'ring':
+            site = self.config.supported_sites.get(self.sitename)
+            hero = site.screen_name if site else None     # no hero for sites not in the config
+            if hero in self.dbid_pids:
+                db.storeSessionHand(self.dbid_pids[hero], self.startTime)
 
     def updateHudCache(self, db):
         db.storeHudCache(self.dbid_gt, self.dbid_pids, self.startTime, self.stats.getHandsPlayers())
 
+    def hudMessage(self, db):
+        """Return the stored hand as one line for the HUD pipe: the table info, cards
+           and HandsPlayers deltas HUD_main would otherwise read back from the db."""
+        hp = self.stats.getHandsPlayers()
+        hh = self.stats.getHands()
+        if self.gametype['type'] == 'tour':
+            (tour_number, tab_number) = self.tablename.split(" ", 1)
+        else:
+            (tour_number, tab_number) = (None, None)
+        bigblind = int(Decimal(self.gametype['bb'])*100)
+        deltas, cards = [], []
+        for player in hp:
+            d = { 'player_id': self.dbid_pids[player], 'seat': hp[player].seatNo, 'screen_name': player
+                , 'gametype_id': self.dbid_gt, 'seats': hh['seats'], 'position': str(hp[player].position)
+                , 'start_time': str(self.startTime), 'bigblind': bigblind, 'n': 1 }
+            for (column, alias) in db.get_stats_delta_columns():
+                d[alias] = getattr(hp[player], column)
+            deltas.append(d)
+            row = hp[player]
+            cards.append([row.seatNo, row.card1, row.card2, row.card3, row.card4, row.card5, row.card6, row.card7])
+        msg = { 'hand_id': self.dbid_hands
+              , 'table': [self.tablename, self.maxseats, self.gametype['category'], self.gametype['type']
+                         ,self.siteId, self.sitename, len(hp), tour_number, tab_number]
+              , 'cards': cards
+              , 'common': [hh['boardcard%d' % i] for i in xrange(1, 6)]
+              , 'deltas': deltas }
+        return json.dumps(msg)
+
     def select(self, handId):
         """ Function to create Hand object from database """
         c = cnxn.cursor()
@@ -430,7 +538,7 @@ If a player has None chips he won't be added."""
         if chips is not None:
             chips = re.sub(u',', u'', chips) #some sites have commas
             self.players.append([seat, name, chips])
-            self.stacks[name] = Decimal(chips)
+            self.stacks[name] = self.money(chips)
             self.pot.addPlayer(name)
             for street in self.actionStreets:
                 self.bets[street][name] = []
@@ -471,7 +579,7 @@ For sites (currently only Carbon Poker) which record "all in" as a special actio
 """
         self.checkPlayerExists(player)
         amount = re.sub(u',', u'', amount) #some sites have commas
-        Ai = Decimal(amount)
+        Ai = self.money(amount)
         Bp = self.lastBet[street]
         Bc = reduce(operator.add, self.bets[street][player], 0)
         C = Bp - Bc
@@ -486,13 +594,13 @@ For sites (currently only Carbon Poker) which record "all in" as a special actio
     def addAnte(self, player, ante):
         log.debug("%s %s antes %s" % ('BLINDSANTES', player, ante))
         if player is not None:
-            ante = re.sub(u',', u'', ante) #some sites have commas
-            self.bets['BLINDSANTES'][player].append(Decimal(ante))
-            self.stacks[player] -= Decimal(ante)
-            act = (player, 'ante', Decimal(ante), self.stacks[player]==0)
+            ante = self.money(re.sub(u',', u'', ante)) #some sites have commas
+            self.bets['BLINDSANTES'][player].append(ante)
+            self.stacks[player] -= ante
+            act = (player, 'ante', ante, self.stacks[player]==0)
             self.actions['BLINDSANTES'].append(act)
-#            self.pot.addMoney(player, Decimal(ante))
-            self.pot.addCommonMoney(player, Decimal(ante))
+#            self.pot.addMoney(player, ante)
+            self.pot.addCommonMoney(player, ante)
 #I think the antes should be common money, don't have enough hand history to check
 
     def addBlind(self, player, blindtype, amount):
@@ -506,26 +614,26 @@ For sites (currently only Carbon Poker) which record "all in" as a special actio
 
         log.debug("addBlind: %s posts %s, %s" % (player, blindtype, amount))
         if player is not None:
-            amount = re.sub(u',', u'', amount) #some sites have commas
-            self.stacks[player] -= Decimal(amount)
-            act = (player, blindtype, Decimal(amount), self.stacks[player]==0)
+            amount = self.money(re.sub(u',', u'', amount)) #some sites have commas
+            self.stacks[player] -= amount
+            act = (player, blindtype, amount, self.stacks[player]==0)
             self.actions['BLINDSANTES'].append(act)
 
             if blindtype == 'both':
                 # work with the real amount. limit games are listed as $1, $2, where
                 # the SB 0.50 and the BB is $1, after the turn the minimum bet amount is $2....
-                amount = self.bb
-                self.bets['BLINDSANTES'][player].append(Decimal(self.sb))
-                self.pot.addCommonMoney(player, Decimal(self.sb))
+                amount = self.money(self.bb)
+                self.bets['BLINDSANTES'][player].append(self.money(self.sb))
+                self.pot.addCommonMoney(player, self.money(self.sb))
 
             if blindtype == 'secondsb':
-                amount = Decimal(0)
-                self.bets['BLINDSANTES'][player].append(Decimal(self.sb))
-                self.pot.addCommonMoney(player, Decimal(self.sb))
+                amount = self.money(0)
+                self.bets['BLINDSANTES'][player].append(self.money(self.sb))
+                self.pot.addCommonMoney(player, self.money(self.sb))
 
-            self.bets['PREFLOP'][player].append(Decimal(amount))
-            self.pot.addMoney(player, Decimal(amount))
-            self.lastBet['PREFLOP'] = Decimal(amount)
+            self.bets['PREFLOP'][player].append(amount)
+            self.pot.addMoney(player, amount)
+            self.lastBet['PREFLOP'] = amount
             self.posted = self.posted + [[player,blindtype]]
 
 
@@ -537,13 +645,14 @@ For sites (currently only Carbon Poker) which record "all in" as a special actio
         # Potentially calculate the amount of the call if not supplied
         # corner cases include if player would be all in
         if amount is not None:
-            self.bets[street][player].append(Decimal(amount))
-            #self.lastBet[street] = Decimal(amount)
-            self.stacks[player] -= Decimal(amount)
+            amount = self.money(amount)
+            self.bets[street][player].append(amount)
+            #self.lastBet[street] = amount
+            self.stacks[player] -= amount
             #print "DEBUG %s calls %s, stack %s" % (player, amount, self.stacks[player])
-            act = (player, 'calls', Decimal(amount), self.stacks[player]==0)
+            act = (player, 'calls', amount, self.stacks[player]==0)
             self.actions[street].append(act)
-            self.pot.addMoney(player, Decimal(amount))
+            self.pot.addMoney(player, amount)
 
     def addRaiseBy(self, street, player, amountBy):
         """\
@@ -562,7 +671,7 @@ Add a raise by amountBy on [street] by [player]
         #
         amountBy = re.sub(u',', u'', amountBy) #some sites have commas
         self.checkPlayerExists(player)
-        Rb = Decimal(amountBy)
+        Rb = self.money(amountBy)
         Bp = self.lastBet[street]
         Bc = reduce(operator.add, self.bets[street][player], 0)
         C = Bp - Bc
@@ -579,7 +688,7 @@ Add a raise by amountBy on [street] by [player]
 For sites which by "raises x" mean "calls and raises putting a total of x in the por". """
         self.checkPlayerExists(player)
         amount = re.sub(u',', u'', amount) #some sites have commas
-        CRb = Decimal(amount)
+        CRb = self.money(amount)
         Bp = self.lastBet[street]
         Bc = reduce(operator.add, self.bets[street][player], 0)
         C = Bp - Bc
@@ -597,7 +706,7 @@ Add a raise on [street] by [player] to [amountTo]
         amountTo = re.sub(u',', u'', amountTo) #some sites have commas
         Bp = self.lastBet[street]
         Bc = reduce(operator.add, self.bets[street][player], 0)
-        Rt = Decimal(amountTo)
+        Rt = self.money(amountTo)
         C = Bp - Bc
         Rb = Rt - C - Bc
         self._addRaise(street, player, C, Rb, Rt)
@@ -615,15 +724,15 @@ Add a raise on [street] by [player] to [amountTo]
 
     def addBet(self, street, player, amount):
         log.debug(_("%s %s bets %s") %(street, player, amount))
-        amount = re.sub(u',', u'', amount) #some sites have commas
+        amount = self.money(re.sub(u',', u'', amount)) #some sites have commas
         self.checkPlayerExists(player)
-        self.bets[street][player].append(Decimal(amount))
-        self.stacks[player] -= Decimal(amount)
+        self.bets[street][player].append(amount)
+        self.stacks[player] -= amount
         #print "DEBUG %s bets %s, stack %s" % (player, amount, self.stacks[player])
-        act = (player, 'bets', Decimal(amount), self.stacks[player]==0)
+        act = (player, 'bets', amount, self.stacks[player]==0)
         self.actions[street].append(act)
-        self.lastBet[street] = Decimal(amount)
-        self.pot.addMoney(player, Decimal(amount))
+        self.lastBet[street] = amount
+        self.pot.addMoney(player, amount)
 
 
     def addStandsPat(self, street, player):
@@ -650,11 +759,12 @@ Add a raise on [street] by [player] to [amountTo]
     def addCollectPot(self,player, pot):
         log.debug("%s collected %s" % (player, pot))
         self.checkPlayerExists(player)
+        pot = self.money(pot)
         self.collected = self.collected + [[player, pot]]
         if player not in self.collectees:
-            self.collectees[player] = Decimal(pot)
+            self.collectees[player] = pot
         else:
-            self.collectees[player] += Decimal(pot)
+            self.collectees[player] += pot
 
 
     def addShownCards(self, cards, player, holeandboard=None, shown=True, mucked=False):
@@ -683,7 +793,7 @@ Card ranks will be uppercased
             self.totalcollected = 0;
             #self.collected looks like [[p1,amount][px,amount]]
             for entry in self.collected:
-                self.totalcollected += Decimal(entry[1])
+                self.totalcollected += self.money(entry[1])
 
     def getGameTypeAsString(self):
         """\
@@ -725,29 +835,33 @@ Map the tuple self.gametype onto the pokerstars string describing it
         elif act[1] == 'checks':
             return ("%s: checks " %(act[0]))
         elif act[1] == 'calls':
-            return ("%s: calls %s%s%s" %(act[0], self.sym, act[2], ' and is all-in' if act[3] else ''))
+            return ("%s: calls %s%s%s" %(act[0], self.sym, self.display(act[2]), ' and is all-in' if act[3] else ''))
         elif act[1] == 'bets':
-            return ("%s: bets %s%s%s" %(act[0], self.sym, act[2], ' and is all-in' if act[3] else ''))
+            return ("%s: bets %s%s%s" %(act[0], self.sym, self.display(act[2]), ' and is all-in' if act[3] else ''))
         elif act[1] == 'raises':
-            return ("%s: raises %s%s to %s%s%s" %(act[0], self.sym, act[2], self.sym, act[3], ' and is all-in' if act[5] else ''))
+            return ("%s: raises %s%s to %s%s%s" %(act[0], self.sym, self.display(act[2]), self.sym, self.display(act[3]), ' and is all-in' if act[5] else ''))
         elif act[1] == 'completea':
-            return ("%s: completes to %s%s%s" %(act[0], self.sym, act[2], ' and is all-in' if act[3] else ''))
+            return ("%s: completes to %s%s%s" %(act[0], self.sym, self.display(act[2]), ' and is all-in' if act[3] else ''))
         elif act[1] == 'posts':
             if(act[2] == "small blind"):
-                return ("%s: posts small blind %s%s%s" %(act[0], self.sym, act[3], ' and is all-in' if act[4] else ''))
+                return ("%s: posts small blind %s%s%s" %(act[0], self.sym, self.display(act[3]), ' and is all-in' if act[4] else ''))
             elif(act[2] == "big blind"):
-                return ("%s: posts big blind %s%s%s" %(act[0], self.sym, act[3], ' and is all-in' if act[4] else ''))
+                return ("%s: posts big blind %s%s%s" %(act[0], self.sym, self.display(act[3]), ' and is all-in' if act[4] else ''))
             elif(act[2] == "both"):
-                return ("%s: posts small & big blinds %s%s%s" %(act[0], self.sym, act[3], ' and is all-in' if act[4] else ''))
+                return ("%s: posts small & big blinds %s%s%s" %(act[0], self.sym, self.display(act[3]), ' and is all-in' if act[4] else ''))
             elif(act[2] == "ante"):
-                return ("%s: posts the ante %s%s%s" %(act[0], self.sym, act[3], ' and is all-in' if act[4] else ''))
+                return ("%s: posts the ante %s%s%s" %(act[0], self.sym, self.display(act[3]), ' and is all-in' if act[4] else ''))
         elif act[1] == 'bringin':
-            return ("%s: brings in for %s%s%s" %(act[0], self.sym, act[2], ' and is all-in' if act[3] else ''))
+            return ("%s: brings in for %s%s%s" %(act[0], self.sym, self.display(act[2]), ' and is all-in' if act[3] else ''))
         elif act[1] == 'discards':
             return ("%s: discards %s %s%s" %(act[0], act[2], 'card' if act[2] == 1 else 'cards' , " [" + " ".join(self.discards[street][act[0]]) + "]" if self.hero == act[0] else ''))
         elif act[1] == 'stands pat':
             return ("%s: stands pat" %(act[0]))
 
+    def display(self, amount):
+        """The amount as it is written in hand histories"""
+        return self.pot.display(amount)
+
     def getStakesAsString(self):
         """Return a string of the stakes of the current hand."""
         return "%s%s/%s%s" % (self.sym, self.sb, self.sym, self.bb)
@@ -821,7 +935,7 @@ class HoldemOmahaHand(Hand):
             if self.gametype['type'] == 'tour':
                 self.tablename = "%s %s" % (self.tourNo, self.tablename)
             hhc.readPlayerStacks(self)
-            hhc.compilePlayerRegexs(self)
+            hhc.loadPlayerRegexs(self)
             hhc.markStreets(self)
 
             if self.cancelled:
@@ -1069,12 +1183,12 @@ class HoldemOmahaHand(Hand):
         # Immediately before the summary.
         # The current importer uses those lines for importing winning rather than the summary
         for name in self.pot.returned:
-            print >>fh, ("Uncalled bet (%s%s) returned to %s" %(self.sym, self.pot.returned[name],name))
+            print >>fh, ("Uncalled bet (%s%s) returned to %s" %(self.sym, self.display(self.pot.returned[name]),name))
         for entry in self.collected:
-            print >>fh, ("%s collected %s%s from x pot" %(entry[0], self.sym, entry[1]))
+            print >>fh, ("%s collected %s%s from x pot" %(entry[0], self.sym, self.display(entry[1])))
 
         print >>fh, ("*** SUMMARY ***")
-        print >>fh, "%s | Rake %s%.2f" % (self.pot, self.sym, self.rake)
+        print >>fh, "%s | Rake %s%.2f" % (self.pot, self.sym, self.display(self.rake))
 
         board = []
         for street in ["FLOP", "TURN", "RIVER"]:
@@ -1086,9 +1200,9 @@ class HoldemOmahaHand(Hand):
             seatnum = player[0]
             name = player[1]
             if name in self.collectees and name in self.shown:
-                print >>fh, ("Seat %d: %s showed [%s] and won (%s%s)" % (seatnum, name, " ".join(self.holecards['PREFLOP'][name][1]), self.sym, self.collectees[name]))
+                print >>fh, ("Seat %d: %s showed [%s] and won (%s%s)" % (seatnum, name, " ".join(self.holecards['PREFLOP'][name][1]), self.sym, self.display(self.collectees[name])))
             elif name in self.collectees:
-                print >>fh, ("Seat %d: %s collected (%s%s)" % (seatnum, name, self.sym, self.collectees[name]))
+                print >>fh, ("Seat %d: %s collected (%s%s)" % (seatnum, name, self.sym, self.display(self.collectees[name])))
             #~ elif name in self.shown:
                 #~ print >>fh, _("Seat %d: %s showed [%s]" % (seatnum, name, " ".join(self.holecards[name]['PREFLOP'])))
             elif name in self.folded:
@@ -1122,7 +1236,7 @@ class DrawHand(Hand):
             if self.gametype['type'] == 'tour':
                 self.tablename = "%s %s" % (self.tourNo, self.tablename)
             hhc.readPlayerStacks(self)
-            hhc.compilePlayerRegexs(self)
+            hhc.loadPlayerRegexs(self)
             hhc.markStreets(self)
             hhc.readBlinds(self)
             hhc.readAntes(self)
@@ -1156,19 +1270,23 @@ class DrawHand(Hand):
 
         log.debug("addBlind: %s posts %s, %s" % (player, blindtype, amount))
         if player is not None:
-            self.bets['DEAL'][player].append(Decimal(amount))
-            self.stacks[player] -= Decimal(amount)
+            amount = self.money(amount)
+            self.bets['DEAL'][player].append(amount)
+            self.stacks[player] -= amount
             #print "DEBUG %s posts, stack %s" % (player, self.stacks[player])
-            act = (player, blindtype, Decimal(amount), self.stacks[player]==0)
+            act = (player, blindtype, amount, self.stacks[player]==0)
             self.actions['BLINDSANTES'].append(act)
-            self.pot.addMoney(player, Decimal(amount))
+            self.pot.addMoney(player, amount)
             if blindtype == 'big blind':
-                self.lastBet['DEAL'] = Decimal(amount)
+                self.lastBet['DEAL'] = amount
             elif blindtype == 'both':
                 # extra small blind is 'dead'
-                amount = Decimal(amount)/3
-                amount += amount
-                self.lastBet['DEAL'] = Decimal(amount)
+                if self.cents == 1:
+                    amount -= amount // 3
+                else:
+                    amount = Decimal(amount)/3
+                    amount += amount
+                self.lastBet['DEAL'] = amount
         self.posted = self.posted + [[player,blindtype]]
         #print "DEBUG: self.posted: %s" %(self.posted)
 
@@ -1233,7 +1351,7 @@ class DrawHand(Hand):
 
         if 'BLINDSANTES' in self.actions:
             for act in self.actions['BLINDSANTES']:
-                print >>fh, _("%s: %s %s %s%s" %(act[0], act[1], act[2], self.sym, act[3]))
+                print >>fh, _("%s: %s %s %s%s" %(act[0], act[1], self.display(act[2]), self.sym, act[3]))
 
         if 'DEAL' in self.actions:
             print >>fh, _("*** DEALING HANDS ***")
@@ -1287,12 +1405,12 @@ class DrawHand(Hand):
         # Immediately before the summary.
         # The current importer uses those lines for importing winning rather than the summary
         for name in self.pot.returned:
-            print >>fh, _("Uncalled bet (%s%s) returned to %s" %(self.sym, self.pot.returned[name],name))
+            print >>fh, _("Uncalled bet (%s%s) returned to %s" %(self.sym, self.display(self.pot.returned[name]),name))
         for entry in self.collected:
-            print >>fh, _("%s collected %s%s from x pot" %(entry[0], self.sym, entry[1]))
+            print >>fh, _("%s collected %s%s from x pot" %(entry[0], self.sym, self.display(entry[1])))
 
         print >>fh, _("*** SUMMARY ***")
-        print >>fh, "%s | Rake %s%.2f" % (self.pot, self.sym, self.rake)
+        print >>fh, "%s | Rake %s%.2f" % (self.pot, self.sym, self.display(self.rake))
         print >>fh, "\n\n"
 
 
@@ -1320,7 +1438,7 @@ class StudHand(Hand):
             if self.gametype['type'] == 'tour':
                 self.tablename = "%s %s" % (self.tourNo, self.tablename)
             hhc.readPlayerStacks(self)
-            hhc.compilePlayerRegexs(self)
+            hhc.loadPlayerRegexs(self)
             hhc.markStreets(self)
             hhc.readAntes(self)
             hhc.readBringIn(self)
@@ -1382,7 +1500,7 @@ Add a complete on [street] by [player] to [amountTo]
         self.checkPlayerExists(player)
         Bp = self.lastBet['THIRD']
         Bc = reduce(operator.add, self.bets[street][player], 0)
-        Rt = Decimal(amountTo)
+        Rt = self.money(amountTo)
         C = Bp - Bc
         Rb = Rt - C
         self._addRaise(street, player, C, Rb, Rt, 'completes')
@@ -1396,12 +1514,13 @@ Add a complete on [street] by [player] to [amountTo]
     def addBringIn(self, player, bringin):
         if player is not None:
             log.debug(_("Bringin: %s, %s") % (player , bringin))
-            self.bets['THIRD'][player].append(Decimal(bringin))
-            self.stacks[player] -= Decimal(bringin)
-            act = (player, 'bringin', Decimal(bringin), self.stacks[player]==0)
+            bringin = self.money(bringin)
+            self.bets['THIRD'][player].append(bringin)
+            self.stacks[player] -= bringin
+            act = (player, 'bringin', bringin, self.stacks[player]==0)
             self.actions['THIRD'].append(act)
-            self.lastBet['THIRD'] = Decimal(bringin)
-            self.pot.addMoney(player, Decimal(bringin))
+            self.lastBet['THIRD'] = bringin
+            self.pot.addMoney(player, bringin)
 
     def getStreetTotals(self):
         # street1Pot INT,                  /* pot size at flop/street4 */
@@ -1506,12 +1625,12 @@ Add a complete on [street] by [player] to [amountTo]
         # Immediately before the summary.
         # The current importer uses those lines for importing winning rather than the summary
         for name in self.pot.returned:
-            print >>fh, _("Uncalled bet (%s%s) returned to %s" %(self.sym, self.pot.returned[name],name))
+            print >>fh, _("Uncalled bet (%s%s) returned to %s" %(self.sym, self.display(self.pot.returned[name]),name))
         for entry in self.collected:
-            print >>fh, _("%s collected %s%s from x pot" %(entry[0], self.sym, entry[1]))
+            print >>fh, _("%s collected %s%s from x pot" %(entry[0], self.sym, self.display(entry[1])))
 
         print >>fh, _("*** SUMMARY ***")
-        print >>fh, "%s | Rake %s%.2f" % (self.pot, self.sym, self.rake)
+        print >>fh, "%s | Rake %s%.2f" % (self.pot, self.sym, self.display(self.rake))
 # TODO: side pots
 
         board = []
@@ -1524,9 +1643,9 @@ Add a complete on [street] by [player] to [amountTo]
             seatnum = player[0]
             name = player[1]
             if name in self.collectees and name in self.shown:
-                print >>fh, _("Seat %d: %s showed [%s] and won (%s%s)" % (seatnum, name, self.join_holecards(name), self.sym, self.collectees[name]))
+                print >>fh, _("Seat %d: %s showed [%s] and won (%s%s)" % (seatnum, name, self.join_holecards(name), self.sym, self.display(self.collectees[name])))
             elif name in self.collectees:
-                print >>fh, _("Seat %d: %s collected (%s%s)" % (seatnum, name, self.sym, self.collectees[name]))
+                print >>fh, _("Seat %d: %s collected (%s%s)" % (seatnum, name, self.sym, self.display(self.collectees[name])))
             elif name in self.shown:
                 print >>fh, _("Seat %d: %s showed [%s]" % (seatnum, name, self.join_holecards(name)))
             elif name in self.mucked:
@@ -1583,7 +1702,8 @@ Add a complete on [street] by [player] to [amountTo]
 class Pot(object):
 
 
-    def __init__(self):
+    def __init__(self, money=Decimal):
+        self.money        = money   # Decimal, or a Money when amounts are integer cents
         self.contenders   = set()
         self.committed    = {}
         self.streettotals = {}
@@ -1596,8 +1716,8 @@ class Pot(object):
         self.sym = sym
 
     def addPlayer(self,player):
-        self.committed[player] = Decimal(0)
-        self.common[player] = Decimal(0)
+        self.committed[player] = self.money(0)
+        self.common[player] = self.money(0)
 
     def addFold(self, player):
         # addFold must be called when a player folds
@@ -1659,6 +1779,12 @@ class Pot(object):
         # for example:
         # Total pot $124.30 Main pot $98.90. Side pot $23.40. | Rake $2
 
+    def display(self, amount):
+        """The amount as it is written in hand histories"""
+        if self.money is Decimal:
+            return amount
+        return self.money.display(amount)
+
     def __str__(self):
         if self.sym is None:
             self.sym = "C"
@@ -1667,11 +1793,11 @@ class Pot(object):
             # NB if I'm sure end() is idempotent, call it here.
             raise FpdbParseError(_("FpdbError in printing Hand object"))
 
-        ret = "Total pot %s%.2f" % (self.sym, self.total)
+        ret = "Total pot %s%.2f" % (self.sym, self.display(self.total))
         if len(self.pots) < 2:
             return ret;
-        ret += " Main pot %s%.2f" % (self.sym, self.pots[0])
+        ret += " Main pot %s%.2f" % (self.sym, self.display(self.pots[0]))
 
-        return ret + ''.join([ (" Side pot %s%.2f." % (self.sym, self.pots[x]) ) for x in xrange(1, len(self.pots)) ])
+        return ret + ''.join([ (" Side pot %s%.2f." % (self.sym, self.display(self.pots[x])) ) for x in xrange(1, len(self.pots)) ])
 
 
@@ -28,6 +28,8 @@ import xml.dom.minidom
 import codecs
 from decimal import Decimal
 import operator
+import itertools
+from collections import OrderedDict
 from xml.dom.minidom import Node
 
 import time
@@ -50,12 +52,21 @@ import gtk
 class HandHistoryConverter():
 
     READ_CHUNK_SIZE = 10000 # bytes to read at a time from file in tail mode
+    SPLIT_CHUNK_SIZE = 65536 # bytes to read at a time when splitting a whole file
 
     # filetype can be "text" or "xml"
     # so far always "text"
     # subclass HHC_xml for xml parsing
     filetype = "text"
 
+    # compiled player regexs of recent hands, shared by all converters, see loadPlayerRegexs()
+    PLAYER_REGEX_CACHE_SIZE = 64
+    playerRegexCache = OrderedDict()
+
+    # a PNAME group matching any player, for converters whose player regexs work
+    # without the names; used if the anyPlayerRegexs import parameter is set
+    anyPlayerRe = None
+
     # codepage indicates the encoding of the text file.
     # cp1252 is a safe default
     # "utf_8" is more likely if there are funny characters
@@ -65,11 +76,13 @@ class HandHistoryConverter():
 
     # maybe archive params should be one archive param, then call method in specific converter.   if archive:  convert_archive()
     def __init__( self, config, in_path = '-', out_path = '-', follow=False, index=0
-                , autostart=True, starsArchive=False, ftpArchive=False, sitename="PokerStars" ):
+                , autostart=True, starsArchive=False, ftpArchive=False, sitename="PokerStars"
+                , handCallback=None ):
         """\
 in_path   (default '-' = sys.stdin)
 out_path  (default '-' = sys.stdout)
-follow :  whether to tail -f the input"""
+follow :  whether to tail -f the input
+handCallback : if given, called with each parsed Hand instead of keeping it in processedHands"""
 
         self.config = config
         self.import_parameters = self.config.get_import_parameters()
@@ -86,6 +99,7 @@ follow :  whether to tail -f the input"""
         self.out_path = out_path
 
         self.processedHands = []
+        self.handCallback = handCallback
         self.numHands = 0
         self.numErrors = 0
 
@@ -98,6 +112,8 @@ follow :  whether to tail -f the input"""
 
         self.follow = follow
         self.compiledPlayers   = set()
+        self.compiledKey = None
+        self.anyPlayers = self.anyPlayerRe is not None and self.import_parameters.get('anyPlayerRegexs', False)
         self.maxseats  = 10
 
         self.status = True
@@ -145,26 +161,36 @@ Otherwise, finish at EOF.
                         log.warning(_("HHC.start(follow): processHand failed: Exception msg: '%s'") % e)
                         log.debug(handText)
             else:
-                handsList = self.allHandsAsList()
-                log.debug( _("handsList is ") + str(handsList) )
-                log.info("Parsing %d hands" % len(handsList))
+                log.info(_("Parsing hands from '%s'") % self.in_path)
+                hands = self.iterHands()
                 # Determine if we're dealing with a HH file or a Summary file
-                # quick fix : empty files make the handsList[0] fail ==> If empty file, go on with HH parsing
-                if len(handsList) == 0 or self.isSummary(handsList[0]) == False:
+                # quick fix : empty files have no first hand ==> If empty file, go on with HH parsing
+                try:
+                    firstHand = hands.next()
+                except StopIteration:
+                    firstHand = None
+                if firstHand is None or self.isSummary(firstHand) == False:
                     self.parsedObjectType = "HH"
-                    for handText in handsList:
+                    if firstHand is not None:
+                        hands = itertools.chain([firstHand], hands)
+                    for handText in hands:
+                        self.numHands += 1
                         try:
-                            self.processedHands.append(self.processHand(handText))
+                            hand = self.processHand(handText)
                         except FpdbParseError, e:
                             self.numErrors += 1
                             log.warning(_("HHC.start(): processHand failed: Exception msg: '%s'") % e)
                             log.debug(handText)
-                    self.numHands = len(handsList)
+                            continue
+                        if self.handCallback is None:
+                            self.processedHands.append(hand)
+                        else:
+                            self.handCallback(hand)
                     endtime = time.time()
                     log.info(_("Read %d hands (%d failed) in %.3f seconds") % (self.numHands, self.numErrors, endtime - starttime))
                 else:
                         self.parsedObjectType = "Summary"
-                        summaryParsingStatus = self.readSummaryInfo(handsList)
+                        summaryParsingStatus = self.readSummaryInfo([firstHand] + list(hands))
                         endtime = time.time()
                         if summaryParsingStatus :
                             log.info(_("Summary file '%s' correctly parsed  (took %.3f seconds)") % (self.in_path, endtime - starttime))
@@ -243,35 +269,149 @@ which it expects to find at self.re_TailSplitHands -- see for e.g. Everleaf.py.
 
     def allHandsAsList(self):
         """Return a list of handtexts in the file at self.in_path"""
-        #TODO : any need for this to be generator? e.g. stars support can email one huge file of all hands in a year. Better to read bit by bit than all at once.
-        self.readFile()
-        self.obs = self.obs.strip()
-        self.obs = self.obs.replace('\r\n', '\n')
+        return list(self.iterHands())
+
+    def iterHands(self):
+        """Generator of handTexts from the file at self.in_path:
+Read the file SPLIT_CHUNK_SIZE bytes at a time and yield each hand as soon as the
+re_SplitHands separator after it has been read, so memory use does not grow with the
+size of the file. Starts reading at byte offset self.index and leaves self.index at the
+offset of the end of the text read, as readFile() does, so a growing file is only ever
+read and decoded once. The file is decoded with the first codec in self.codepage
+until that fails. Then it is read again with the next one, from the start if no hand
+has been yielded yet, or else from where the failing bytes begin.
+
+"""
+        if self.filetype != "text":
+            return
+        if self.in_path == '-':
+            log.debug(_("Reading stdin with %s") % self.codepage)
+            in_fh = sys.stdin
+            kodecs = ['cp1252']
+            decoder = codecs.getincrementaldecoder('cp1252')()
+        else:
+            in_fh = open(self.in_path, 'rb')
+            kodecs = self.__listof(self.codepage)
+            decoder = self.decoderAt(in_fh, kodecs[0], self.index)
+
         # maybe archive params should be one archive param, then call method in specific converter?
-        # if self.archive:
-        #     self.obs = self.convert_archive(self.obs)
+        archive_res = []
         if self.starsArchive == True:
             log.debug(_("Converting starsArchive format to readable"))
-            m = re.compile('^Hand #\d+', re.MULTILINE)
-            self.obs = m.sub('', self.obs)
-
+            archive_res.append(re.compile('^Hand #\d+', re.MULTILINE))
         if self.ftpArchive == True:
             log.debug(_("Converting ftpArchive format to readable"))
             # Remove  ******************** # 1 *************************
-            m = re.compile('\*{20}\s#\s\d+\s\*{25}\s+', re.MULTILINE)
-            self.obs = m.sub('', self.obs)
-
-        if self.obs is None or self.obs == "":
-            log.error(_("Read no hands."))
-            return []
-        handlist = re.split(self.re_SplitHands,  self.obs)
+            archive_res.append(re.compile('\*{20}\s#\s\d+\s\*{25}\s+', re.MULTILINE))
+
+        nhands = 0
+        leading = True
+        data = u''
+        carry = u''
+        offset = self.index     # of the bytes read so far
+        tried = 1
+        try:
+            while 1:
+                raw = in_fh.read(self.SPLIT_CHUNK_SIZE)
+                if not raw:
+                    break
+                try:
+                    newdata = decoder.decode(raw)
+                except UnicodeError:
+                    if tried == len(kodecs):
+                        print _("unable to read file with any codec in list!"), self.in_path
+                        return
+                    if nhands == 0:
+                        (leading, data, carry) = (True, u'', u'')
+                        offset = self.index
+                    else:
+                        offset -= len(decoder.getstate()[0])
+                    decoder = self.decoderAt(in_fh, kodecs[tried], offset)
+                    tried += 1
+                    continue
+                offset += len(raw)
+                newdata = carry + newdata
+                # Only pass on whole lines, so that neither a '\r\n' nor an archive
+                # header gets cut in half at the end of a chunk
+                cut = newdata.rfind('\n') + 1
+                newdata, carry = newdata[:cut], newdata[cut:]
+                if not newdata:
+                    continue
+                data += self.cleanText(newdata, archive_res)
+                if leading:
+                    data = data.lstrip()
+                    leading = (data == u'')
+                (handlist, data) = self.splitHands(data)
+                for handText in handlist:
+                    nhands += 1
+                    yield handText
+            if self.in_path != '-':
+                # bytes of a character still being written are read again next time
+                self.index = offset - len(decoder.getstate()[0])
+        finally:
+            if self.in_path != '-':
+                in_fh.close()
+
+        data = (data + self.cleanText(carry, archive_res)).rstrip()
+        if leading:
+            data = data.lstrip()
+        if data == "":
+            if nhands == 0:
+                log.error(_("Read no hands."))
+            return
+        (handlist, data) = self.splitHands(data, final=True)
         # Some HH formats leave dangling text after the split
         # ie. </game> (split) </session>EOL
         # Remove this dangler if less than 50 characters and warn in the log
-        if len(handlist[-1]) <= 50:
-            handlist.pop()
+        if len(data) <= 50:
             log.warn(_("Removing text < 50 characters"))
-        return handlist
+        else:
+            handlist.append(data)
+        for handText in handlist:
+            yield handText
+
+    def cleanText(self, text, archive_res=[]):
+        """Normalise line endings and strip any archive markers from text"""
+        text = text.replace('\r\n', '\n')
+        for m in archive_res:
+            text = m.sub('', text)
+        return text
+
+    def splitHands(self, data, final=False):
+        """Split data on re_SplitHands. Returns (handlist, rest) where rest is the text
+after the last separator. Unless final is True, a separator that reaches the end of
+data is left in rest, since it may continue in the next chunk read."""
+        handlist = []
+        start = 0
+        for m in self.re_SplitHands.finditer(data):
+            if m.end() == m.start():
+                continue
+            if not final and m.end() >= len(data):
+                break
+            handText = data[start:m.start()]
+            if handText.strip():
+                handlist.append(handText)
+            start = m.end()
+        return (handlist, data[start:])
+
+    def openAt(self, kodec):
+        """Open in_path for reading with kodec from byte offset self.index"""
+        fh = open(self.in_path, 'rb')
+        return codecs.getreader(self.codecAt(fh, kodec, self.index))(fh)
+
+    def decoderAt(self, fh, kodec, offset):
+        """Seek file fh to byte offset and return an incremental decoder for it"""
+        return codecs.getincrementaldecoder(self.codecAt(fh, kodec, offset))()
+
+    def codecAt(self, fh, kodec, offset):
+        """Seek file fh to byte offset and return the codec to read it with from there.
+The BOM of a utf-16 file is only at the start, so after that its byte order has to be given."""
+        if offset > 0 and codecs.lookup(kodec).name == 'utf-16':
+            fh.seek(0)
+            bom = fh.read(2)
+            kodec = 'utf-16-be' if bom == codecs.BOM_UTF16_BE else 'utf-16-le'
+        fh.seek(offset)
+        return kodec
 
     def processHand(self, handText):
         gametype = self.determineGameType(handText)
@@ -396,6 +536,33 @@ or None if we fail to get the info """
     Which without care in your regexes most people would match 'YesI' and not 'YesI antes $4000'
     """
 
+    def loadPlayerRegexs(self, hand):
+        """Set up the player regexs for hand, as compilePlayerRegexs() does, but
+        keep the regexs compiled for each set of players and reuse them when the
+        same players turn up again. The cache is an LRU of the last
+        PLAYER_REGEX_CACHE_SIZE sets, keyed by (converter, currency, players); with
+        anyPlayers there is just one set per currency."""
+        players = frozenset([player[1] for player in hand.players])
+        currency = hand.gametype['currency']
+        if self.compiledKey is not None and self.compiledKey[1] == currency:
+            if self.anyPlayers or players <= self.compiledPlayers:
+                return
+        key = (self.__class__, currency, None if self.anyPlayers else players)
+        regexs = self.playerRegexCache.pop(key, None)
+        if regexs is None:
+            before = dict(self.__dict__)
+            self.compiledPlayers = set()    # makes compilePlayerRegexs() compile
+            self.compilePlayerRegexs(hand)
+            regexs = dict([(name, value) for (name, value) in self.__dict__.iteritems()
+                           if name != 'compiledPlayers' and before.get(name) is not value])
+        else:
+            self.__dict__.update(regexs)
+        self.compiledPlayers = set(players)
+        self.compiledKey = key
+        self.playerRegexCache[key] = regexs
+        while len(self.playerRegexCache) > self.PLAYER_REGEX_CACHE_SIZE:
+            self.playerRegexCache.popitem(last = False)
+
     # Needs to return a MatchObject with group names identifying the streets into the Hand object
     # so groups are called by street names 'PREFLOP', 'FLOP', 'STREET2' etc
     # blinds are done seperately
@@ -507,11 +674,10 @@ or None if we fail to get the info """
                 for kodec in self.__listof(self.codepage):
                     #print "trying", kodec
                     try:
-                        in_fh = codecs.open(self.in_path, 'r', kodec)
-                        whole_file = in_fh.read()
+                        in_fh = self.openAt(kodec)
+                        self.obs = in_fh.read()
+                        self.index = in_fh.stream.tell() - len(in_fh.bytebuffer)
                         in_fh.close()
-                        self.obs = whole_file[self.index:]
-                        self.index = len(whole_file)
                         break
                     except:
                         pass
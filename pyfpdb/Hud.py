@@ -51,6 +51,7 @@ import Configuration
 import Stats
 import Mucked
 import Database
+import Charset
 #import HUD_main
 
 
@@ -94,8 +95,9 @@ class Hud:
         self.hud_ui     = config.get_hud_ui_parameters()
         self.site_params = config.get_site_parameters(self.table.site)
 
-        self.backgroundcolor = gtk.gdk.color_parse(self.colors['hudbgcolor'])
-        self.foregroundcolor = gtk.gdk.color_parse(self.colors['hudfgcolor'])
+        self.parsed_colors = {}     # color spec -> gtk.gdk.Color, see get_color()
+        self.backgroundcolor = self.get_color(self.colors['hudbgcolor'])
+        self.foregroundcolor = self.get_color(self.colors['hudfgcolor'])
 
         self.font = pango.FontDescription("%s %s" % (font, font_size))
         # do we need to add some sort of condition here for dealing with a request for a font that doesn't exist?
@@ -112,6 +114,12 @@ class Hud:
 
         self.creation_attrs = None
 
+    def get_color(self, spec):
+        """Returns the gtk.gdk.Color for a color from the config, each is only parsed once"""
+        if spec not in self.parsed_colors:
+            self.parsed_colors[spec] = gtk.gdk.color_parse(spec)
+        return self.parsed_colors[spec]
+
     def create_mw(self):
 #	Set up a main window for this this instance of the HUD
         win = gtk.Window()
@@ -630,6 +638,24 @@ class Hud:
                       [config.supported_games[self.poker_game].stats[stat].col] = \
                       config.supported_games[self.poker_game].stats[stat].stat_name
 
+        # (row, col, config, function, colors) of each stat cell, the stat names are looked
+        # up and the colors parsed once here. colors is the normal color, then (threshold,
+        # color) for low and high values or None.
+        self.stat_cells = []
+        for r in xrange(game.rows):
+            for c in xrange(game.cols):
+                this_stat = game.stats[self.stats[r][c]]
+                if this_stat.hudcolor != "":
+                    color = self.get_color(this_stat.hudcolor)
+                else:
+                    color = self.foregroundcolor
+                lo = hi = None
+                if this_stat.stat_loth != "":
+                    lo = (float(this_stat.stat_loth)/100, self.get_color(this_stat.stat_locolor))
+                if this_stat.stat_hith != "":
+                    hi = (float(this_stat.stat_hith)/100, self.get_color(this_stat.stat_hicolor))
+                self.stat_cells.append((r, c, this_stat, Stats.get_stat(self.stats[r][c]), (color, lo, hi)))
+
         if os.name == "nt": # we call update_table_position() regularly in Windows to see if we're moving around.  See comments on that function for why this isn't done in X.
             gobject.timeout_add(500, self.update_table_position)
 
@@ -639,7 +665,7 @@ class Hud:
             if self.update_table_position() == False: # we got killed by finding our table was gone
                 return
 
-        self.label.modify_fg(gtk.STATE_NORMAL, gtk.gdk.color_parse(self.colors['hudfgcolor']))
+        numbers = Stats.do_stats(self.stat_dict, [cell[3] for cell in self.stat_cells])
         for s in self.stat_dict:
             try:
                 statd = self.stat_dict[s]
@@ -655,34 +681,28 @@ class Hud:
                 self.create(hand, config, self.stat_dict, self.cards)
                 self.stat_windows[statd['seat']].player_id = statd['player_id']
 
-            for r in xrange(0, config.supported_games[self.poker_game].rows):
-                for c in xrange(0, config.supported_games[self.poker_game].cols):
-                    this_stat = config.supported_games[self.poker_game].stats[self.stats[r][c]]
-                    number = Stats.do_stat(self.stat_dict, player = statd['player_id'], stat = self.stats[r][c])
-                    statstring = "%s%s%s" % (this_stat.hudprefix, str(number[1]), this_stat.hudsuffix)
-                    window = self.stat_windows[statd['seat']]
-
-                    if this_stat.hudcolor != "":
-                        window.label[r][c].modify_fg(gtk.STATE_NORMAL, gtk.gdk.color_parse(this_stat.hudcolor))
-                    else:
-                        window.label[r][c].modify_fg(gtk.STATE_NORMAL, gtk.gdk.color_parse(self.colors['hudfgcolor']))	
-                    
-                    if this_stat.stat_loth != "":
-                        if number[0] < (float(this_stat.stat_loth)/100):
-                            window.label[r][c].modify_fg(gtk.STATE_NORMAL, gtk.gdk.color_parse(this_stat.stat_locolor))
-
-                    if this_stat.stat_hith != "":
-                        if number[0] > (float(this_stat.stat_hith)/100):
-                            window.label[r][c].modify_fg(gtk.STATE_NORMAL, gtk.gdk.color_parse(this_stat.stat_hicolor))
-
+            window = self.stat_windows[statd['seat']]
+            unhidewindow = False
+            for ((r, c, this_stat, func, colors), number) in zip(self.stat_cells, numbers[s]):
+                statstring = "%s%s%s" % (this_stat.hudprefix, str(number[1]), this_stat.hudsuffix)
+                (color, lo, hi) = colors
+                if lo is not None and number[0] < lo[0]:
+                    color = lo[1]
+                if hi is not None and number[0] > hi[0]:
+                    color = hi[1]
+
+                # only hand gtk the labels that changed since the last hand
+                (shown_text, shown_color) = window.shown[r][c]
+                if color is not shown_color:
+                    window.label[r][c].modify_fg(gtk.STATE_NORMAL, color)
+                if statstring != shown_text:
                     window.label[r][c].set_text(statstring)
-                    if statstring != "xxx": # is there a way to tell if this particular stat window is visible already, or no?
-                        unhidewindow = True
-                    tip = "%s\n%s\n%s, %s" % (statd['screen_name'], number[5], number[3], number[4])
-                    Stats.do_tip(window.e_box[r][c], tip)
-            if unhidewindow: #and not window.window.visible: # there is no "visible" attribute in gtk.Window, although the docs seem to indicate there should be
+                window.shown[r][c] = (statstring, color)
+                window.tips[r][c] = (statd['screen_name'], number)
+                if statstring != "xxx":
+                    unhidewindow = True
+            if unhidewindow and not window.window.get_property("visible"):
                 window.window.show_all()
-            unhidewindow = False
 
     def topify_window(self, window):
         window.set_focus_on_map(False)
@@ -725,6 +745,16 @@ class Stat_Window:
             return True
         return False
 
+    def query_tooltip_cb(self, widget, x, y, keyboard_mode, tooltip, r, c):
+#    The tooltip text is only put together when it is about to be shown, rather
+#    than for every stat on every hand.
+        if self.tips[r][c] is None:
+            return False
+        (screen_name, number) = self.tips[r][c]
+        tip = "%s\n%s\n%s, %s" % (screen_name, number[5], number[3], number[4])
+        tooltip.set_text(Charset.to_utf8(tip))
+        return True
+
     def noop(self, arga=None, argb=None): # i'm going to try to connect the focus-in and focus-out events here, to see if that fixes any of the focus problems.
         return True
 
@@ -773,6 +803,8 @@ class Stat_Window:
         self.e_box = []
         self.frame = []
         self.label = []
+        self.tips = []      # (screen name, stat tuple) per cell, made into a tooltip on hover
+        self.shown = []     # (text, color) last put in each label, see Hud.update()
         usegtkframes = self.useframes
         e_box = self.e_box
         label = self.label
@@ -781,6 +813,8 @@ class Stat_Window:
                 self.frame.append([])
             e_box.append([])
             label.append([])
+            self.tips.append([None] * game.cols)
+            self.shown.append([('xxx', parent.foregroundcolor)] * game.cols)
             for c in xrange(game.cols):
                 if usegtkframes:
                     self.frame[r].append( gtk.Frame() )
@@ -789,7 +823,8 @@ class Stat_Window:
                 e_box[r][c].modify_bg(gtk.STATE_NORMAL, parent.backgroundcolor)
                 e_box[r][c].modify_fg(gtk.STATE_NORMAL, parent.foregroundcolor)
 
-                Stats.do_tip(e_box[r][c], 'stuff')
+                e_box[r][c].set_has_tooltip(True)
+                e_box[r][c].connect("query-tooltip", self.query_tooltip_cb, r, c)
                 if usegtkframes:
                     grid.attach(self.frame[r][c], c, c+1, r, r+1, xpadding = game.xpad, ypadding = game.ypad)
                     self.frame[r][c].add(e_box[r][c])
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+"""Keeping track of what fpdb spends its startup time importing, and putting off
+importing modules (mostly the tabs) until they are used.
+"""
+
+import sys
+import time
+import __builtin__
+
+import logging
+# logging has been set up in fpdb.py or HUD_main.py, use their settings:
+log = logging.getLogger("fpdb")
+
+#    seconds the first import of each module took, including the modules it imported
+import_times = {}
+builtin_import = __builtin__.__import__
+
+def timed_import(name, *args, **kwargs):
+    if name in sys.modules:
+        return builtin_import(name, *args, **kwargs)
+    start = time.time()
+    try:
+        return builtin_import(name, *args, **kwargs)
+    finally:
+        import_times.setdefault(name, time.time() - start)
+
+def start_timing():
+    """Time all imports from now on, until stop_timing()"""
+    __builtin__.__import__ = timed_import
+
+def stop_timing():
+    __builtin__.__import__ = builtin_import
+
+def log_import_times(min_time = 0.005):
+    """Log the modules that took at least min_time seconds to import, slowest first"""
+    log.info("Import times (seconds, including modules imported by each):")
+    for (name, t) in sorted(import_times.items(), key = lambda x: -x[1]):
+        if t >= min_time:
+            log.info("    %-30s %6.3f" % (name, t))
+
+class LazyModule(object):
+    """Stands in for a module until one of its attributes is used, and only then
+       imports it, eg GuiGraphViewer = LazyModule('GuiGraphViewer')"""
+    def __init__(self, name):
+        self.__dict__['name'] = name
+        self.__dict__['module'] = None
+
+    def __getattr__(self, attr):
+        if self.module is None:
+            start = time.time()
+            self.__dict__['module'] = __import__(self.name)
+            import_times[self.name] = time.time() - start
+            log.info("Imported %s in %.3f seconds" % (self.name, import_times[self.name]))
+        return getattr(self.module, attr)
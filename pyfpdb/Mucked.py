@@ -38,6 +38,15 @@ import Configuration
 import Database
 import Card
 
+#    Card images by deck file, so each deck is only loaded and cut up once however
+#    many aux windows use it, see Aux_Window.get_card_images()
+deck_cache = {}
+
+#    Images of several cards side by side by (deck, cards, card width, card height),
+#    see Aux_Window.get_card_strip(). Emptied when it gets to strip_cache_size.
+strip_cache = {}
+strip_cache_size = 500
+
 class Aux_Window(object):
     def __init__(self, hud, params, config):
         self.hud     = hud
@@ -60,11 +69,15 @@ class Aux_Window(object):
 #    Some utility routines useful for Aux_Windows
 #
     def get_card_images(self):
+        """Returns the card images for the configured deck, indexed by card number with
+           the card back in [0]. The images are shared, don't draw on them."""
+        deckimg = self.params['deck']
+        if deckimg in deck_cache:
+            return deck_cache[deckimg]
 
         card_images = 53 * [0]
         suits = ('s', 'h', 'd', 'c')
         ranks = (14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2)
-        deckimg = self.params['deck']
         try:
             pb = gtk.gdk.pixbuf_new_from_file(self.config.execution_path(deckimg))
         except:
@@ -74,12 +87,34 @@ class Aux_Window(object):
         for j in range(0, 13):
             for i in range(0, 4):
                 card_images[Card.cardFromValueSuit(ranks[j], suits[i])] = self.cropper(pb, i, j)
-        temp_pb = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, pb.get_has_alpha(), pb.get_bits_per_sample(),  30,  42)
 #    also pick out a card back and store in [0]
         card_images[0] = self.cropper(pb, 2, 13)
+        deck_cache[deckimg] = card_images
         return(card_images)
 #   cards are 30 wide x 42 high
 
+    def get_card_strip(self, cards, card_wd, card_ht):
+        """Returns an image of cards side by side, up to the first None or 0 in cards.
+           The image is shared, don't draw on it."""
+        n_cards = 0
+        for card in cards:
+            if card == None or card == 0:
+                break
+            n_cards += 1
+        key = (self.params['deck'], tuple(cards[:n_cards]), card_wd, card_ht)
+        if key in strip_cache:
+            return strip_cache[key]
+
+        card_images = self.get_card_images()
+#    strip is a working pixbuf, used to assemble the image
+        strip = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, True, 8, card_wd*n_cards, card_ht)
+        for (n, card) in enumerate(cards[:n_cards]):
+            card_images[card].copy_area(0, 0, card_wd, card_ht, strip, card_wd*n, 0)
+        if len(strip_cache) >= strip_cache_size:
+            strip_cache.clear()
+        strip_cache[key] = strip
+        return strip
+
     def cropper(self, pb, i, j):
         """Crop out a card image given an FTP deck and the i, j position."""
         temp_pb = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, pb.get_has_alpha(), pb.get_bits_per_sample(),  30,  42)
@@ -465,20 +500,8 @@ class Flop_Mucked(Aux_Seats):
         n_cards = self.has_cards(cards)
         if n_cards > 1:
 
-#    scratch is a working pixbuf, used to assemble the image
-            scratch = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, True, 8,
-                                     int(self.params['card_wd'])*n_cards,
-                                     int(self.params['card_ht']))
-            x = 0 # x coord where the next card starts in scratch
-            for card in cards:
-#    concatenate each card image to scratch
-                if card == None or card ==0:
-                    break
-                self.card_images[card].copy_area(0, 0, 
-                                        int(self.params['card_wd']), int(self.params['card_ht']),
-                                        scratch, x, 0)
-                x = x + int(self.params['card_wd'])
-            container.seen_cards.set_from_pixbuf(scratch)
+            strip = self.get_card_strip(cards, int(self.params['card_wd']), int(self.params['card_ht']))
+            container.seen_cards.set_from_pixbuf(strip)
             container.resize(1,1)
             container.show()
             container.move(self.positions[i][0], self.positions[i][1])   # here is where I move back
@@ -289,7 +289,7 @@ class PartyPoker(HandHistoryConverter):
                     self.totalpot = self.pot.total
                 for i,v in enumerate(self.collected):
                     if v[0] in self.pot.returned:
-                        self.collected[i][1] = Decimal(v[1]) - self.pot.returned[v[0]]
+                        self.collected[i][1] = self.money(v[1]) - self.pot.returned[v[0]]
                         self.collectees[v[0]] -= self.pot.returned[v[0]]
                         self.pot.returned[v[0]] = 0
                 return origTotalPot()
@@ -509,7 +509,7 @@ class PartyPoker(HandHistoryConverter):
                 Bp = hand.lastBet[street]
                 if Bp == 0:
                     actionType = 'bets'
-                elif Bp < Decimal(amount):
+                elif Bp < hand.money(amount):
                     actionType = 'raises'
                 else:
                     actionType = 'calls'
@@ -117,6 +117,9 @@ class PokerStars(HandHistoryConverter):
 
     re_SplitHands   = re.compile('\n\n+')
     re_TailSplitHands   = re.compile('(\n\n\n+)')
+    # every player regex has the name at the start of a line or after "Seat n: "
+    # and is followed by fixed text, so a lazy match finds it without the names
+    anyPlayerRe     = u"(?P<PNAME>.+?)"
     re_Button       = re.compile('Seat #(?P<BUTTON>\d+) is the button', re.MULTILINE)
     re_Board        = re.compile(r"\[(?P<CARDS>.+)\]")
 #        self.re_setHandInfoRegex('.*#(?P<HID>[0-9]+): Table (?P<TABLE>[ a-zA-Z]+) - \$?(?P<SB>[.0-9]+)/\$?(?P<BB>[.0-9]+) - (?P<GAMETYPE>.*) - (?P<HR>[0-9]+):(?P<MIN>[0-9]+) ET - (?P<YEAR>[0-9]+)/(?P<MON>[0-9]+)/(?P<DAY>[0-9]+)Table (?P<TABLE>[ a-zA-Z]+)\nSeat (?P<BUTTON>[0-9]+)')    
@@ -133,7 +136,10 @@ class PokerStars(HandHistoryConverter):
 #    since they are used to find all cards on lines starting with "Dealt to:"
 #    They still identify the hero.
             self.compiledPlayers = players
-            player_re = "(?P<PNAME>" + "|".join(map(re.escape, players)) + ")"
+            if self.anyPlayers:
+                player_re = self.anyPlayerRe
+            else:
+                player_re = "(?P<PNAME>" + "|".join(map(re.escape, players)) + ")"
             subst = {'PLYR': player_re, 'CUR': self.sym[hand.gametype['currency']]}
             log.debug("player_re: " + player_re)
             self.re_PostSB           = re.compile(r"^%(PLYR)s: posts small blind %(CUR)s(?P<SB>[.0-9]+)" %  subst, re.MULTILINE)
@@ -97,16 +97,24 @@ class Sql:
         ################################
         # Create Settings
         ################################
+        # hudcacheHandId: highest Hands.id included by the last HudCache rebuild
+        # generation:     bumped by every import, so readers can tell their results are stale
         if db_server == 'mysql':
             self.query['createSettingsTable'] = """CREATE TABLE Settings (
-                                        version SMALLINT NOT NULL)
+                                        version SMALLINT NOT NULL,
+                                        hudcacheHandId BIGINT UNSIGNED NOT NULL DEFAULT 0,
+                                        generation BIGINT UNSIGNED NOT NULL DEFAULT 0)
                                 ENGINE=INNODB"""
         elif db_server == 'postgresql':
-            self.query['createSettingsTable'] =  """CREATE TABLE Settings (version SMALLINT NOT NULL)"""
+            self.query['createSettingsTable'] =  """CREATE TABLE Settings (version SMALLINT NOT NULL,
+                                        hudcacheHandId BIGINT NOT NULL DEFAULT 0,
+                                        generation BIGINT NOT NULL DEFAULT 0)"""
 
         elif db_server == 'sqlite':
             self.query['createSettingsTable'] = """CREATE TABLE Settings
-            (version INTEGER NOT NULL) """
+            (version INTEGER NOT NULL,
+             hudcacheHandId INTEGER NOT NULL DEFAULT 0,
+             generation INTEGER NOT NULL DEFAULT 0) """
 
         ################################
         # Create RawHands (this table is all but identical with RawTourneys)
@@ -154,6 +162,68 @@ class Sql:
                         rawTourney TEXT NOT NULL,
                         complain BOOLEAN NOT NULL DEFAULT FALSE)"""
                         
+        ################################
+        # Create Files
+        ################################
+        # lastOffset: byte offset in the file up to which hands have been imported
+        if db_server == 'mysql':
+            self.query['createFilesTable'] = """CREATE TABLE Files (
+                        id BIGINT UNSIGNED AUTO_INCREMENT NOT NULL, PRIMARY KEY (id),
+                        file TEXT NOT NULL,
+                        inode BIGINT NOT NULL,
+                        lastOffset BIGINT NOT NULL)
+                        ENGINE=INNODB"""
+        elif db_server == 'postgresql':
+            self.query['createFilesTable'] =  """CREATE TABLE Files (
+                        id BIGSERIAL, PRIMARY KEY (id),
+                        file TEXT NOT NULL,
+                        inode BIGINT NOT NULL,
+                        lastOffset BIGINT NOT NULL)"""
+        elif db_server == 'sqlite':
+            self.query['createFilesTable'] = """CREATE TABLE Files (
+                        id INTEGER PRIMARY KEY,
+                        file TEXT NOT NULL,
+                        inode INT NOT NULL,
+                        lastOffset INT NOT NULL)"""
+
+        ################################
+        # Create Sessions
+        ################################
+        # the hero's cash game sessions, kept up to date on import for GuiSessionViewer
+        # high/lowProfit are the highest and lowest running profit in the session (0 at its start)
+
+        if db_server == 'mysql':
+            self.query['createSessionsTable'] = """CREATE TABLE Sessions (
+                        id BIGINT UNSIGNED AUTO_INCREMENT NOT NULL, PRIMARY KEY (id),
+                        playerId INT UNSIGNED NOT NULL, FOREIGN KEY (playerId) REFERENCES Players(id),
+                        sessionStart DATETIME NOT NULL,
+                        sessionEnd DATETIME NOT NULL,
+                        hands INT NOT NULL,
+                        totalProfit INT NOT NULL,
+                        highProfit INT NOT NULL,
+                        lowProfit INT NOT NULL)
+                        ENGINE=INNODB"""
+        elif db_server == 'postgresql':
+            self.query['createSessionsTable'] =  """CREATE TABLE Sessions (
+                        id BIGSERIAL, PRIMARY KEY (id),
+                        playerId INT NOT NULL, FOREIGN KEY (playerId) REFERENCES Players(id),
+                        sessionStart timestamp without time zone NOT NULL,
+                        sessionEnd timestamp without time zone NOT NULL,
+                        hands INT NOT NULL,
+                        totalProfit INT NOT NULL,
+                        highProfit INT NOT NULL,
+                        lowProfit INT NOT NULL)"""
+        elif db_server == 'sqlite':
+            self.query['createSessionsTable'] = """CREATE TABLE Sessions (
+                        id INTEGER PRIMARY KEY,
+                        playerId INT NOT NULL,
+                        sessionStart REAL NOT NULL,
+                        sessionEnd REAL NOT NULL,
+                        hands INT NOT NULL,
+                        totalProfit INT NOT NULL,
+                        highProfit INT NOT NULL,
+                        lowProfit INT NOT NULL)"""
+
         ################################
         # Create Actions
         ################################
@@ -1378,6 +1448,13 @@ class Sql:
         elif db_server == 'sqlite':
             self.query['addPlayersIndex'] = """CREATE UNIQUE INDEX name ON Players (name, siteId)"""
 
+        if db_server == 'mysql':
+            self.query['addFilesIndex'] = """ALTER TABLE Files ADD UNIQUE INDEX file(file(255), inode)"""
+        elif db_server == 'postgresql':
+            self.query['addFilesIndex'] = """CREATE UNIQUE INDEX file ON Files (file, inode)"""
+        elif db_server == 'sqlite':
+            self.query['addFilesIndex'] = """CREATE UNIQUE INDEX file ON Files (file, inode)"""
+
         if db_server == 'mysql':
             self.query['addTPlayersIndex'] = """ALTER TABLE TourneysPlayers ADD UNIQUE INDEX tourneyId(tourneyId, playerId)"""
         elif db_server == 'postgresql':
@@ -1652,6 +1729,125 @@ class Sql:
                 #  where %s is the number of active players at the current table (and
                 #  1.25 would be a config value so user could change it)
 
+#    one hand's contribution to the stats above, for HUDs that keep their stats
+#    up to date hand by hand (see Database.get_stats_from_hand_cached)
+        self.query['get_stats_delta_from_hand'] = """
+                SELECT hp.playerId                         AS player_id,
+                       hp.seatNo                           AS seat,
+                       p.name                              AS screen_name,
+                       h.gametypeId                        AS gametype_id,
+                       h.seats                             AS seats,
+                       hp.position                         AS position,
+                       h.startTime                         AS start_time,
+                       gt.bigBlind                         AS bigblind,
+                       1                                   AS n,
+                       hp.street0VPI                       AS vpip,
+                       hp.street0Aggr                      AS pfr,
+                       hp.street0_3BChance                 AS TB_opp_0,
+                       hp.street0_3BDone                   AS TB_0,
+                       hp.street1Seen                      AS saw_f,
+                       hp.street1Seen                      AS saw_1,
+                       hp.street2Seen                      AS saw_2,
+                       hp.street3Seen                      AS saw_3,
+                       hp.street4Seen                      AS saw_4,
+                       hp.sawShowdown                      AS sd,
+                       hp.street1Aggr                      AS aggr_1,
+                       hp.street2Aggr                      AS aggr_2,
+                       hp.street3Aggr                      AS aggr_3,
+                       hp.street4Aggr                      AS aggr_4,
+                       hp.otherRaisedStreet1               AS was_raised_1,
+                       hp.otherRaisedStreet2               AS was_raised_2,
+                       hp.otherRaisedStreet3               AS was_raised_3,
+                       hp.otherRaisedStreet4               AS was_raised_4,
+                       hp.foldToOtherRaisedStreet1         AS f_freq_1,
+                       hp.foldToOtherRaisedStreet2         AS f_freq_2,
+                       hp.foldToOtherRaisedStreet3         AS f_freq_3,
+                       hp.foldToOtherRaisedStreet4         AS f_freq_4,
+                       hp.wonWhenSeenStreet1               AS w_w_s_1,
+                       hp.wonAtSD                          AS wmsd,
+                       hp.raiseFirstInChance               AS steal_opp,
+                       hp.raisedFirstIn                    AS steal,
+                       hp.foldSbToStealChance              AS SBstolen,
+                       hp.foldedSbToSteal                  AS SBnotDef,
+                       hp.foldBbToStealChance              AS BBstolen,
+                       hp.foldedBbToSteal                  AS BBnotDef,
+                       hp.street1CBChance                  AS CB_opp_1,
+                       hp.street1CBDone                    AS CB_1,
+                       hp.street2CBChance                  AS CB_opp_2,
+                       hp.street2CBDone                    AS CB_2,
+                       hp.street3CBChance                  AS CB_opp_3,
+                       hp.street3CBDone                    AS CB_3,
+                       hp.street4CBChance                  AS CB_opp_4,
+                       hp.street4CBDone                    AS CB_4,
+                       hp.foldToStreet1CBChance            AS f_cb_opp_1,
+                       hp.foldToStreet1CBDone              AS f_cb_1,
+                       hp.foldToStreet2CBChance            AS f_cb_opp_2,
+                       hp.foldToStreet2CBDone              AS f_cb_2,
+                       hp.foldToStreet3CBChance            AS f_cb_opp_3,
+                       hp.foldToStreet3CBDone              AS f_cb_3,
+                       hp.foldToStreet4CBChance            AS f_cb_opp_4,
+                       hp.foldToStreet4CBDone              AS f_cb_4,
+                       hp.totalProfit                      AS net,
+                       hp.street1CheckCallRaiseChance      AS ccr_opp_1,
+                       hp.street1CheckCallRaiseDone        AS ccr_1,
+                       hp.street2CheckCallRaiseChance      AS ccr_opp_2,
+                       hp.street2CheckCallRaiseDone        AS ccr_2,
+                       hp.street3CheckCallRaiseChance      AS ccr_opp_3,
+                       hp.street3CheckCallRaiseDone        AS ccr_3,
+                       hp.street4CheckCallRaiseChance      AS ccr_opp_4,
+                       hp.street4CheckCallRaiseDone        AS ccr_4,
+                       hp.street0Calls                     AS call_0,
+                       hp.street1Calls                     AS call_1,
+                       hp.street2Calls                     AS call_2,
+                       hp.street3Calls                     AS call_3,
+                       hp.street4Calls                     AS call_4,
+                       hp.street0Bets                      AS bet_0,
+                       hp.street1Bets                      AS bet_1,
+                       hp.street2Bets                      AS bet_2,
+                       hp.street3Bets                      AS bet_3,
+                       hp.street4Bets                      AS bet_4,
+                       hp.street0Raises                    AS raise_0,
+                       hp.street1Raises                    AS raise_1,
+                       hp.street2Raises                    AS raise_2,
+                       hp.street3Raises                    AS raise_3,
+                       hp.street4Raises                    AS raise_4
+                FROM Hands h
+                     INNER JOIN HandsPlayers hp ON (hp.handId = h.id)
+                     INNER JOIN Players p       ON (p.id = hp.playerId)
+                     INNER JOIN Gametypes gt    ON (gt.id = h.gametypeId)
+                WHERE h.id = %s
+            """
+
+        # the same for the hands at a table between two hands, to start a session window
+        self.query['get_stats_delta_from_table'] = self.query['get_stats_delta_from_hand'].replace(
+                "SELECT hp.playerId", "SELECT h.id                                AS hand_id,\n                       hp.playerId").replace(
+                "WHERE h.id = %s", "WHERE h.tableName = %s\n                AND   h.id > %s\n                AND   h.id < %s\n                ORDER BY h.id")
+
+        # the HudCache rows a player's stats in some gametypes are summed from
+        self.query['get_hudcache_player_keys'] = """
+                SELECT gametypeId, activeSeats, position, styleKey
+                FROM HudCache
+                WHERE playerId = %s
+                AND   gametypeId IN (<gametypes>)
+                AND   styleKey > %s
+                AND   activeSeats between %s and %s"""
+
+        # the gametypes get_stats_from_hand_aggregated sums the stats of a gametype over
+        self.query['get_aggregated_gametypes'] = """
+                SELECT gt1.id from Gametypes gt1, Gametypes gt2
+                WHERE  gt1.siteid = gt2.siteid
+                AND    gt1.type = gt2.type
+                AND    gt1.category = gt2.category
+                AND    gt1.limittype = gt2.limittype
+                AND    gt1.bigblind <= gt2.bigblind * %s
+                AND    gt1.bigblind >= gt2.bigblind / %s
+                AND    gt2.id = %s"""
+
+        # get_stats_from_hand_aggregated with the last hand id, from the same snapshot
+        # of the db as the stats, so it tells which hands they include
+        self.query['get_stats_from_hand_aggregated_last'] = self.query['get_stats_from_hand_aggregated'].replace(
+                "AS raise_4\n", "AS raise_4,\n                       (SELECT max(id) FROM Hands)         AS last_hand\n", 1)
+
         if db_server == 'mysql':
             self.query['get_stats_from_hand_session'] = """
                     SELECT hp.playerId                                              AS player_id, /* playerId and seats must */
@@ -3080,7 +3276,7 @@ class Sql:
             ORDER BY h.startTime"""
 
         self.query['getRingProfitAllHandsPlayerIdSiteInBB'] = """
-            SELECT hp.handId, ( hp.totalProfit / ( gt.bigBlind  * 2 ) ) * 100 , hp.sawShowdown
+            SELECT ( hp.totalProfit / ( gt.bigBlind  * 2 ) ) * 100 , hp.sawShowdown
             FROM HandsPlayers hp
             INNER JOIN Players pl      ON  (pl.id = hp.playerId)
             INNER JOIN Hands h         ON  (h.id  = hp.handId)
@@ -3096,7 +3292,7 @@ class Sql:
             ORDER BY h.startTime"""
 
         self.query['getRingProfitAllHandsPlayerIdSiteInDollars'] = """
-            SELECT hp.handId, hp.totalProfit, hp.sawShowdown
+            SELECT hp.totalProfit, hp.sawShowdown
             FROM HandsPlayers hp
             INNER JOIN Players pl      ON  (pl.id = hp.playerId)
             INNER JOIN Hands h         ON  (h.id  = hp.handId)
@@ -3139,42 +3335,13 @@ class Sql:
         ####################################
         # Session stats query
         ####################################
-        if db_server == 'mysql':
-            self.query['sessionStats'] = """
-                SELECT UNIX_TIMESTAMP(h.startTime) as time, hp.handId, hp.startCash, hp.winnings, hp.totalProfit
-                FROM HandsPlayers hp
-                 INNER JOIN Hands h       on  (h.id = hp.handId)
-                 INNER JOIN Gametypes gt  on  (gt.Id = h.gameTypeId)
-                 INNER JOIN Sites s       on  (s.Id = gt.siteId)
-                 INNER JOIN Players p     on  (p.Id = hp.playerId)
-                WHERE hp.playerId in <player_test>
-                 AND  date_format(h.startTime, '%Y-%m-%d') <datestest>
-                 AND  gt.type LIKE 'ring'
-                ORDER by time"""
-        elif db_server == 'postgresql':
-            self.query['sessionStats'] = """
-                SELECT EXTRACT(epoch from h.startTime) as time, hp.handId, hp.startCash, hp.winnings, hp.totalProfit
-                FROM HandsPlayers hp
-                 INNER JOIN Hands h       on  (h.id = hp.handId)
-                 INNER JOIN Gametypes gt  on  (gt.Id = h.gameTypeId)
-                 INNER JOIN Sites s       on  (s.Id = gt.siteId)
-                 INNER JOIN Players p     on  (p.Id = hp.playerId)
-                WHERE hp.playerId in <player_test>
-                 AND  h.startTime <datestest>
-                 AND  gt.type LIKE 'ring'
-                ORDER by time"""
-        elif db_server == 'sqlite':
-            self.query['sessionStats'] = """
-                SELECT STRFTIME('<ampersand_s>', h.startTime) as time, hp.handId, hp.startCash, hp.winnings, hp.totalProfit
-                FROM HandsPlayers hp
-                 INNER JOIN Hands h       on  (h.id = hp.handId)
-                 INNER JOIN Gametypes gt  on  (gt.Id = h.gameTypeId)
-                 INNER JOIN Sites s       on  (s.Id = gt.siteId)
-                 INNER JOIN Players p     on  (p.Id = hp.playerId)
-                WHERE hp.playerId in <player_test>
-                 AND  h.startTime <datestest>
-                 AND  gt.type is 'ring'
-                ORDER by time"""
+
+        self.query['getPlayerSessions'] = """
+                SELECT s.sessionStart, s.sessionEnd, s.hands, s.totalProfit, s.highProfit, s.lowProfit
+                FROM Sessions s
+                WHERE s.playerId in <player_test>
+                 AND  s.sessionStart <datestest>
+                ORDER by s.sessionStart"""
 
 
         ####################################
@@ -3182,6 +3349,30 @@ class Sql:
         ####################################
       
         self.query['clearHudCache'] = """DELETE FROM HudCache"""
+        self.query['clearHudCachePartition'] = """DELETE FROM HudCache WHERE gametypeId=%s AND styleKey=%s"""
+
+        self.query['get_hudcache_watermark'] = """SELECT hudcacheHandId FROM Settings"""
+        self.query['set_hudcache_watermark'] = """UPDATE Settings SET hudcacheHandId=%s"""
+
+        self.query['get_generation'] = """SELECT generation FROM Settings"""
+        self.query['bump_generation'] = """UPDATE Settings SET generation=generation+1"""
+
+        # (gametypeId, styleKey) partitions of HudCache that hands after the watermark go in
+        if db_server == 'mysql':
+            self.query['get_hudcache_partitions'] = """
+                SELECT DISTINCT gametypeId, date_format(startTime, 'd%%y%%m%%d')
+                FROM Hands
+                WHERE id > %s"""
+        elif db_server == 'postgresql':
+            self.query['get_hudcache_partitions'] = """
+                SELECT DISTINCT gametypeId, 'd' || to_char(startTime, 'YYMMDD')
+                FROM Hands
+                WHERE id > %s"""
+        elif db_server == 'sqlite':
+            self.query['get_hudcache_partitions'] = """
+                SELECT DISTINCT gametypeId, 'd' || substr(strftime('%Y%m%d', startTime),3,7)
+                FROM Hands
+                WHERE id > %s"""
        
         if db_server == 'mysql':
             self.query['rebuildHudCache'] = """
@@ -3971,6 +4162,13 @@ class Sql:
             AND   tourneyTypeId+0=%s
             AND   styleKey=%s"""
 
+        self.query['update_hudcache_by_id'] = self.query['update_hudcache'].split('WHERE')[0] + "WHERE id=%s"
+
+        self.query['get_hudcache_keys'] = """SELECT id, gametypeId, playerId, activeSeats, position, tourneyTypeId, styleKey
+                                             FROM HudCache
+                                             WHERE playerId in <playerid_list>
+                                             AND   styleKey in <stylekey_list>"""
+
         self.query['get_hero_hudcache_start'] = """select min(hc.styleKey)
                                                    from HudCache hc
                                                    where hc.playerId in <playerid_list>
@@ -4036,7 +4234,62 @@ class Sql:
         self.query['isAlreadyInDB'] = """SELECT id FROM Hands 
                                          WHERE gametypeId=%s AND siteHandNo=%s
         """
+
+        self.query['getHandIndex'] = """SELECT gametypeId, siteHandNo FROM Hands
+                                        ORDER BY gametypeId, siteHandNo"""
+
+        self.query['getPlayerIDs'] = """SELECT siteId, name, id FROM Players"""
+
+        self.query['getPlayerIDsByName'] = """SELECT name, id FROM Players
+                                              WHERE siteId = %s
+                                              AND   name IN (<names>)"""
+
+        self.query['insertPlayer'] = """INSERT INTO Players (name, siteId) VALUES (%s, %s)"""
+
+        self.query['getFileOffset'] = """SELECT lastOffset FROM Files
+                                         WHERE file = %s AND inode = %s"""
+
+        self.query['updateFileOffset'] = """UPDATE Files SET lastOffset = %s
+                                            WHERE file = %s AND inode = %s"""
+
+        self.query['insertFileOffset'] = """INSERT INTO Files (lastOffset, file, inode)
+                                            VALUES (%s, %s, %s)"""
         
+        # Sessions of a player overlapping a time range, and the player's cash
+        # game hands in a range, to split them into sessions again
+        self.query['clearSessions'] = """DELETE FROM Sessions"""
+
+        self.query['getSessionsRange'] = """SELECT MIN(sessionStart), MAX(sessionEnd) FROM Sessions
+                                            WHERE playerId = %s
+                                            AND   sessionEnd >= %s
+                                            AND   sessionStart <= %s"""
+
+        self.query['deleteSessionsRange'] = """DELETE FROM Sessions
+                                               WHERE playerId = %s
+                                               AND   sessionEnd >= %s
+                                               AND   sessionStart <= %s"""
+
+        self.query['getSessionHands'] = """SELECT h.startTime, hp.totalProfit
+                                           FROM HandsPlayers hp
+                                            INNER JOIN Hands h      ON (h.id = hp.handId)
+                                            INNER JOIN Gametypes gt ON (gt.id = h.gametypeId)
+                                           WHERE hp.playerId = %s
+                                           AND   h.startTime >= %s
+                                           AND   h.startTime < %s
+                                           AND   gt.type = 'ring'
+                                           ORDER BY h.startTime"""
+
+        self.query['getPlayerRingRange'] = """SELECT MIN(h.startTime), MAX(h.startTime)
+                                              FROM HandsPlayers hp
+                                               INNER JOIN Hands h      ON (h.id = hp.handId)
+                                               INNER JOIN Gametypes gt ON (gt.id = h.gametypeId)
+                                              WHERE hp.playerId = %s
+                                              AND   gt.type = 'ring'"""
+
+        self.query['insertSession'] = """INSERT INTO Sessions (playerId, sessionStart, sessionEnd, hands,
+                                                               totalProfit, highProfit, lowProfit)
+                                         VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+
         self.query['getTourneyTypeIdByTourneyNo'] = """SELECT tt.id,
                                                               tt.buyin,
                                                               tt.fee,
@@ -4123,6 +4376,11 @@ class Sql:
                                                 WHERE tourneyId=%s AND playerId+0=%s            
         """
 
+        self.query['getTourneysPlayersByPlayers'] = """SELECT playerId, id
+                                                    FROM TourneysPlayers
+                                                    WHERE tourneyId=%s AND playerId IN (<players>)
+        """
+
         self.query['updateTourneysPlayer'] = """UPDATE TourneysPlayers
                                                  SET rank = %s,
                                                      winnings = %s,
@@ -4333,6 +4591,28 @@ class Sql:
                     %s
                 )"""
         
+        # Bulk inserts (see Database.insert_batch) give Hands and HandsPlayers
+        # rows ids reserved up front instead of asking for the last insert id,
+        # see Database.reserveIds()
+        if db_server == 'mysql':
+            # locking reads, which keep other connections from inserting after the
+            # last row until the transaction ends
+            self.query['get_max_hands_id'] = "select id from Hands order by id desc limit 1 for update"
+            self.query['get_max_handsplayers_id'] = "select id from HandsPlayers order by id desc limit 1 for update"
+        else:
+            self.query['get_max_hands_id'] = "select coalesce(max(id),0) from Hands"
+            self.query['get_max_handsplayers_id'] = "select coalesce(max(id),0) from HandsPlayers"
+        if db_server == 'sqlite':
+            # any write takes the write lock, which is held until the commit
+            self.query['lock_for_ids'] = "update Settings set version=version"
+        for k in ('store_hand', 'store_hands_players'):
+            q = self.query[k].replace('(', '(id, ', 1)
+            i = q.index('VALUES')
+            self.query[k + '_with_id'] = q[:i] + q[i:].replace('(', '(%s, ', 1)
+        if db_server == 'postgresql':
+            self.query['reserve_hands_ids'] = "select nextval(pg_get_serial_sequence('hands', 'id')) from generate_series(1, %s)"
+            self.query['reserve_handsplayers_ids'] = "select nextval(pg_get_serial_sequence('handsplayers', 'id')) from generate_series(1, %s)"
+        
         ################################
         # Counts for DB stats window
         ################################
@@ -4343,7 +4623,7 @@ class Sql:
         ################################
         # queries for dumpDatabase
         ################################
-        for table in (u'Autorates', u'Backings', u'Gametypes', u'Hands', u'HandsActions', u'HandsPlayers', u'HudCache', u'Players', u'RawHands', u'RawTourneys', u'Settings', u'Sites', u'TourneyTypes', u'Tourneys', u'TourneysPlayers'):
+        for table in (u'Actions', u'Autorates', u'Backings', u'Files', u'Gametypes', u'Hands', u'HandsActions', u'HandsPlayers', u'HudCache', u'Players', u'RawHands', u'RawTourneys', u'Sessions', u'Settings', u'Sites', u'TourneyTypes', u'Tourneys', u'TourneysPlayers'):
             self.query['get'+table] = u"SELECT * FROM "+table
         
         ################################
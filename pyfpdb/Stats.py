@@ -90,13 +90,21 @@ def do_tip(widget, tip):
     widget.set_tooltip_text(_tip)
 
 
-def do_stat(stat_dict, player = 24, stat = 'vpip'):
+stat_funcs = {}     # stat name as used in the config -> function, see get_stat()
+
+def get_stat(stat):
+    """Returns the function (stat_dict, player) -> stat tuple for a stat name from the
+       config, eg vpip, or vpip_0 for vpip with no decimal places. The name is only
+       looked up the first time, the HUD resolves its stats when it is created."""
+    if stat in stat_funcs:
+        return stat_funcs[stat]
     statname = stat
     match = re_Places.search(stat)
     if match:   # override if necessary
         statname = stat[0:-2]
-
-    result = eval("%(stat)s(stat_dict, %(player)d)" % {'stat': statname, 'player': player})
+    func = globals().get(statname)
+    if not callable(func):
+        raise NameError(_("Unknown stat: %s") % stat)
 
     # If decimal places have been defined, override result[1]
     # NOTE: decimal place override ALWAYS assumes the raw result is a
@@ -106,8 +114,22 @@ def do_stat(stat_dict, player = 24, stat = 'vpip'):
     # candidates.
     if match:
         places = int(stat[-1:])
-        result = __stat_override(places, result)
-    return result
+        stat_func = lambda stat_dict, player: __stat_override(places, func(stat_dict, player))
+    else:
+        stat_func = func
+    stat_funcs[stat] = stat_func
+    return stat_func
+
+def do_stat(stat_dict, player = 24, stat = 'vpip'):
+    return get_stat(stat)(stat_dict, player)
+
+def do_stats(stat_dict, stats):
+    """Works out stats, a list of functions from get_stat(), for all the players in
+       stat_dict in one pass. Returns {player: [stat tuple for each of stats]}"""
+    results = {}
+    for player in stat_dict:
+        results[player] = [stat(stat_dict, player) for stat in stats]
+    return results
 
 #    OK, for reference the tuple returned by the stat is:
 #    0 - The stat, raw, no formating, eg 0.33333333
@@ -811,8 +833,8 @@ def ffreq4(stat_dict, player):
 if __name__== "__main__":
     statlist = dir()
     misslist = [ "Configuration", "Database", "Charset", "codecs", "encoder"
-               , "do_stat", "do_tip", "GInitiallyUnowned", "gtk", "pygtk"
-               , "re", "re_Places"
+               , "do_stat", "do_stats", "do_tip", "get_stat", "stat_funcs"
+               , "GInitiallyUnowned", "gtk", "pygtk", "re", "re_Places"
                ]
     statlist = [ x for x in statlist if x not in dir(sys) ]
     statlist = [ x for x in statlist if x not in dir(codecs) ]
@@ -195,9 +195,10 @@ class Table_Window(object):
         return False
 
 ####################################################################
-#    check_table() is meant to be called by the hud periodically to
-#    determine if the client has been moved or resized. check_table()
-#    also checks and signals if the client has been closed. 
+#    check_table() is meant to be called by the hud periodically (or when
+#    the window system says something changed, see watch()) to determine
+#    if the client has been moved or resized. check_table() also checks
+#    and signals if the client has been closed. 
     def check_table(self, hud):
         result = self.check_size()
         if result != False:
@@ -212,6 +213,17 @@ class Table_Window(object):
                 return True
         return True
 
+####################################################################
+#    watch() is for window systems that can tell us when the client has been
+#    moved, resized or closed. A subclass that can do that calls check_table(hud)
+#    itself and returns True, otherwise the hud has to call check_table()
+#    periodically. unwatch() is called when the hud is done with the table.
+    def watch(self, hud):
+        return False
+
+    def unwatch(self):
+        pass
+
 ####################################################################
 #    "check" methods. They use the corresponding get method, update the
 #    table object and return the name of the signal to be emitted or 
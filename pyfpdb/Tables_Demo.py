@@ -107,7 +107,8 @@ if __name__=="__main__":
 
     fake = fake_hud(table)
     gobject.timeout_add(1000, table.check_game, fake)
-    gobject.timeout_add(100, table.check_table, fake)
+    if not table.watch(fake):
+        gobject.timeout_add(100, table.check_table, fake)
     print "calling main"
     gtk.main()
 
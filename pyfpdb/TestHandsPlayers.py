@@ -86,7 +86,7 @@ def compare(leaf, importer, errors, site):
                 ghash = hand.stats.getHandsPlayers()
                 for p in ghash:
                     #print "DEBUG: player: '%s'" % p
-                    pstat = ghash[p]
+                    pstat = dict(ghash[p].items())
                     teststat = testhash[p]
 
                     for stat in pstat:
@@ -352,7 +352,7 @@ class Win2day(HandHistoryConverter):
 
     def readCollectPot(self,hand):
         for m in self.re_CollectPot.finditer(hand.handText):
-            potcoll = Decimal(m.group('POT'))
+            potcoll = hand.money(m.group('POT'))
             if potcoll > 0:
                  hand.addCollectPot(player=m.group('PNAME'),pot=potcoll)
 
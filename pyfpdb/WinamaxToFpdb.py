@@ -363,8 +363,8 @@ class Winamax(HandHistoryConverter):
             collectees.append([m.group('PNAME'), m.group('POT')])
 
         for plyr, p in collectees:
-            if plyr in returned.keys() and Decimal(p) - returned[plyr] == 0:
-                p = Decimal(p) - returned[plyr]
+            if plyr in returned.keys() and hand.money(p) - returned[plyr] == 0:
+                p = hand.money(p) - returned[plyr]
             if p > 0:
                 print "DEBUG: addCollectPot(%s,%s)" %(plyr, p)
                 hand.addCollectPot(player=plyr,pot=p)
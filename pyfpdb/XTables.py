@@ -25,13 +25,15 @@ _ = L10n.get_translation()
 
 #    Standard Library modules
 import re
-import os
 
 #    pyGTK modules
 import gtk
+import gobject
 
 #    Other Library modules
 import Xlib.display
+import Xlib.error
+from Xlib import X, Xatom
 
 #    FPDB modules
 from TableWindow import Table_Window
@@ -39,38 +41,105 @@ from TableWindow import Table_Window
 #    We might as well do this once and make them globals
 disp = Xlib.display.Display()
 root = disp.screen().root
+net_wm_name = disp.intern_atom('_NET_WM_NAME')
+
+#    Windows by title, so finding a table doesn't have to walk the window tree each
+#    time. It is only rescanned when a table isn't in it or its entry is out of date.
+window_index = {}
+
+#    Tables being watched, by the X id of their window and of its parent (the window
+#    manager's frame, which is what moves), see Table.watch()
+watched = {}
+io_watch = None
+
+def scan_windows():
+    """Rebuild window_index from the top level windows and their children."""
+    window_index.clear()
+    for outside in root.query_tree().children:
+        try:
+            for window in [outside] + outside.query_tree().children:
+                title = window.get_wm_name()
+                if title:
+                    window_index[title] = window
+        except Xlib.error.XError: # window went away while we were looking
+            continue
+
+def handle_events(source = None, condition = None):
+    """Deal with the events X has sent about watched tables. gobject calls this when
+       there is something to read from the X server, so idle tables cost nothing."""
+    changed = []
+    while disp.pending_events():
+        event = disp.next_event()
+        window = getattr(event, 'window', None)
+        table = watched.get(window.id) if window is not None else None
+        if table is None:
+            continue
+        if event.type == X.PropertyNotify:
+            if event.atom in (Xatom.WM_NAME, net_wm_name):
+                try:
+                    table.title = table.window.get_wm_name()
+                except Xlib.error.XError:
+                    pass
+            continue
+        if event.type == X.DestroyNotify and window.id == table.number:
+            table.geo = None
+        elif event.type == X.ReparentNotify and window.id == table.number:
+            table.watch_parent(event.parent)
+        if table not in changed:
+            changed.append(table)
+
+    for table in changed:
+        if table.geo is not None:
+            table.geo = table.query_geometry()
+        hud = table.watched_hud
+        if table.geo is None:
+            table.unwatch()
+        table.check_table(hud)
+    return True
+
+def drain_events():
+    """Idle callback for events that arrived while another thread waited for a reply
+       from the X server, so gobject won't see them on the connection."""
+    handle_events()
+    return False
 
 class Table(Table_Window):
 
     def find_table_parameters(self):
 
         self.number = None
-        for listing in os.popen('xwininfo -root -tree').readlines():
-            if re.search(self.search_string, listing):
-                mo = re.match('\s+([\dxabcdef]+) (.+):\s\(\"([a-zA-Z0-9\-.]+)\".+  (\d+)x(\d+)\+\d+\+\d+  \+(\d+)\+(\d+)', listing)
-                title  = re.sub('\"', '', mo.group(2))
-                if self.check_bad_words(title): continue
-                self.number = int( mo.group(1), 0)
-                self.title = title
-                self.hud    = None   # specified later
-                break
-
-        if self.number is None:
-            return None
-        
-        self.window = self.get_window_from_xid(self.number)
-        self.parent = self.window.query_tree().parent
-
-    def get_window_from_xid(self, id):
-        for outside in root.query_tree().children:
-            if outside.id == id:
-                return outside
-            for inside in outside.query_tree().children:
-                if inside.id == id:
-                    return inside
-        return None
+        self.watched_hud = None
+        (title, window) = self.find_window()
+        if window is not None:
+            self.number = window.id
+            self.title = title
+            self.hud    = None   # specified later
+            self.window = window
+            self.parent = window.query_tree().parent
+        gobject.idle_add(drain_events)
+
+    def find_window(self):
+        """Returns (title, window) for the first window in window_index with a title
+           matching search_string, or (None, None)."""
+        for rescan in (False, True):
+            if rescan:
+                scan_windows()
+            for title, window in window_index.items():
+                if not re.search(self.search_string, title) or self.check_bad_words(title):
+                    continue
+                try:
+                    if window.get_wm_name() == title:
+                        return (title, window)
+                except Xlib.error.XError: # closed since the last scan
+                    pass
+        return (None, None)
 
     def get_geometry(self):
+        if self.watched_hud is not None:
+            return self.geo             # kept up to date by handle_events()
+        return self.query_geometry()
+
+    def query_geometry(self):
         try:
             my_geo = self.window.get_geometry()
             pa_geo = self.parent.get_geometry()
@@ -83,13 +152,43 @@ class Table(Table_Window):
             return None
 
     def get_window_title(self):
-        s = os.popen("xwininfo -wm -id %d" % self.number).read()
-        mo = re.search('"(.+)"', s)
+        if self.watched_hud is not None:
+            return self.title           # kept up to date by handle_events()
         try:
-            return mo.group(1)
-        except AttributeError:
+            return self.window.get_wm_name()
+        except Xlib.error.XError:
             return None
-        
+
+    def watch(self, hud):
+        """Have X tell us when the table is moved, resized, renamed or closed, and
+           call check_table(hud) then, rather than being polled."""
+        global io_watch
+        self.geo = self.query_geometry()
+        if self.geo is None:
+            return False
+        self.watched_hud = hud
+        self.window.change_attributes(event_mask = X.StructureNotifyMask | X.PropertyChangeMask)
+        watched[self.number] = self
+        self.watch_parent(self.parent)
+        if io_watch is None:
+            io_watch = gobject.io_add_watch(disp.fileno(), gobject.IO_IN, handle_events)
+        handle_events()
+        return True
+
+    def watch_parent(self, parent):
+        if watched.get(self.parent.id) is self:
+            del watched[self.parent.id]
+        self.parent = parent
+        if parent.id != root.id:
+            parent.change_attributes(event_mask = X.StructureNotifyMask)
+            watched[parent.id] = self
+        disp.flush()
+
+    def unwatch(self):
+        for xid in (self.number, self.parent.id):
+            if watched.get(xid) is self:
+                del watched[xid]
+        self.watched_hud = None
 
     def topify(self, hud):
         hud.main_window.gdkhandle = gtk.gdk.window_foreign_new(hud.main_window.window.xid)
@@ -18,6 +18,9 @@
 import L10n
 _ = L10n.get_translation()
 
+import LazyImport
+LazyImport.start_timing()
+
 import os
 import sys
 import re
@@ -84,16 +87,12 @@ except:
 import interlocks
 
 # these imports not required in this module, imported here to report version in About dialog
-try:
-    import matplotlib
-    matplotlib_version = matplotlib.__version__
-except:
-    matplotlib_version = 'not found'
-try:
-    import numpy
-    numpy_version = numpy.__version__
-except:
-    numpy_version = 'not found'
+# (matplotlib and numpy are slow to import, so they are only looked at when it is opened)
+def module_version(name):
+    try:
+        return __import__(name).__version__
+    except:
+        return 'not found'
 try:
     import sqlite3
     sqlite3_version = sqlite3.version
@@ -102,25 +101,29 @@ except:
     sqlite3_version = 'not found'
     sqlite_version = 'not found'
 
-import GuiPrefs
-import GuiLogView
-import GuiDatabase
-import GuiBulkImport
-import GuiImapFetcher
-import GuiRingPlayerStats
-import GuiTourneyPlayerStats
-import GuiTourneyViewer
-import GuiPositionalStats
-import GuiAutoImport
-import GuiGraphViewer
-import GuiTourneyGraphViewer
-import GuiSessionViewer
 import SQL
 import Database
 import Configuration
 import Exceptions
 import Stats
 
+# the windows and tabs are only imported when they are first opened
+GuiPrefs = LazyImport.LazyModule('GuiPrefs')
+GuiLogView = LazyImport.LazyModule('GuiLogView')
+GuiDatabase = LazyImport.LazyModule('GuiDatabase')
+GuiBulkImport = LazyImport.LazyModule('GuiBulkImport')
+GuiImapFetcher = LazyImport.LazyModule('GuiImapFetcher')
+GuiRingPlayerStats = LazyImport.LazyModule('GuiRingPlayerStats')
+GuiTourneyPlayerStats = LazyImport.LazyModule('GuiTourneyPlayerStats')
+GuiTourneyViewer = LazyImport.LazyModule('GuiTourneyViewer')
+GuiPositionalStats = LazyImport.LazyModule('GuiPositionalStats')
+GuiAutoImport = LazyImport.LazyModule('GuiAutoImport')
+GuiGraphViewer = LazyImport.LazyModule('GuiGraphViewer')
+GuiTourneyGraphViewer = LazyImport.LazyModule('GuiTourneyGraphViewer')
+GuiSessionViewer = LazyImport.LazyModule('GuiSessionViewer')
+
+LazyImport.stop_timing()
+
 VERSION = "0.20.906 plus git"
 
 
@@ -252,8 +255,8 @@ class fpdb:
                , ('Python',           sys.version[0:3])
                , ('GTK+',             '.'.join([str(x) for x in gtk.gtk_version]))
                , ('PyGTK',            '.'.join([str(x) for x in gtk.pygtk_version]))
-               , ('matplotlib',       matplotlib_version)
-               , ('numpy',            numpy_version)
+               , ('matplotlib',       module_version('matplotlib'))
+               , ('numpy',            module_version('numpy'))
                , ('sqlite3',          sqlite3_version)
                , ('sqlite',           sqlite_version)
                , ('fpdb version',     VERSION)
@@ -440,7 +443,8 @@ class fpdb:
         for attr in statDir:
             if attr.startswith('__'): continue
             if attr in ("Charset", "Configuration", "Database", "GInitiallyUnowned", "gtk", "pygtk",
-                        "player", "c", "db_connection", "do_stat", "do_tip", "stat_dict",
+                        "player", "c", "db_connection", "do_stat", "do_stats", "do_tip",
+                        "get_stat", "stat_dict", "stat_funcs",
                         "h", "re", "re_Percent", "re_Places", ): continue
             statDict[attr]=eval("Stats.%s.__doc__" % (attr))
         
@@ -553,10 +557,10 @@ class fpdb:
                 #    self.release_global_lock()
                 #    lock_released = True
                 self.db.recreate_tables()
-                # find any guibulkimport/guiautoimport windows and clear player cache:
+                # find any guibulkimport/guiautoimport windows and clear their caches:
                 for t in self.threads:
                     if isinstance(t, GuiBulkImport.GuiBulkImport) or isinstance(t, GuiAutoImport.GuiAutoImport):
-                        t.importer.database.resetPlayerIDs()
+                        t.importer.database.resetCaches()
                 self.release_global_lock()
                 #else:
                     # for other dbs use same connection as holds global lock
@@ -1115,6 +1119,7 @@ You can find the full license texts in agpl-3.0.txt, gpl-2.0.txt, gpl-3.0.txt an
         self.window.show()
         self.visible = True     # Flip on
         self.load_profile(create_db = True)
+        LazyImport.log_import_times()
 
         if not options.errorsToConsole:
             fileName = os.path.join(self.config.dir_log, 'fpdb-errors.txt')
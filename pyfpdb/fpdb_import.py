@@ -30,6 +30,7 @@ import re
 import Queue
 from collections import deque # using Queue for now
 import threading
+import multiprocessing
 
 import logging
 # logging has been set up in fpdb.py or HUD_main.py, use their settings:
@@ -41,7 +42,9 @@ import gtk
 #    fpdb/FreePokerTools modules
 import Database
 import Configuration
+import Hand
 import Exceptions
+import FileWatcher
 
 
 #    database interface modules
@@ -76,11 +79,12 @@ class Importer:
         self.addToDirList = {}
         self.removeFromFileList = {} # to remove deleted files
         self.monitor    = False
+        self.watcher    = None       # FileWatcher.InotifyWatcher, False when polling
         self.updatedsize = {}
         self.updatedtime = {}
         self.lines      = None
         self.faobs      = None       # File as one big string
-        self.pos_in_file = {}        # dict to remember how far we have read in the file
+        self.pos_in_file = {}        # file -> (inode, byte offset) of how far we have read in the file
         #Set defaults
         self.callHud    = self.config.get_import_parameters().get("callFpdbHud")
 
@@ -97,6 +101,8 @@ class Importer:
         self.settings.setdefault("ftpArchive", False)
         self.settings.setdefault("testData", False)
         self.settings.setdefault("cacheHHC", False)
+        self.settings.setdefault("parseProcesses", 0)          # 0 = parse in this process
+        self.settings.setdefault("insertBatch", 0)             # hands per multi-row insert, 0 = insert each hand
 
         self.writeq = None
         self.database = Database.Database(self.config, sql = self.sql)
@@ -104,6 +110,7 @@ class Importer:
         self.settings.setdefault("threads", 1) # value set by GuiBulkImport
         for i in xrange(self.settings['threads']):
             self.writerdbs.append( Database.Database(self.config, sql = self.sql) )
+        self.database.insert_batch = self.settings['insertBatch']
 
         clock() # init clock in windows
 
@@ -132,6 +139,13 @@ class Importer:
             for i in xrange(self.settings['threads'] - len(self.writerdbs)):
                 self.writerdbs.append( Database.Database(self.config, sql = self.sql) )
 
+    def setParseProcesses(self, value):
+        self.settings['parseProcesses'] = int(value)
+
+    def setInsertBatch(self, value):
+        self.settings['insertBatch'] = int(value)
+        self.database.insert_batch = self.settings['insertBatch']
+
     def setDropIndexes(self, value):
         self.settings['dropIndexes'] = value
 
@@ -240,6 +254,8 @@ class Importer:
             self.database.prepareBulkImport()
         else:
             log.info(_("No need to drop indexes."))
+        self.database.loadHandIndex()
+        self.database.loadPlayerIDs()
         #print "dropInd =", self.settings['dropIndexes'], "  dropHudCache =", self.settings['dropHudCache']
 
         if self.settings['threads'] <= 0:
@@ -279,7 +295,7 @@ class Importer:
         else:
             log.info (_("No need to rebuild indexes."))
         if 'dropHudCache' in self.settings and self.settings['dropHudCache'] == 'drop':
-            self.database.rebuild_hudcache()
+            self.database.rebuild_hudcache(incremental = True, progress = self.hudcache_progress)
         else:
             log.info (_("No need to rebuild hudcache."))
         self.database.analyzeDB()
@@ -287,6 +303,11 @@ class Importer:
         return (totstored, totdups, totpartial, toterrors, endtime-starttime)
     # end def runImport
 
+    def hudcache_progress(self, done, total):
+        log.info(_("Rebuilt %d of %d hudcache partitions") % (done, total))
+        while gtk.events_pending():
+            gtk.main_iteration(False)
+
     def importFiles(self, db, q):
         """"Read filenames in self.filelist and pass to import_file_dict().
             Uses a separate database connection if created as a thread (caller
@@ -301,16 +322,23 @@ class Importer:
         #prepare progress popup window
         ProgressDialog = ProgressBar(len(self.filelist), self.parent)
         
-        for file in self.filelist:
-            
-            ProgressDialog.progress_update()
-            
-            (stored, duplicates, partial, errors, ttime) = self.import_file_dict(db, file
-                                               ,self.filelist[file][0], self.filelist[file][1], q)
-            totstored += stored
-            totdups += duplicates
-            totpartial += partial
-            toterrors += errors
+        (pool, parsed) = self.parseFiles()
+        try:
+            for file in self.filelist:
+
+                ProgressDialog.progress_update()
+
+                (stored, duplicates, partial, errors, ttime) = self.import_file_dict(db, file
+                                                   ,self.filelist[file][0], self.filelist[file][1], q
+                                                   ,parsed.next() if parsed is not None else None)
+                totstored += stored
+                totdups += duplicates
+                totpartial += partial
+                toterrors += errors
+        finally:
+            if pool is not None:
+                pool.terminate()    # the workers are idle by now, unless the import failed
+                pool.join()
 
         del ProgressDialog
         
@@ -322,6 +350,28 @@ class Importer:
         return (totstored, totdups, totpartial, toterrors)
     # end def importFiles
 
+    def parseFiles(self):
+        """Start parsing self.filelist in a pool of parseProcesses worker processes.
+            Returns the pool and an iterator giving the parse result of each file in
+            filelist order, or (None, None) if the files should be parsed in this process."""
+        nprocs = min(self.settings['parseProcesses'], len(self.filelist))
+        if nprocs <= 1 or self.settings['cacheHHC']:
+            return (None, None)
+        jobs = []
+        for file in self.filelist:
+            (site, filter) = self.filelist[file]
+            if os.path.isdir(file) or self.get_filter(filter) is None:
+                jobs.append(None)   # import_file_dict deals with these itself
+            else:
+                jobs.append((file, site, filter, self.get_out_path(file, site), self.get_offset(file),
+                             self.settings['starsArchive'], self.settings['ftpArchive']))
+        log.info(_("Parsing %d files in %d processes") % (len(jobs), nprocs))
+        pool = multiprocessing.Pool(nprocs, parse_worker_init, (self.config.file, self.config.site_ids))
+        results = pool.imap(parse_file, jobs)
+        pool.close()    # workers exit once the jobs are done
+        return (pool, results)
+    # end def parseFiles
+
     # not used currently
     def calculate_auto(self, db):
         """An heuristic to determine a reasonable value of drop/don't drop"""
@@ -375,35 +425,84 @@ class Importer:
 
     #Run import on updated files, then store latest update time. Called from GuiAutoImport.py
     def runUpdated(self):
-        #Check for new files in monitored directories
-        #todo: make efficient - always checks for new file, should be able to use mtime of directory
-        # ^^ May not work on windows
+        if self.database.hand_index is None:
+            self.database.loadHandIndex()
+        self.database.loadPlayerIDs()
+
+        # On linux the monitored directories are watched with inotify and only the
+        # files it reports are looked at, otherwise every file is stat'ed each time
+        if self.watcher is None:
+            self.watcher = FileWatcher.get_watcher() or False
+        if self.watcher and self.watchDirs():
+            self.watchUpdated()
+        else:
+            self.pollUpdated()
+
+        self.addToDirList = filter(lambda x: self.addImportDirectory(x, True, self.addToDirList[x][0], self.addToDirList[x][1]), self.addToDirList)
+
+        for file in self.removeFromFileList:
+            if file in self.filelist:
+                del self.filelist[file]
 
-        #rulog = open('runUpdated.txt', 'a')
-        #rulog.writelines("runUpdated ... ")
+        self.addToDirList = {}
+        self.removeFromFileList = {}
+        self.database.rollback()
+
+    def watchDirs(self):
+        """Watch any monitored directory not already watched. Returns False if the
+           files have to be polled this time, because a directory has only just been
+           watched or events were lost"""
+        uptodate = not self.watcher.overflow
+        self.watcher.overflow = False
+        for site in self.dirlist:
+            dir = self.dirlist[site][0]
+            if self.watcher.watching(os.path.normpath(dir)):
+                continue
+            uptodate = False
+            if not self.watcher.watch(os.path.normpath(dir)):
+                log.warning(_("Polling for changed files instead"))
+                self.watcher.close()
+                self.watcher = False
+                break
+        if self.watcher and not uptodate:
+            self.watcher.read()     # anything pending is picked up by the poll
+        return uptodate
+
+    def watchUpdated(self):
+        """Import the files inotify reported as changed since the last call"""
+        (changed, removed) = self.watcher.read()
+        if self.watcher.overflow:
+            # lost events, look at everything now rather than on the next call
+            self.watcher.overflow = False
+            self.pollUpdated()
+            return
+        for file in removed:
+            self.removeFromFileList[file] = True
+        for file in sorted(changed):
+            if not os.path.exists(file):
+                continue
+            if file not in self.filelist:
+                for site in self.dirlist:
+                    if os.path.dirname(file) == os.path.normpath(self.dirlist[site][0]):
+                        self.addImportFile(file, site, self.dirlist[site][1])
+                        break
+                if file not in self.filelist:
+                    continue
+            self.updateFile(file, os.stat(file))
+
+    def pollUpdated(self):
+        """Check every file for a change in size or mtime, and import the changed ones"""
+        #Check for new files in monitored directories
         for site in self.dirlist:
             self.addImportDirectory(self.dirlist[site][0], False, site, self.dirlist[site][1])
 
         for file in self.filelist:
             if os.path.exists(file):
                 stat_info = os.stat(file)
-                #rulog.writelines("path exists ")
                 if file in self.updatedsize: # we should be able to assume that if we're in size, we're in time as well
                     if stat_info.st_size > self.updatedsize[file] or stat_info.st_mtime > self.updatedtime[file]:
 #                        print "file",file," updated", os.path.basename(file), stat_info.st_size, self.updatedsize[file], stat_info.st_mtime, self.updatedtime[file]
-                        try:
-                            if not os.path.isdir(file):
-                                self.caller.addText("\n"+os.path.basename(file))
-                        except KeyError: # TODO: What error happens here?
-                            pass
-                        (stored, duplicates, partial, errors, ttime) = self.import_file_dict(self.database, file, self.filelist[file][0], self.filelist[file][1], None)
-                        try:
-                            if not os.path.isdir(file): # Note: This assumes that whatever calls us has an "addText" func
-                                self.caller.addText(" %d stored, %d duplicates, %d partial, %d errors (time = %f)" % (stored, duplicates, partial, errors, ttime))
-                        except KeyError: # TODO: Again, what error happens here? fix when we find out ..
-                            pass
-                        self.updatedsize[file] = stat_info.st_size
-                        self.updatedtime[file] = time()
+                        self.updateFile(file, stat_info)
                 else:
                     if os.path.isdir(file) or (time() - stat_info.st_mtime) < 60:
                         self.updatedsize[file] = 0
@@ -414,20 +513,24 @@ class Importer:
             else:
                 self.removeFromFileList[file] = True
 
-        self.addToDirList = filter(lambda x: self.addImportDirectory(x, True, self.addToDirList[x][0], self.addToDirList[x][1]), self.addToDirList)
-
-        for file in self.removeFromFileList:
-            if file in self.filelist:
-                del self.filelist[file]
-
-        self.addToDirList = {}
-        self.removeFromFileList = {}
-        self.database.rollback()
-        #rulog.writelines("  finished\n")
-        #rulog.close()
+    def updateFile(self, file, stat_info):
+        """Import the new hands in file and remember its size"""
+        try:
+            if not os.path.isdir(file):
+                self.caller.addText("\n"+os.path.basename(file))
+        except KeyError: # TODO: What error happens here?
+            pass
+        (stored, duplicates, partial, errors, ttime) = self.import_file_dict(self.database, file, self.filelist[file][0], self.filelist[file][1], None)
+        try:
+            if not os.path.isdir(file): # Note: This assumes that whatever calls us has an "addText" func
+                self.caller.addText(" %d stored, %d duplicates, %d partial, %d errors (time = %f)" % (stored, duplicates, partial, errors, ttime))
+        except KeyError: # TODO: Again, what error happens here? fix when we find out ..
+            pass
+        self.updatedsize[file] = stat_info.st_size
+        self.updatedtime[file] = time()
 
     # This is now an internal function that should not be called directly.
-    def import_file_dict(self, db, file, site, filter, q=None):
+    def import_file_dict(self, db, file, site, filter, q=None, parsed=None):
         #print "import_file_dict"
 
         if os.path.isdir(file):
@@ -445,6 +548,102 @@ class Importer:
             log.info((_("Converting %s") % file) + " (" + str(q.qsize()) + ")")
         else:
             log.info(_("Converting %s") % file)
+
+        # Hands are written to the db as the converter parses them, so the
+        # file never has to be held in memory as a list of Hand objects
+        counts = {'duplicates':0}
+        to_hud = []
+        def store_hand(hand):
+            if hand is not None:
+                hand.prepInsert(self.database)
+                try:
+                    hand.insert(self.database, printtest = self.settings['testData'])
+                except Exceptions.FpdbHandDuplicate:
+                    counts['duplicates'] += 1
+                else:
+                    # Call hudcache update if not in bulk import mode
+                    # FIXME: Need to test for bulk import that isn't rebuilding the cache
+                    if self.callHud:
+                        hand.updateHudCache(self.database)
+                        if hand.dbid_hands != 0:
+                            to_hud.append((hand.dbid_hands, hand.hudMessage(self.database)))
+            else: # TODO: Treat empty as an error, or just ignore?
+                log.error(_("Hand processed but empty"))
+
+        if parsed is not None:
+            # file was already parsed in the parse pool, just store the hands
+            (status, hands, numHands, numErrors, lastchar) = parsed
+            if not status:
+                return (0, 0, 0, 1, time() - ttime)
+            for rows in hands:
+                store_hand(Hand.Hand.fromRows(self.config, rows) if rows is not None else None)
+            hhc = None
+        else:
+            obj = self.get_filter(filter)
+            if obj is None:
+                return (0, 0, 0, 1, time() - ttime)
+            # cacheHHC needs the parsed hands kept in the HHC, see below
+            callback = None if self.settings['cacheHHC'] else store_hand
+            hhc = obj( self.config, in_path = file, out_path = self.get_out_path(file, site)
+                     , index = self.get_offset(file)
+                     , starsArchive = self.settings['starsArchive'], ftpArchive = self.settings['ftpArchive'],
+                       sitename = site, handCallback = callback )
+            if not hhc.getStatus():
+                # conversion didn't work
+                # TODO: appropriate response?
+                return (0, 0, 0, 1, time() - ttime)
+            if callback is None:
+                for hand in hhc.getProcessedHands():
+                    store_hand(hand)
+            (numHands, numErrors, lastchar) = (hhc.numHands, hhc.numErrors, hhc.getLastCharacterRead())
+
+        inode = self.pos_in_file[file][0]
+        self.pos_in_file[file] = (inode, lastchar)
+        self.database.storeFileOffset(file, inode, lastchar)
+        duplicates = counts['duplicates']
+        if numHands > duplicates + numErrors:
+            self.database.bump_generation()
+        self.database.commit()
+
+        #pipe the hands out to the HUD, one line each with what it needs to update
+        for (hid, msg) in to_hud:
+            try:
+                print _("fpdb_import: sending hand to hud"), hid, "pipe =", self.caller.pipe_to_hud
+                self.caller.pipe_to_hud.stdin.write(msg + os.linesep)
+            except IOError, e:
+                log.error(_("Failed to send hand to HUD: %s") % e)
+
+        errors = numErrors
+        stored = numHands
+        stored -= duplicates
+        stored -= errors
+        # Really ugly hack to allow testing Hands within the HHC from someone
+        # with only an Importer objec
+        if self.settings['cacheHHC']:
+            self.handhistoryconverter = hhc
+
+        ttime = time() - ttime
+
+        #This will barf if conv.getStatus != True
+        return (stored, duplicates, partial, errors, ttime)
+
+    def get_offset(self, file):
+        """Byte offset in file to start reading at. Monitored files carry on from where
+           they were last imported, even by an earlier run of fpdb, unless the file has
+           since been replaced or truncated."""
+        stat_info = os.stat(file)
+        (inode, offset) = self.pos_in_file.get(file, (None, 0))
+        if inode != stat_info.st_ino:
+            if self.monitor:
+                offset = self.database.getFileOffset(file, stat_info.st_ino)
+            else:
+                offset = 0
+        if offset > stat_info.st_size:
+            offset = 0
+        self.pos_in_file[file] = (stat_info.st_ino, offset)
+        return offset
+
+    def get_out_path(self, file, site):
         hhbase    = self.config.get_import_parameters().get("hhArchiveBase")
         hhbase    = os.path.expanduser(hhbase)
         hhdir     = os.path.join(hhbase,site)
@@ -452,74 +651,17 @@ class Importer:
             out_path     = os.path.join(hhdir, file.split(os.path.sep)[-2]+"-"+os.path.basename(file))
         except:
             out_path     = os.path.join(hhdir, "x"+strftime("%d-%m-%y")+os.path.basename(file))
+        return out_path
 
+    def get_filter(self, filter):
+        """Returns the converter class for filter, or None if it can't be found"""
         filter_name = filter.replace("ToFpdb", "")
-
         mod = __import__(filter)
         obj = getattr(mod, filter_name, None)
-        if callable(obj):
-            idx = 0
-            if file in self.pos_in_file:
-                idx = self.pos_in_file[file]
-            else:
-                self.pos_in_file[file] = 0
-            hhc = obj( self.config, in_path = file, out_path = out_path, index = idx
-                     , starsArchive = self.settings['starsArchive'], ftpArchive = self.settings['ftpArchive'],
-                       sitename = site )
-            if hhc.getStatus():
-                handlist = hhc.getProcessedHands()
-                self.pos_in_file[file] = hhc.getLastCharacterRead()
-                to_hud = []
-
-                for hand in handlist:
-                    if hand is not None:
-                        hand.prepInsert(self.database)
-                        try:
-                            hand.insert(self.database, printtest = self.settings['testData'])
-                        except Exceptions.FpdbHandDuplicate:
-                            duplicates += 1
-                        else:
-                            if self.callHud and hand.dbid_hands != 0:
-                                to_hud.append(hand.dbid_hands)
-                    else: # TODO: Treat empty as an error, or just ignore?
-                        log.error(_("Hand processed but empty"))
-
-                # Call hudcache update if not in bulk import mode
-                # FIXME: Need to test for bulk import that isn't rebuilding the cache
-                if self.callHud:
-                    for hand in handlist:
-                        if hand is not None and not hand.is_duplicate:
-                            hand.updateHudCache(self.database)
-                self.database.commit()
-
-                #pipe the Hands.id out to the HUD
-                for hid in to_hud:
-                    try:
-                        print _("fpdb_import: sending hand to hud"), hand.dbid_hands, "pipe =", self.caller.pipe_to_hud
-                        self.caller.pipe_to_hud.stdin.write("%s" % (hid) + os.linesep)
-                    except IOError, e:
-                        log.error(_("Failed to send hand to HUD: %s") % e)
-
-                errors = getattr(hhc, 'numErrors')
-                stored = getattr(hhc, 'numHands')
-                stored -= duplicates
-                stored -= errors
-                # Really ugly hack to allow testing Hands within the HHC from someone
-                # with only an Importer objec
-                if self.settings['cacheHHC']:
-                    self.handhistoryconverter = hhc
-            else:
-                # conversion didn't work
-                # TODO: appropriate response?
-                return (0, 0, 0, 1, time() - ttime)
-        else:
+        if not callable(obj):
             log.warning(_("Unknown filter filter_name:'%s' in filter:'%s'") %(filter_name, filter))
-            return (0, 0, 0, 1, time() - ttime)
-
-        ttime = time() - ttime
-
-        #This will barf if conv.getStatus != True
-        return (stored, duplicates, partial, errors, ttime)
+            return None
+        return obj
 
 
     def printEmailErrorMessage(self, errors, filename, line):
@@ -536,6 +678,38 @@ class Importer:
         logfile.close()
         
         
+# Parse pool workers. Each worker builds its own Config as Config objects
+# don't pickle. Hands travel back with their stats already derived, as the
+# compact tuples of Hand.rows(), so the importer process only has to write
+# them to the database.
+parse_config = None
+
+def parse_worker_init(config_file, site_ids):
+    global parse_config
+    parse_config = Configuration.Config(file = config_file)
+    parse_config.set_site_ids(site_ids)
+
+def parse_file(job):
+    """Parse one file in a pool worker, returns
+        (status, rows of each hand, numHands, numErrors, lastCharacterRead)"""
+    if job is None:
+        return None
+    (file, site, filter, out_path, idx, starsArchive, ftpArchive) = job
+    hands = []
+    def keep_hand(hand):
+        if hand is not None:
+            hand.stats.getStats(hand)
+            hands.append(hand.rows())
+        else:
+            hands.append(None)
+    filter_name = filter.replace("ToFpdb", "")
+    obj = getattr(__import__(filter), filter_name)
+    hhc = obj( parse_config, in_path = file, out_path = out_path, index = idx
+             , starsArchive = starsArchive, ftpArchive = ftpArchive
+             , sitename = site, handCallback = keep_hand )
+    return (hhc.getStatus(), hands, hhc.numHands, hhc.numErrors, hhc.getLastCharacterRead())
+
+
 class ProgressBar:
 
     """
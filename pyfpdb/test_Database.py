@@ -81,3 +81,63 @@ def testSQLiteModFunction():
         idx = idx+1
 
     cur.execute("DROP TABLE test")
+
+def testHandIndex():
+    index = Database.HandIndex()
+    index.load([(1, 10), (1, 20), (2, 30)])
+    assert index.contains(1, 20)
+    assert index.contains(1, "20")
+    assert not index.contains(1, 15)
+    assert not index.contains(2, 20)
+    index.add(2, "40")
+    assert index.contains(2, 40)
+    index.rollback()
+    assert not index.contains(2, 40)
+
+def testHandIndexLargeHandNumbers():
+    index = Database.HandIndex()
+    # sqlite returns hand numbers too large for an integer as a REAL
+    index.load([(1, 2**53 + 1), (1, 1.0217270777128485e+20)])
+    assert len(index) == 0
+    # doubles can't tell these from their neighbours, the db has to be asked
+    assert index.contains(1, 2**53) is None
+    assert index.contains(1, 2**53 + 1) is None
+    assert index.contains(1, "102172707771284853532") is None
+    assert index.contains(1, 1.5) is None
+    assert index.contains(1, 2**53 - 1) == False
+
+def sessionRows(hand_id, minute, players):
+    return [{'hand_id': hand_id, 'start_time': "2010-01-01 12:%02d:00" % minute,
+             'player_id': pid, 'seat': seat, 'screen_name': "p%d" % pid, 'seats': 6,
+             'n': 1, 'vpip': vpip}
+            for (seat, (pid, vpip)) in enumerate(players)]
+
+def testSessionStatsTotals():
+    session = Database.SessionStats(30, 0, ['n', 'vpip'])
+    session.add(1, sessionRows(1, 0, [(10, 1), (11, 0)]))
+    session.add(2, sessionRows(2, 1, [(10, 0), (11, 1)]))
+    session.add(3, sessionRows(3, 2, [(10, 1)]))
+    session.add(2, sessionRows(2, 1, [(10, 1)]))     # seen already, ignored
+    d = sessionRows(3, 2, [(10, 1)])[0]
+    stats = session.get(d, 2, 10)
+    assert stats['n'] == 3 and stats['vpip'] == 2
+    assert stats['hand_id'] == 3 and stats['screen_name'] == "p10"
+    assert session.get(d, 7, 10) is None
+    assert session.totals[11][6] == {'n': 2, 'vpip': 1}
+
+def testSessionStatsWindow():
+    session = Database.SessionStats(30, 2, ['n', 'vpip'])
+    for hand_id in (1, 2, 3):
+        session.add(hand_id, sessionRows(hand_id, hand_id, [(10, hand_id % 2), (11, 1)]))
+    # only the last 2 hands are kept
+    assert [h for (h, rows) in session.hands] == [2, 3]
+    assert session.totals[10][6] == {'n': 2, 'vpip': 1}
+    session.add(4, sessionRows(4, 4, [(10, 1)]))
+    session.add(5, sessionRows(5, 5, [(10, 1)]))
+    # player 11's last hand dropped out of the window
+    assert 11 not in session.totals or not session.totals[11]
+    # a gap of more than 30 minutes starts a new session
+    session.add(6, sessionRows(6, 40, [(11, 0)]))
+    assert [h for (h, rows) in session.hands] == [6]
+    assert 10 not in session.totals
+    assert session.totals[11][6] == {'n': 1, 'vpip': 0}
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+import re
+
+import SQL
+from DerivedStats import HandsPlayer, COLUMN, NUM_INSERTED, HUDCACHE_COLUMNS, HUDCACHE_TOTALS, SEEN
+
+sql = SQL.Sql(db_server = 'sqlite')
+
+def insertColumns(query):
+    return re.search(r"\(([^)]*)\)", query).group(1).replace(',', ' ').split()
+
+def testHandsPlayerInsertLayout():
+    columns = insertColumns(sql.query['store_hands_players'])
+    assert columns[:2] == ['handId', 'playerId']
+    # the row keeps the name the stats dict had for tourneysPlayersId
+    names = ['tourneysPlayersIds' if c == 'tourneysPlayersId' else c for c in columns[2:]]
+    assert tuple(names) == HandsPlayer.columns[:NUM_INSERTED]
+    assert sql.query['store_hands_players'].count('?') == len(columns)
+    assert len(HandsPlayer().insertValues()) == NUM_INSERTED
+
+def testHudCacheLayout():
+    columns = insertColumns(sql.query['insert_hudcache'])
+    assert columns[:7] == ['gametypeId', 'playerId', 'activeSeats', 'position',
+                           'tourneyTypeId', 'styleKey', 'HDs']
+    assert tuple(columns[7:]) == HUDCACHE_COLUMNS
+    updated = re.findall(r"(\w+)=\1\+\?", sql.query['update_hudcache_by_id'])
+    assert updated == ['HDs'] + list(HUDCACHE_COLUMNS)
+
+def testHandsPlayerColumns():
+    row = HandsPlayer()
+    other = HandsPlayer()
+    row.street2Seen = True
+    row[COLUMN['winnings']] = 150
+    assert row[SEEN[2]] is True and row.winnings == 150
+    # each row starts from its own copy of the defaults
+    assert other.street2Seen is False and other.winnings == 0
+    assert SEEN[0] is None
+    assert dict(row.items())['position'] == 2
+    assert HandsPlayer(list(row)) == row
+
+def testHudCacheLine():
+    row = HandsPlayer()
+    row.street0VPI = True
+    row.street1Seen = True
+    row.street0Calls = 2
+    row.totalProfit = -25
+    row.wonWhenSeenStreet1 = 0.5
+    line = row.hudCacheLine()
+    assert len(line) == 1 + len(HUDCACHE_COLUMNS)
+    values = dict(zip(('HDs',) + HUDCACHE_COLUMNS, line))
+    # the totals are summed as they are, the other columns count the hands they're set in
+    assert values['HDs'] == 1
+    assert values['street0VPI'] == 1 and values['street1Seen'] == 1 and values['street0Calls'] == 1
+    assert values['totalProfit'] == -25 and values['wonWhenSeenStreet1'] == 0.5
+    assert values['street0Aggr'] == 0 and values['wonAtSD'] == 0
+    assert set(HUDCACHE_TOTALS) <= set(HUDCACHE_COLUMNS)
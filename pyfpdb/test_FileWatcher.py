@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+import py
+
+import FileWatcher
+
+def getWatcher():
+    watcher = FileWatcher.get_watcher()
+    if watcher is None:
+        py.test.skip("inotify not available")
+    return watcher
+
+def testWatcherChangedAndRemoved(tmpdir):
+    watcher = getWatcher()
+    try:
+        dir = str(tmpdir)
+        assert watcher.watch(dir)
+        assert watcher.watching(dir)
+        assert watcher.read() == (set(), set())
+
+        a = tmpdir.join("a.txt")
+        a.write("hand 1\n")
+        assert watcher.read() == (set([str(a)]), set())
+        a.write("hand 2\n", mode = 'a')
+        assert watcher.read() == (set([str(a)]), set())
+
+        # files moved in count as changed, moved out as removed
+        b = tmpdir.join("b.txt")
+        a.rename(b)
+        assert watcher.read() == (set([str(b)]), set([str(a)]))
+        b.remove()
+        assert watcher.read() == (set(), set([str(b)]))
+
+        # only the last of the events for a file counts
+        a.write("hand 3\n")
+        a.remove()
+        assert watcher.read() == (set(), set([str(a)]))
+    finally:
+        watcher.close()
+
+def testWatcherOnlyWatchedDirs(tmpdir):
+    watcher = getWatcher()
+    try:
+        watched = tmpdir.mkdir("watched")
+        sub = watched.mkdir("sub")
+        assert watcher.watch(str(watched))
+        tmpdir.join("a.txt").write("hand\n")
+        sub.join("a.txt").write("hand\n")
+        assert watcher.read() == (set(), set())
+    finally:
+        watcher.close()
+
+def testWatcherDirRemoved(tmpdir):
+    watcher = getWatcher()
+    try:
+        dir = tmpdir.mkdir("watched")
+        assert watcher.watch(str(dir))
+        dir.remove()
+        watcher.read()
+        assert not watcher.watching(str(dir))
+        assert not watcher.watch(str(dir))
+    finally:
+        watcher.close()
@@ -0,0 +1,47 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+import py
+
+py.test.importorskip("gtk")
+py.test.importorskip("matplotlib")
+numpy = py.test.importorskip("numpy")
+
+import GuiGraphViewer
+
+def testDownsampleShortLine():
+    line = numpy.array([0.0, 1.5, -2.0, 3.0])
+    (x, y) = GuiGraphViewer.downsample(line, 100)
+    assert list(x) == [0, 1, 2, 3]
+    assert list(y) == list(line)
+
+def testDownsampleRandomWalks():
+    random = numpy.random.RandomState(1)
+    for (n, buckets) in ((1000, 10), (1001, 10), (99999, 640), (5000, 1249)):
+        line = numpy.cumsum(random.normal(size = n))
+        (x, y) = GuiGraphViewer.downsample(line, buckets)
+        assert len(x) <= 2 * buckets + 4
+        assert (numpy.diff(x) > 0).all()
+        assert (y == line[x]).all()
+        # the endpoints and the extremes of the whole line are kept
+        assert x[0] == 0 and x[-1] == n - 1
+        assert y.min() == line.min() and y.max() == line.max()
+        # and so are those of each run of hands
+        size = n // buckets
+        for start in range(0, buckets * size, size):
+            run = line[start:start + size]
+            kept = y[(x >= start) & (x < start + size)]
+            assert kept.min() == run.min() and kept.max() == run.max()
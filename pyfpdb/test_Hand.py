@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+import glob
+from decimal import Decimal
+
+import Configuration
+import Database
+import fpdb_import
+import PokerStarsToFpdb
+from Hand import Money
+
+config = Configuration.Config(file = "HUD_config.test.xml")
+
+# a draw hand where a player posts both blinds
+draw_hands = open("regression-test-files/cash/Stars/Draw/3-Draw-Limit-USD-0.10-0.20-200911.txt").read().split('\n\n\n')
+both_blinds = draw_hands[0].replace("s0rrow: posts big blind $0.10\n",
+                                    "s0rrow: posts big blind $0.10\nEisenherz73: posts small & big blinds $0.15\n")
+
+def testMoneyParse():
+    money = Money(2)
+    pairs = (("1.50", 150), ("1.5", 150), ("10", 1000), ("0.05", 5), ("0", 0),
+             (".25", 25), ("-2.10", -210), ("123456789.99", 12345678999))
+    for (amount, cents) in pairs:
+        assert money(amount) == cents
+        assert type(money(amount)) in (int, long)
+    assert money(u"3.20") == 320
+    # already in cents
+    assert money(150) == 150
+
+def testMoneyMorePlaces():
+    money = Money(2)
+    # amounts finer than a cent are kept exact rather than rounded
+    assert money("0.005") == Decimal("0.5")
+    assert isinstance(money("0.005"), Decimal)
+    assert money("1.234") == Decimal("123.4")
+    assert money("1.230") == 123 and type(money("1.230")) is int
+    assert Money(0)("12.5") == Decimal("12.5")
+
+def testMoneyDisplay():
+    money = Money(2)
+    assert str(money.display(150)) == "1.50"
+    assert str(money.display(1000)) == "10"
+    assert str(money.display(5)) == "0.05"
+    assert money.display(Decimal("0.5")) == Decimal("0.005")
+    for amount in ("1.50", "10", "0.05", "0.005", "-2.10", "123456789.99"):
+        assert money.display(money(amount)) == Decimal(amount)
+
+def importRegressionFiles(int_cents, files):
+    config.imp.intCents = int_cents
+    settings = {}
+    settings.update(config.get_db_parameters())
+    settings.update(config.get_import_parameters())
+    settings.update(config.get_default_paths())
+    db = Database.Database(config)
+    db.recreate_tables()
+    importer = fpdb_import.Importer(False, settings, config)
+    importer.setDropIndexes("don't drop")
+    importer.setThreads(-1)
+    importer.setCallHud(False)
+    for (f, site) in files:
+        importer.addBulkImportImportFileOrDir(f, site = site)
+    result = importer.runImport()[:4]
+    rows = {}
+    c = db.get_cursor()
+    for table in ('Hands', 'HandsPlayers', 'HandsActions'):
+        c.execute("SELECT * FROM %s ORDER BY id" % table)
+        # Hands.importTime differs
+        rows[table] = [row[:6] + row[7:] if table == 'Hands' else row for row in c.fetchall()]
+    db.disconnect()
+    return (result, rows)
+
+def testIntCentsImport(tmpdir):
+    """The regression files import to the same rows with amounts in integer cents"""
+    sites = {'Stars': 'PokerStars', 'FTP': 'Full Tilt Poker', 'Everleaf': 'Everleaf',
+             'Absolute': 'Absolute', 'PartyPoker': 'PartyPoker', 'Betfair': 'Betfair'}
+    files = [(f, sites[d]) for kind in ('cash', 'tour') for d in sorted(sites)
+             for f in sorted(glob.glob('regression-test-files/%s/%s/*/*.txt' % (kind, d)))]
+    path = tmpdir.join("both_blinds.txt")
+    path.write(both_blinds)
+    files.append((str(path), 'PokerStars'))
+    int_cents = config.imp.intCents
+    try:
+        (result, rows) = importRegressionFiles(False, files)
+        (int_result, int_rows) = importRegressionFiles(True, files)
+    finally:
+        config.imp.intCents = int_cents
+    assert result[0] > 1000
+    assert int_result == result
+    for table in rows:
+        assert int_rows[table] == rows[table]
+
+def testIntCentsBothBlinds(tmpdir):
+    path = tmpdir.join("both_blinds.txt")
+    path.write(both_blinds)
+    Database.Database(config).disconnect()     # looks up the site ids for config
+    int_cents = config.imp.intCents
+    config.imp.intCents = True
+    try:
+        hhc = PokerStarsToFpdb.PokerStars(config, in_path = str(path), autostart = False)
+        hhc.start()
+    finally:
+        config.imp.intCents = int_cents
+    [hand] = hhc.getProcessedHands()
+    assert [act[2] for act in hand.actions['BLINDSANTES']] == [5, 10, 15]
+    # the 'dead' small blind doesn't count towards the bet to call
+    hand.addBlind(u'Eisenherz73', 'both', '0.15')
+    assert hand.lastBet['DEAL'] == 10 and type(hand.lastBet['DEAL']) is int
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+import PokerStarsToFpdb
+import Configuration
+
+config = Configuration.Config(file = "HUD_config.test.xml")
+
+stars_files = ("regression-test-files/cash/Stars/Flop/NLHE-6max-EUR-0.05-0.10-200911.txt",
+               "regression-test-files/cash/Stars/Flop/NLHE-FR-USD-0.01-0.02-201005.microgrind.txt")
+
+def iterHands(path, chunk_size, **kwargs):
+    hhc = PokerStarsToFpdb.PokerStars(config, in_path = path, autostart = False, **kwargs)
+    hhc.SPLIT_CHUNK_SIZE = chunk_size
+    return list(hhc.iterHands())
+
+def splitWholeFile(path):
+    """The hands of path split the way they were before iterHands() read files in chunks"""
+    hhc = PokerStarsToFpdb.PokerStars(config, in_path = path, autostart = False)
+    hhc.readFile()
+    text = hhc.obs.replace('\r\n', '\n').strip()
+    return [handText for handText in hhc.re_SplitHands.split(text) if handText.strip()]
+
+def testIterHandsChunks():
+    for path in stars_files:
+        hands = splitWholeFile(path)
+        assert len(hands) > 60
+        # separators, line ends and multibyte characters end up cut across chunks
+        for chunk_size in (1, 7, 100, 65536):
+            assert iterHands(path, chunk_size) == hands
+
+def testIterHandsCRLF(tmpdir):
+    hands = splitWholeFile(stars_files[0])
+    path = tmpdir.join("crlf.txt")
+    path.write_binary(open(stars_files[0], 'rb').read().replace('\n', '\r\n'))
+    for chunk_size in (1, 2, 7, 65536):
+        assert iterHands(str(path), chunk_size) == hands
+
+def testIterHandsStarsArchive(tmpdir):
+    hands = splitWholeFile(stars_files[0])
+    path = tmpdir.join("archive.txt")
+    path.write_text(u"".join(u"Hand #%d\n%s\n\n\n" % (i, handText) for (i, handText) in enumerate(hands)), 'utf-8')
+    for chunk_size in (3, 65536):
+        assert iterHands(str(path), chunk_size, starsArchive = True) == hands
+
+def testIterHandsSecondCodec(tmpdir):
+    # a cp1252 file that is valid utf-8 for its first hands, so that the codec
+    # changes after the first chunks with small chunks, and before any hand with large
+    hands = splitWholeFile(stars_files[0])
+    hands = [handText.replace(u'€', u'E') for handText in hands[:10]] + hands[10:]
+    path = tmpdir.join("cp1252.txt")
+    path.write_binary(u"\n\n\n".join(hands).encode('cp1252'))
+    assert splitWholeFile(str(path)) == hands
+    for chunk_size in (1, 7, 65536):
+        assert iterHands(str(path), chunk_size) == hands
+
+def testIterHandsIndex(tmpdir):
+    # a growing file is read from where the last read stopped, also in the middle
+    # of a character
+    hands = splitWholeFile(stars_files[0])
+    text = u"\n\n\n".join(hands).encode('utf-8')
+    cut = text.index('\xe2\x82\xac', len(text) // 2) + 1
+    path = tmpdir.join("growing.txt")
+    path.write_binary(text[:cut])
+    hhc = PokerStarsToFpdb.PokerStars(config, in_path = str(path), autostart = False)
+    first = list(hhc.iterHands())
+    assert hhc.index == cut - 1
+    open(str(path), 'ab').write(text[cut:])
+    rest = list(hhc.iterHands())
+    assert hhc.index == len(text)
+    # the hand being written when the file was read comes in two parts
+    assert first[:-1] == hands[:len(first) - 1]
+    assert rest[1:] == hands[len(first):]
+    assert first[-1] + rest[0] == hands[len(first) - 1]
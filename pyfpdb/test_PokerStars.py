@@ -23,6 +23,7 @@ import Configuration
 import Database
 import SQL
 import fpdb_import
+from datetime import datetime
 
 config = Configuration.Config(file = "HUD_config.test.xml")
 db = Database.Database(config)
@@ -197,3 +198,67 @@ def testDrawImport():
 
     # Should actually do some testing here
     assert 1 == 1
+
+def testSessionsImportedOutOfOrder(tmpdir):
+    site = config.supported_sites['PokerStars']
+    screen_name = site.screen_name
+    site.screen_name = u's0rrow'
+    try:
+        db.recreate_tables()
+        # the later hands of a session are imported before its earlier ones, and
+        # after those of the next day
+        hands = open("regression-test-files/cash/Stars/Flop/NLHE-6max-USD-0.05-0.10-200911.txt").read().split('\n\n\n')
+        half = len(hands) // 2
+        tmpdir.join("early.txt").write('\n\n\n'.join(hands[:half]))
+        tmpdir.join("late.txt").write('\n\n\n'.join(hands[half:]))
+        files = ("regression-test-files/cash/Stars/Flop/PLO8-6max-USD-0.01-0.02-200911.txt",
+                 str(tmpdir.join("late.txt")), str(tmpdir.join("early.txt")))
+        importer = fpdb_import.Importer(False, settings, config)
+        importer.setDropIndexes("don't drop")
+        importer.setFailOnError(True)
+        importer.setThreads(-1)
+        importer.setCallHud(False)
+        for f in files:
+            importer.addBulkImportImportFileOrDir(f, site="PokerStars")
+            importer.runImport()
+            importer.clearFileList()
+
+        q = "SELECT playerId, sessionStart, sessionEnd, hands, totalProfit, highProfit, lowProfit FROM Sessions ORDER BY sessionStart"
+        c = db.get_cursor()
+        c.execute(q)
+        imported = [list(row) for row in c.fetchall()]
+        pid = db.get_player_id(config, 'PokerStars', u's0rrow')
+        c.execute(db.sql.query['getSessionHands'], (pid, datetime(2000, 1, 1), datetime(2100, 1, 1)))
+        all_hands = c.fetchall()
+        assert len(imported) == 2
+        assert sum([row[3] for row in imported]) == len(all_hands)
+        assert imported == db.split_sessions(pid, all_hands)
+
+        db.rebuild_sessions()
+        db.commit()
+        c.execute(q)
+        assert [list(row) for row in c.fetchall()] == imported
+    finally:
+        site.screen_name = screen_name
+
+def testTourneyPlayerListedTwice(tmpdir):
+    db.recreate_tables()
+    # the first hand of a sit and go with Player8 renamed to Player7, who is
+    # then seated twice
+    hands = open("regression-test-files/tour/Stars/Flop/NLHE-USD-STT-20-201006.DONturbo.txt").read().split('\n\n\n')
+    path = tmpdir.join("twice.txt")
+    path.write(hands[0].replace('Player8', 'Player7'))
+    importer = fpdb_import.Importer(False, settings, config)
+    importer.setDropIndexes("don't drop")
+    importer.setFailOnError(True)
+    importer.setThreads(-1)
+    importer.setCallHud(False)
+    importer.addBulkImportImportFileOrDir(str(path), site="PokerStars")
+    (stored, dups, partial, errs, ttime) = importer.runImport()
+    assert (stored, errs) == (1, 0)
+    c = db.get_cursor()
+    c.execute("""SELECT COUNT(*) FROM TourneysPlayers tp, Players p
+                 WHERE p.id = tp.playerId AND p.name = 'Player7'""")
+    assert c.fetchone()[0] == 1
+    c.execute("SELECT COUNT(*) FROM TourneysPlayers")
+    assert c.fetchone()[0] == 9
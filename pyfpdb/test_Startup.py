@@ -0,0 +1,56 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+# Cold start budget for fpdb.pyw: runs its module level code (the imports) in a
+# fresh interpreter, and fails if that gets slow or starts importing the tabs or
+# their heavy dependencies again. See LazyImport.py.
+
+import os
+import sys
+import subprocess
+import py
+
+py.test.importorskip("gtk")
+py.test.importorskip("pango")
+
+startup_budget = 2.0    # seconds
+
+lazy_modules = ('matplotlib', 'numpy', 'GuiAutoImport', 'GuiBulkImport', 'GuiDatabase',
+                'GuiGraphViewer', 'GuiImapFetcher', 'GuiLogView', 'GuiPositionalStats',
+                'GuiPrefs', 'GuiRingPlayerStats', 'GuiSessionViewer', 'GuiTourneyGraphViewer',
+                'GuiTourneyPlayerStats', 'GuiTourneyViewer')
+
+startup = """
+import sys, time, imp
+sys.path.insert(0, '.')
+sys.argv = ['fpdb.pyw']
+start = time.time()
+imp.load_source('fpdb_startup', 'fpdb.pyw')
+print time.time() - start
+print ' '.join(name for name in sys.modules if sys.modules[name] is not None)
+"""
+
+def testColdStart():
+    p = subprocess.Popen([sys.executable, '-c', startup], cwd = os.path.dirname(os.path.abspath(__file__)),
+                         stdin = subprocess.PIPE, stdout = subprocess.PIPE)
+    (out, err) = p.communicate('\n')
+    assert p.returncode == 0
+    lines = out.splitlines()
+    startup_time = float(lines[-2])
+    modules = lines[-1].split()
+    for name in lazy_modules:
+        assert name not in modules, "%s is imported at startup" % name
+    assert startup_time < startup_budget, "startup took %.2f seconds" % startup_time
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU Affero General Public License as published by
+#the Free Software Foundation, version 3 of the License.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU Affero General Public License
+#along with this program. If not, see <http://www.gnu.org/licenses/>.
+#In the "official" distribution you can find the license in agpl-3.0.txt.
+
+# Needs an X server, eg: xvfb-run py.test test_XTables.py
+
+import os
+import time
+import py
+
+gtk = py.test.importorskip("gtk")
+py.test.importorskip("Xlib.display")
+
+import Configuration
+
+def run_gtk(done, seconds = 5):
+    """Run the gtk main loop until done() or the time is up"""
+    end = time.time() + seconds
+    while not done() and time.time() < end:
+        while gtk.events_pending():
+            gtk.main_iteration(False)
+        time.sleep(0.01)
+
+class FakeHud(object):
+    def __init__(self):
+        self.signals = []
+        self.parent = self
+        self.main_window = gtk.Window()
+        for signal in ("client_moved", "client_resized", "client_destroyed"):
+            self.main_window.connect(signal, self.signalled, signal)
+
+    def signalled(self, widget, hud, signal):
+        self.signals.append(signal)
+
+def testWatchedTable():
+    if not os.environ.get('DISPLAY'):
+        py.test.skip("no X server")
+    import XTables
+
+    client = gtk.Window()
+    client.set_title("XTables Test Table - $0.01/$0.02 - No Limit Hold'em")
+    client.move(100, 100)
+    client.resize(400, 300)
+    client.show_all()
+    run_gtk(lambda: False, 0.5)
+
+    config = Configuration.Config(file = "HUD_config.test.xml")
+    table = XTables.Table(config, "PokerStars", table_name = "XTables Test Table")
+    assert table.number == client.window.xid
+    assert table.title in XTables.window_index
+
+    hud = FakeHud()
+    assert table.watch(hud)
+
+    client.move(200, 150)
+    run_gtk(lambda: "client_moved" in hud.signals)
+    assert (table.x, table.y) == (200, 150)
+
+    client.resize(500, 350)
+    run_gtk(lambda: "client_resized" in hud.signals)
+    assert (table.width, table.height) == (500, 350)
+
+    client.destroy()
+    run_gtk(lambda: "client_destroyed" in hud.signals)
+    assert table.number not in XTables.watched